@@ -23,9 +23,8 @@ __version__ = "1.0.0"
 
 import network
 import sys
-from machine import I2C, Pin
-from arduino_alvik import ArduinoAlvik
-from modulino import ModulinoBuzzer, ModulinoPixels, ModulinoColor
+from arduino_alvik.async_alvik import AsyncAlvik
+from modulino import I2CHelper, ModulinoBuzzer, ModulinoPixels, ModulinoColor
 from time import sleep_ms, sleep, ticks_ms, ticks_diff
 from math import cos, pi
 from melodies import pacman
@@ -48,14 +47,16 @@ left_speed = 0
 right_speed = 0
 # Increase to make Alvik run faster, but harder to control
 SPEED_FACTOR = 1.5
+# Maximum number of wheels speed updates sent to Alvik per second
+CONTROL_RATE_HZ = 50
 
 
-# Initialize Alvik
-alvik = ArduinoAlvik()
-alvik.begin()
-buzzer = ModulinoBuzzer(I2C(0, scl=Pin(12, Pin.OUT), sda=Pin(11, Pin.OUT)))
-pixels = ModulinoPixels(I2C(0, scl=Pin(12, Pin.OUT), sda=Pin(11, Pin.OUT)))
-sleep(1)  # Waiting for the robot to setup
+# Initialize Alvik: the UART is read by an asyncio task sharing the loop with the BLE tasks
+alvik = AsyncAlvik()
+# The Modulinos share the I2C bus of Alvik: the pixels frames and the tones are serialized on a single bus
+I2CHelper.set_interface(alvik.i2c)
+buzzer = ModulinoBuzzer()
+pixels = ModulinoPixels()
 
 is_playing = False
 is_pixels_on = False
@@ -129,7 +130,6 @@ async def speed_task():
             horn_characteristic = await dev_service.characteristic(_BLE_HORN_UUID)
             pixels_characteristic = await dev_service.characteristic(_BLE_PIXELS_UUID)
             while connection.is_connected():
-                alvik.left_led.set_color(0, 1, 0)
               
                 horn_as_bytes = await horn_characteristic.read()
                 horn = _decode_data(horn_as_bytes)
@@ -154,7 +154,10 @@ async def speed_task():
                 right_wheel_speed = (speed - (speed * (dir/100))) * SPEED_FACTOR
                 # print("Speed is: ", speed, left_wheel_speed, left_wheel_speed)
                 
-                alvik.set_wheels_speed(left_wheel_speed, right_wheel_speed)
+                # LED and wheels in a single UART write
+                with alvik.batch():
+                    alvik.left_led.set_color(0, 1, 0)
+                    alvik.set_wheels_speed(left_wheel_speed, right_wheel_speed)
         except asyncio.TimeoutError:
             print("Timeout discovering services/characteristics")
             print("Disconnected, should stop the robot for safety reason")
@@ -178,25 +181,19 @@ async def start_pixels_animation():
     while True and is_pixels_on:
         # Move the bar forward
         for i in range(8):
-            for k in range(barLength):
-                if i + k < 8:
-                    pixels.set_rgb(i + k, *color)
+            pixels.clear_all()
+            pixels.set_range_rgb(i, min(i + barLength, 8) - 1, *color)
             pixels.show()
             await asyncio.sleep_ms(wait)
-            for j in range(8):
-                pixels.clear(j)
             
         # Move the bar backward
         for i in range(8 - 1, -1, -1):
-            for k in range(barLength):
-                if i - k >= 0:
-                    pixels.set_rgb(i - k, *color)
+            pixels.clear_all()
+            pixels.set_range_rgb(max(i - barLength + 1, 0), i, *color)
             pixels.show()
             await asyncio.sleep_ms(wait)
-            for j in range(8):
-                pixels.clear(j)
                 
-    stop_pixels_animation()
+    await stop_pixels_animation()
     
 
 async def play_tune(tune_function):
@@ -223,6 +220,11 @@ async def play_tune(tune_function):
 
 
 async def main():
+    await alvik.begin()
+    # the receiver loop sends the wheels speed and the LED color at every iteration:
+    # coalesce them and drop the unchanged ones
+    alvik.set_command_rate(CONTROL_RATE_HZ)
+    await asyncio.sleep_ms(1000)  # Waiting for the robot to setup
     alvik.brake()
     stop_pixels_animation()
     alvik.left_led.set_color(1, 0, 0)
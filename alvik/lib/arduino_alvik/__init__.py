@@ -9,3 +9,5 @@ __maintainer__ = "Lucio Rossi <l.rossi@arduino.cc>, Giovanni Bruno <g.bruno@ardu
 __required_firmware_version__ = "1.0.4"
 
 from .arduino_alvik import *
+# AsyncAlvik is not re-exported: arduino_alvik.py imports this module, so importing async_alvik here is circular.
+# Import it from its module: from arduino_alvik.async_alvik import AsyncAlvik
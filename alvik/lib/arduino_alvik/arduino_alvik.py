@@ -1,17 +1,21 @@
 import sys
 import gc
 import struct
-from machine import I2C
+from machine import I2C, lightsleep
 import _thread
-from time import sleep_ms, ticks_ms, ticks_diff
+from array import array
+from time import sleep_ms, ticks_ms, ticks_us, ticks_diff, ticks_add
 
 from ucPack import ucPack
+from ucPack import PACKET_C1B, PACKET_C2B, PACKET_C3B, PACKET_C3I, PACKET_C7I, PACKET_C1F, PACKET_C2F, PACKET_C3F, \
+    PACKET_C6F, PACKET_C1B3F, PACKET_C2B1F
 
 from .uart import uart
 from .conversions import *
 from .pinout_definitions import *
 from .robot_definitions import *
 from .constants import *
+from .recorder import TelemetryRecorder
 
 from .__init__ import __version__
 from .__init__ import __required_firmware_version__
@@ -23,66 +27,71 @@ class ArduinoAlvik:
     _events_thread_running = False
     _events_thread_id = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if not hasattr(cls, '_instance'):
             cls._instance = super(ArduinoAlvik, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, transport=None):
+        """
+        Alvik initialization
+        :param transport: byte link to the motor controller (defaults to the robot UART).
+        Any object with the any/read/readinto/write methods of machine.UART can be used,
+        e.g. a ReplayTransport to play back a captured stream. If it has an is_on method, it replaces the power check
+        """
+        self._transport = transport if transport is not None else uart
+        if hasattr(self._transport, 'is_on'):
+            self.is_on = self._transport.is_on
         self.i2c = _ArduinoAlvikI2C(A4, A5)
         self._packeter = ucPack(200)
+        self._commands = _ArduinoAlvikCommandScheduler(self._transport, self._packeter)
+        self._rx_buffer = bytearray(self._packeter.buffer_size)
+        self._rx_view = memoryview(self._rx_buffer)
         self.left_wheel = _ArduinoAlvikWheel(self._packeter, ord('L'), alvik=self)
         self.right_wheel = _ArduinoAlvikWheel(self._packeter, ord('R'), alvik=self)
         self._servo_positions = list((None, None,))
-        self.servo_A = _ArduinoAlvikServo(self._packeter, 'A', 0, self._servo_positions)
-        self.servo_B = _ArduinoAlvikServo(self._packeter, 'B', 1, self._servo_positions)
+        self.servo_A = _ArduinoAlvikServo(self._packeter, 'A', 0, self._servo_positions, self._commands)
+        self.servo_B = _ArduinoAlvikServo(self._packeter, 'B', 1, self._servo_positions, self._commands)
         self._led_state = list((None,))
         self.left_led = self.DL1 = _ArduinoAlvikRgbLed(self._packeter, 'left', self._led_state,
-                                                       rgb_mask=[0b00000100, 0b00001000, 0b00010000])
+                                                       rgb_mask=[0b00000100, 0b00001000, 0b00010000],
+                                                       commands=self._commands)
         self.right_led = self.DL2 = _ArduinoAlvikRgbLed(self._packeter, 'right', self._led_state,
-                                                        rgb_mask=[0b00100000, 0b01000000, 0b10000000])
+                                                        rgb_mask=[0b00100000, 0b01000000, 0b10000000],
+                                                        commands=self._commands)
         self._battery_perc = None
         self._battery_is_charging = None
+        self._battery_gauge = _ArduinoAlvikBatteryGauge(self.i2c)
+        self._low_power_idle = False
         self._touch_byte = None
         self._move_byte = None
         self._behaviour = None
-        self._red = None
-        self._green = None
-        self._blue = None
+        self._sensors = _ArduinoAlvikSensorState()
         self._white_cal = None
         self._black_cal = None
-        self._left_line = None
-        self._center_line = None
-        self._right_line = None
-        self._roll = None
-        self._pitch = None
-        self._yaw = None
-        self._x = None
-        self._y = None
-        self._theta = None
-        self._ax = None
-        self._ay = None
-        self._az = None
-        self._gx = None
-        self._gy = None
-        self._gz = None
-        self._left_tof = None
-        self._center_left_tof = None
-        self._center_tof = None
-        self._center_right_tof = None
-        self._right_tof = None
-        self._top_tof = None
-        self._bottom_tof = None
-        self._linear_velocity = None
-        self._angular_velocity = None
         self._last_ack = None
         self._waiting_ack = None
+        self._ack_cleared = True
+        self._ack_ticks = ticks_ms()
+        self._target_reached = False
+        self._target_lock = _thread.allocate_lock()
+        self._target_listeners = []
+        self.motion_queue = _ArduinoAlvikMotionQueue(self)
         self._version = list(map(int, __version__.split('.')))
         self._fw_version = [None, None, None]
         self._required_fw_version = list(map(int, __required_firmware_version__.split('.')))
         self._touch_events = _ArduinoAlvikTouchEvents()
         self._move_events = _ArduinoAlvikMoveEvents()
         self._timer_events = _ArduinoAlvikTimerEvents(-1)
+        self._message_handlers = dict()
+        self._user_handler_codes = bytearray(256)  # 1 for the codes handled by a user handler
+        self._telemetry_stats = _ArduinoAlvikTelemetryStats(self._packeter)
+        self._update_pacer = _ArduinoAlvikUpdatePacer()
+        self._sequence = 0
+        self._message_sequence = array('L', [0] * 256)
+        self._message_ticks = array('L', [0] * 256)
+        self._recorder = None
+        self._register_message_handlers()
 
     @staticmethod
     def is_on() -> bool:
@@ -109,6 +118,33 @@ class ArduinoAlvik:
         word = marks_str + f" {percentage}%" + charging_str + " \t"
         sys.stdout.write(bytes((word.encode('utf-8'))))
 
+    def _idle_wait(self, duration: int, iterations: int, blocking: bool) -> None:
+        """
+        Waits during the idle mode: in low power mode the ESP32 light sleeps and a timer wakes it up
+        :param duration: wait duration (ms)
+        :param iterations: iterations of the lengthy operation used as a wait in blocking mode
+        :param blocking: True to hold the CPU while waiting
+        :return:
+        """
+        if self._low_power_idle:
+            lightsleep(duration)
+        elif blocking:
+            self._lenghty_op(iterations)
+        else:
+            sleep_ms(duration)
+
+    def set_idle_mode(self, low_power: bool = False, battery_refresh: int = BATTERY_REFRESH_MS) -> None:
+        """
+        Configures the idle mode, the behaviour of Alvik while the robot is off.
+        The battery SOC is read from the fuel gauge at most once every battery_refresh ms, get_battery_charge
+        and is_battery_charging return the last reading as they do with the SOC sent by the robot when it is on
+        :param low_power: True to light sleep between two idle steps (all the threads are paused, BLE included)
+        :param battery_refresh: minimum interval between two readings of the fuel gauge (ms)
+        :return:
+        """
+        self._low_power_idle = low_power
+        self._battery_gauge.set_refresh(battery_refresh)
+
     def _lenghty_op(self, iterations=10000000) -> int:
         result = 0
         for i in range(1, iterations):
@@ -123,10 +159,7 @@ class ArduinoAlvik:
         NANO_CHK.value(1)
         self.i2c.set_single_thread(True)
 
-        if blocking:
-            self._lenghty_op(50000)
-        else:
-            sleep_ms(500)
+        self._idle_wait(500, 50000, blocking)
         led_val = 0
 
         try:
@@ -135,21 +168,15 @@ class ArduinoAlvik:
                 if check_on_thread and not self.__class__._update_thread_running:
                     break
 
-                cmd = bytearray(1)
-                cmd[0] = 0x06
-
-                self.i2c.start()
-                self.i2c.writeto(0x36, cmd)
-
-                soc_raw = struct.unpack('h', self.i2c.readfrom(0x36, 2))[0]
-                soc_perc = soc_raw * 0.00390625
-                self._battery_is_charging = soc_perc > 0
-                self._battery_perc = abs(soc_perc)
-                self._print_battery_status(round(soc_perc), self._battery_is_charging)
-                if blocking:
-                    self._lenghty_op(10000)
+                # the fuel gauge is read once per refresh interval, the LEDs blink every delay_
+                soc_perc = self._battery_gauge.read()
+                if soc_perc is not None:
+                    self._battery_is_charging = soc_perc > 0
+                    self._battery_perc = abs(soc_perc)
+                    self._print_battery_status(round(soc_perc), self._battery_is_charging)
                 else:
-                    sleep_ms(delay_)
+                    soc_perc = self._battery_gauge.soc
+                self._idle_wait(delay_, 10000, blocking)
                 if soc_perc > 97:
                     LEDG.value(0)
                     LEDR.value(1)
@@ -266,14 +293,14 @@ class ArduinoAlvik:
         else:
             return False
 
-    @staticmethod
-    def _flush_uart():
+    def _flush_uart(self):
         """
-        Empties the UART buffer
+        Empties the UART buffer and drops any partially received message
         :return:
         """
-        while uart.any():
-            uart.read(1)
+        while self._transport.any():
+            self._transport.read()
+        self._packeter.resetParser()
 
     def _begin_update_thread(self):
         """
@@ -283,7 +310,7 @@ class ArduinoAlvik:
 
         if not self.__class__._update_thread_running:
             self.__class__._update_thread_running = True
-            self.__class__._update_thread_id = _thread.start_new_thread(self._update, (1,))
+            self.__class__._update_thread_id = _thread.start_new_thread(self._update, ())
 
     @classmethod
     def _stop_update_thread(cls):
@@ -293,31 +320,82 @@ class ArduinoAlvik:
         """
         cls._update_thread_running = False
 
-    def _wait_for_target(self, idle_time):
-        start = ticks_ms()
-        while True:
-            if ticks_diff(ticks_ms(), start) >= idle_time * 1000 and self.is_target_reached():
-                break
-            else:
-                # print(self._last_ack)
-                sleep_ms(100)
+    def _expect_target(self, ack: int, blocking: bool = False) -> None:
+        """
+        Arms the wait of a motion target, call it before sending the command that sets the target
+        :param ack: the acknowledgment sent by the robot when the target is reached
+        :param blocking: True if the caller is going to wait for the target
+        :return:
+        """
+        if blocking:
+            self._check_not_in_batch()
+        self._target_lock.acquire(0)
+        self._target_reached = False
+        self._waiting_ack = ack
 
-    def is_target_reached(self) -> bool:
+    def _check_not_in_batch(self) -> None:
         """
-        Returns True if robot has sent an M or R acknowledgment.
-        It also responds with an ack received message
+        Raises RuntimeError if the calling thread owns a batch: the commands of a batch are written when it exits,
+        so waiting for the robot inside it would never return
         :return:
         """
-        if self._waiting_ack is None:
-            return True
-        if self._last_ack == self._waiting_ack:
-            self._packeter.packetC1B(ord('X'), ord('K'))
-            uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        if self._commands.in_batch():
+            raise RuntimeError('cannot wait for the robot inside a batch, use blocking=False')
+
+    def _wait_for_target(self) -> None:
+        """
+        Blocks until the robot reaches the target, the update thread releases the target lock
+        as soon as the acknowledgment is received
+        :return:
+        """
+        self._target_lock.acquire()
+        self._target_lock.release()
+
+    def _acknowledge_target(self) -> None:
+        """
+        Responds to the acknowledgment of the awaited target recorded by _on_ack and wakes up the waiting callers.
+        It runs in the update loop out of the sensors write window, and never waits for the command scheduler:
+        while another thread holds it (e.g. inside a batch) the answer is retried on next loop
+        :return:
+        """
+        if not self._target_reached:
+            return
+        if not self._commands.try_send(PACKET_C1B, ord('X'), ord('K')):
+            return
+        self._target_reached = False
+        self._ack_cleared = False
+        self._ack_ticks = ticks_ms()
+        self._waiting_ack = None
+        self._last_ack = 0x00
+        self._release_target()
+
+    def _cancel_target(self) -> None:
+        """
+        Stops waiting for the target, e.g. when the robot has been restarted
+        :return:
+        """
+        if self._waiting_ack is not None and self._waiting_ack != 0x00:
+            self._target_reached = False
             self._waiting_ack = None
-            self._last_ack = 0x00
-            sleep_ms(100)
-            return True
-        return False
+            self._release_target()
+
+    def _release_target(self) -> None:
+        """
+        Wakes up the callers waiting for the target
+        :return:
+        """
+        if self._target_lock.locked():
+            self._target_lock.release()
+        for listener in self._target_listeners:
+            listener()
+
+    def is_target_reached(self) -> bool:
+        """
+        Returns True if robot has reached the target of the last move, rotate or position command.
+        The acknowledgment of the robot is answered by the update thread as soon as it is received
+        :return:
+        """
+        return self._waiting_ack is None
 
     def set_behaviour(self, behaviour: int):
         """
@@ -325,8 +403,7 @@ class ArduinoAlvik:
         :param behaviour: behaviour code
         :return:
         """
-        self._packeter.packetC1B(ord('B'), behaviour & 0xFF)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.send(PACKET_C1B, ord('B'), behaviour & 0xFF)
 
     def rotate(self, angle: float, unit: str = 'deg', blocking: bool = True):
         """
@@ -337,12 +414,10 @@ class ArduinoAlvik:
         :return:
         """
         angle = convert_angle(angle, unit, 'deg')
-        sleep_ms(200)
-        self._packeter.packetC1F(ord('R'), angle)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
-        self._waiting_ack = ord('R')
+        self._expect_target(ord('R'), blocking)
+        self._commands.send(PACKET_C1F, ord('R'), angle)
         if blocking:
-            self._wait_for_target(idle_time=(angle / MOTOR_CONTROL_DEG_S))
+            self._wait_for_target()
 
     def move(self, distance: float, unit: str = 'cm', blocking: bool = True):
         """
@@ -353,12 +428,10 @@ class ArduinoAlvik:
         :return:
         """
         distance = convert_distance(distance, unit, 'mm')
-        sleep_ms(200)
-        self._packeter.packetC1F(ord('G'), distance)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
-        self._waiting_ack = ord('M')
+        self._expect_target(ord('M'), blocking)
+        self._commands.send(PACKET_C1F, ord('G'), distance)
         if blocking:
-            self._wait_for_target(idle_time=(distance / MOTOR_CONTROL_MM_S))
+            self._wait_for_target()
 
     def stop(self):
         """
@@ -366,11 +439,15 @@ class ArduinoAlvik:
         :return:
         """
         # stop engines
+        self.motion_queue._abort()
         self.set_wheels_speed(0, 0)
 
         # turn off UI leds
         self._set_leds(0x00)
 
+        # the update thread flushing the setpoints is stopped next, write them now
+        self._commands.flush()
+
         # stop the update thread
         self._stop_update_thread()
 
@@ -399,7 +476,8 @@ class ArduinoAlvik:
         :param unit: the speed unit of measurement (default: 'rpm')
         :return: left_wheel_speed, right_wheel_speed
         """
-        return self.left_wheel.get_speed(unit), self.right_wheel.get_speed(unit)
+        left_speed, right_speed = self._sensors.read(_ArduinoAlvikSensorState.WHEELS_SPEED, 2)
+        return self.left_wheel._convert_speed(left_speed, unit), self.right_wheel._convert_speed(right_speed, unit)
 
     def set_wheels_speed(self, left_speed: float, right_speed: float, unit: str = 'rpm'):
         """
@@ -414,11 +492,11 @@ class ArduinoAlvik:
             left_speed = (left_speed / 100) * MOTOR_MAX_RPM
             right_speed = (right_speed / 100) * MOTOR_MAX_RPM
         else:
-            left_speed = convert_rotational_speed(left_speed, unit, 'rpm')
-            right_speed = convert_rotational_speed(right_speed, unit, 'rpm')
+            factor = conversion_factor(convert_rotational_speed, unit, 'rpm')
+            left_speed = left_speed * factor
+            right_speed = right_speed * factor
 
-        self._packeter.packetC2F(ord('J'), left_speed, right_speed)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.MOTION, PACKET_C2F, ord('J'), left_speed, right_speed)
 
     def set_wheels_position(self, left_angle: float, right_angle: float, unit: str = 'deg', blocking: bool = True):
         """
@@ -429,13 +507,13 @@ class ArduinoAlvik:
         :param blocking:
         :return:
         """
-        left_angle = convert_angle(left_angle, unit, 'deg')
-        right_angle = convert_angle(right_angle, unit, 'deg')
-        self._packeter.packetC2F(ord('A'), left_angle, right_angle)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
-        self._waiting_ack = ord('P')
+        factor = conversion_factor(convert_angle, unit, 'deg')
+        left_angle = left_angle * factor
+        right_angle = right_angle * factor
+        self._expect_target(ord('P'), blocking)
+        self._commands.send(PACKET_C2F, ord('A'), left_angle, right_angle)
         if blocking:
-            self._wait_for_target(idle_time=(max(left_angle, right_angle) / MOTOR_CONTROL_DEG_S))
+            self._wait_for_target()
 
     def get_wheels_position(self, unit: str = 'deg') -> (float | None, float | None):
         """
@@ -443,8 +521,8 @@ class ArduinoAlvik:
         :param unit: the angle unit of measurement (default: 'deg')
         :return: left_wheel_angle, right_wheel_angle
         """
-        return (convert_angle(self.left_wheel.get_position(), 'deg', unit),
-                convert_angle(self.right_wheel.get_position(), 'deg', unit))
+        return tuple(convert_array(convert_angle, self._sensors.read(_ArduinoAlvikSensorState.WHEELS_POSITION, 2),
+                                   'deg', unit))
 
     def get_orientation(self) -> (float | None, float | None, float | None):
         """
@@ -452,28 +530,28 @@ class ArduinoAlvik:
         :return: roll, pitch, yaw
         """
 
-        return self._roll, self._pitch, self._yaw
+        return self._sensors.read(_ArduinoAlvikSensorState.ORIENTATION, 3)
 
     def get_accelerations(self) -> (float | None, float | None, float | None):
         """
         Returns the 3-axial acceleration of the IMU
         :return: ax, ay, az
         """
-        return self._ax, self._ay, self._az
+        return self._sensors.read(_ArduinoAlvikSensorState.IMU, 3)
 
     def get_gyros(self) -> (float | None, float | None, float | None):
         """
         Returns the 3-axial angular acceleration of the IMU
         :return: gx, gy, gz
         """
-        return self._gx, self._gy, self._gz
+        return self._sensors.read(_ArduinoAlvikSensorState.IMU + 3, 3)
 
     def get_imu(self) -> (float | None, float | None, float | None, float | None, float | None, float | None):
         """
         Returns all the IMUs readouts
         :return: ax, ay, az, gx, gy, gz
         """
-        return self._ax, self._ay, self._az, self._gx, self._gy, self._gz
+        return self._sensors.read(_ArduinoAlvikSensorState.IMU, 6)
 
     def get_line_sensors(self) -> (int | None, int | None, int | None):
         """
@@ -481,7 +559,7 @@ class ArduinoAlvik:
         :return: left_line, center_line, right_line
         """
 
-        return self._left_line, self._center_line, self._right_line
+        return self._sensors.read(_ArduinoAlvikSensorState.LINE_SENSORS, 3, integer=True)
 
     def drive(self, linear_velocity: float, angular_velocity: float, linear_unit: str = 'cm/s',
               angular_unit: str = 'deg/s'):
@@ -498,15 +576,16 @@ class ArduinoAlvik:
             angular_velocity = (angular_velocity / 100) * ROBOT_MAX_DEG_S
         else:
             angular_velocity = convert_rotational_speed(angular_velocity, angular_unit, 'deg/s')
-        self._packeter.packetC2F(ord('V'), linear_velocity, angular_velocity)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.MOTION, PACKET_C2F, ord('V'),
+                              linear_velocity, angular_velocity)
 
     def brake(self):
         """
-        Brakes the robot
+        Brakes the robot, at once even if a command rate is set
         :return:
         """
         self.drive(0, 0)
+        self._commands.flush()
 
     def get_drive_speed(self, linear_unit: str = 'cm/s', angular_unit: str = 'deg/s') -> (float | None, float | None):
         """
@@ -515,13 +594,14 @@ class ArduinoAlvik:
         :param angular_unit: output angular velocity unit of meas
         :return: linear_velocity, angular_velocity
         """
+        linear_velocity, angular_velocity = self._sensors.read(_ArduinoAlvikSensorState.DRIVE_SPEED, 2)
         if angular_unit == '%':
-            angular_velocity = (self._angular_velocity / ROBOT_MAX_DEG_S) * 100 \
-                if self._angular_velocity is not None else None
+            angular_velocity = (angular_velocity / ROBOT_MAX_DEG_S) * 100 \
+                if angular_velocity is not None else None
         else:
-            angular_velocity = convert_rotational_speed(self._angular_velocity, 'deg/s', angular_unit)
+            angular_velocity = convert_rotational_speed(angular_velocity, 'deg/s', angular_unit)
 
-        return convert_speed(self._linear_velocity, 'mm/s', linear_unit), angular_velocity
+        return convert_speed(linear_velocity, 'mm/s', linear_unit), angular_velocity
 
     def reset_pose(self, x: float, y: float, theta: float, distance_unit: str = 'cm', angle_unit: str = 'deg'):
         """
@@ -536,8 +616,7 @@ class ArduinoAlvik:
         x = convert_distance(x, distance_unit, 'mm')
         y = convert_distance(y, distance_unit, 'mm')
         theta = convert_angle(theta, angle_unit, 'deg')
-        self._packeter.packetC3F(ord('Z'), x, y, theta)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.send(PACKET_C3F, ord('Z'), x, y, theta)
         sleep_ms(1000)
 
     def get_pose(self, distance_unit: str = 'cm', angle_unit: str = 'deg') \
@@ -548,9 +627,11 @@ class ArduinoAlvik:
         :param angle_unit: unit of theta output
         :return: x, y, theta
         """
-        return (convert_distance(self._x, 'mm', distance_unit),
-                convert_distance(self._y, 'mm', distance_unit),
-                convert_angle(self._theta, 'deg', angle_unit))
+        x, y, theta = self._sensors.read(_ArduinoAlvikSensorState.POSE, 3)
+        factor = conversion_factor(convert_distance, 'mm', distance_unit)
+        return (x * factor if x is not None else None,
+                y * factor if y is not None else None,
+                convert_angle(theta, 'deg', angle_unit))
 
     def set_servo_positions(self, a_position: int, b_position: int):
         """
@@ -561,8 +642,8 @@ class ArduinoAlvik:
         """
         self._servo_positions[0] = a_position
         self._servo_positions[1] = b_position
-        self._packeter.packetC2B(ord('S'), a_position & 0xFF, b_position & 0xFF)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.SERVOS, PACKET_C2B, ord('S'),
+                              a_position & 0xFF, b_position & 0xFF)
 
     def get_servo_positions(self) -> (int, int):
         """
@@ -591,8 +672,7 @@ class ArduinoAlvik:
         :return:
         """
         self._led_state[0] = led_state & 0xFF
-        self._packeter.packetC1B(ord('L'), self._led_state[0])
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.LEDS, PACKET_C1B, ord('L'), self._led_state[0] & 0xFF)
 
     def set_builtin_led(self, value: bool):
         """
@@ -616,12 +696,12 @@ class ArduinoAlvik:
         self._led_state[0] = self._led_state[0] | 0b00000010 if value else self._led_state[0] & 0b11111101
         self._set_leds(self._led_state[0])
 
-    def _update(self, delay_=1):
+    def _update(self):
         """
         Updates the robot status reading/parsing messages from UART.
         This method is blocking and meant as a thread callback
         Use the method stop to terminate _update and exit the thread
-        :param delay_: while loop delay (ms)
+        The loop delay adapts to the traffic, see set_update_delay
         :return:
         """
 
@@ -633,6 +713,9 @@ class ArduinoAlvik:
                 self._idle(1000, check_on_thread=True)
                 self._reset_hw()
                 self._flush_uart()
+                self._commands.invalidate()
+                self.motion_queue._abort()
+                self._cancel_target()
                 sleep_ms(1000)
                 self._wait_for_ack()
                 sleep_ms(2000)
@@ -640,88 +723,388 @@ class ArduinoAlvik:
                 self.set_behaviour(1)
             if not ArduinoAlvik._update_thread_running:
                 break
-            if self._read_message():
-                self._parse_message()
-            sleep_ms(delay_)
+            sleep_ms(self._update_once())
+
+    def _update_once(self) -> int:
+        """
+        Reads and parses the messages received, then services the commands, the motion queue, the queued I2C
+        writes and the recorder
+        :return: the delay (ms) before the next call
+        """
+        start = ticks_us()
+        while self._read_message():
+            self._parse_message()
+        self._acknowledge_target()
+        self._commands.service()
+        self.motion_queue.service()
+        self.i2c.service()
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.service()
+        now = ticks_ms()
+        due = self._commands.time_to_service(now)
+        pause = self.motion_queue.time_to_service(now)
+        if due < 0 or 0 <= pause < due:
+            due = pause
+        pause = self.i2c.time_to_service(now)
+        if due < 0 or 0 <= pause < due:
+            due = pause
+        if self._target_reached and due != 0:
+            due = 1                                         # the target ack is waiting for the command scheduler
+        pacer = self._update_pacer
+        delay = pacer.next_delay(self._transport.any(), due)
+        pacer.record(ticks_diff(ticks_us(), start), delay)
+        return delay
 
     def _read_message(self) -> bool:
         """
-        Read a message from the uC
-        :return: True if a message terminator was reached
-        """
-        while uart.any():
-            b = uart.read(1)[0]
-            self._packeter.buffer.push(b)
-            if b == self._packeter.end_index and self._packeter.checkPayload():
-                return True
-        return False
+        Read a message from the uC.
+        All the bytes available on the UART are ingested in bulk (up to the free space of the packeter buffer),
+        call it until it returns False to frame every complete packet received
+        :return: True if a complete message is available in the packeter payload
+        """
+        buffer = self._packeter.buffer
+        available = self._transport.any()
+        free = self._packeter.buffer_size - buffer.getSize()
+        if available and free:
+            n_bytes = self._transport.readinto(self._rx_view[0:min(available, free)])
+            if n_bytes:
+                buffer.extend(self._rx_view[0:n_bytes])
+                self._update_pacer.received += n_bytes
+            self._telemetry_stats.record_backlog(available, buffer.getSize())
+        return self._packeter.checkPayload()
 
     def _parse_message(self) -> int:
         """
-        Parse a received message
+        Parse a received message, dispatching it to the handler registered for its code
         :return: -1 if parse error 0 if ok
         """
         code = self._packeter.payloadTop()
-        if code == ord('j'):
-            # joint speed
-            _, self.left_wheel._speed, self.right_wheel._speed = self._packeter.unpacketC2F()
-        elif code == ord('l'):
-            # line sensor
-            _, self._left_line, self._center_line, self._right_line = self._packeter.unpacketC3I()
-        elif code == ord('c'):
-            # color sensor
-            _, self._red, self._green, self._blue = self._packeter.unpacketC3I()
-        elif code == ord('i'):
-            # imu
-            _, self._ax, self._ay, self._az, self._gx, self._gy, self._gz = self._packeter.unpacketC6F()
-        elif code == ord('p'):
-            # battery percentage
-            _, battery_perc = self._packeter.unpacketC1F()
-            self._battery_is_charging = battery_perc > 0
-            self._battery_perc = abs(battery_perc)
-        elif code == ord('d'):
-            # distance sensor
-            _, self._left_tof, self._center_tof, self._right_tof = self._packeter.unpacketC3I()
-        elif code == ord('t'):
-            # touch input
-            _, self._touch_byte = self._packeter.unpacketC1B()
-        elif code == ord('m'):
-            # tilt/shake input
-            _, self._move_byte = self._packeter.unpacketC1B()
-        elif code == ord('b'):
-            # behaviour
-            _, self._behaviour = self._packeter.unpacketC1B()
-        elif code == ord('f'):
-            # tof matrix
-            (_, self._left_tof, self._center_left_tof, self._center_tof,
-             self._center_right_tof, self._right_tof, self._top_tof, self._bottom_tof) = self._packeter.unpacketC7I()
-        elif code == ord('q'):
-            # imu position
-            _, self._roll, self._pitch, self._yaw = self._packeter.unpacketC3F()
-        elif code == ord('w'):
-            # wheels position
-            _, self.left_wheel._position, self.right_wheel._position = self._packeter.unpacketC2F()
-        elif code == ord('v'):
-            # robot velocity
-            _, self._linear_velocity, self._angular_velocity = self._packeter.unpacketC2F()
-        elif code == ord('x'):
-            # robot ack
-            if self._waiting_ack is not None:
-                _, self._last_ack = self._packeter.unpacketC1B()
-            else:
-                self._packeter.unpacketC1B()
-                self._last_ack = 0x00
-        elif code == ord('z'):
-            # robot ack
-            _, self._x, self._y, self._theta = self._packeter.unpacketC3F()
-        elif code == 0x7E:
-            # firmware version
-            _, *self._fw_version = self._packeter.unpacketC3B()
-        else:
+        handler = self._message_handlers.get(code)
+        if handler is None:
             return -1
-
+        now = ticks_ms()
+        self._telemetry_stats.record(code, now)
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.record(now, self._packeter.payload, self._packeter.codecs[code][1])
+        message = self._packeter.unpacket()
+        user_handler = self._user_handler_codes[code]
+        self._sensors.begin_write()
+        try:
+            if not user_handler:
+                handler(message)
+            self._sequence += 1
+            self._message_sequence[code] = self._sequence
+            self._message_ticks[code] = now
+        finally:
+            self._sensors.end_write()
+        if user_handler:
+            # out of the write window, so that it can read the sensors
+            handler(message)
         return 0
 
+    def register_message_handler(self, code: int | str, packet_format: (str, int), handler: callable) -> None:
+        """
+        Registers the handler of a message received from the robot, e.g. a message type of a newer firmware.
+        A handler registered for one of the built-in codes replaces the built-in one.
+        The handler runs in the update thread once the sensors are published, so it can call the getters;
+        keep it short and never wait for the robot in it (e.g. a blocking move)
+        :param code: the message code, as int or single char
+        :param packet_format: the ucPack packet format of the message (e.g. PACKET_C3F)
+        :param handler: callable receiving the unpacked message as a tuple (code, value1, value2, ...)
+        :return:
+        """
+        self._set_message_handler(code, packet_format, handler, True)
+
+    def _set_message_handler(self, code: int | str, packet_format: (str, int), handler: callable,
+                             user: bool) -> None:
+        """
+        Sets the handler of a message code. Built-in handlers run inside the sensors write window and
+        only write the sensors, user handlers run after it
+        :param code: the message code, as int or single char
+        :param packet_format: the ucPack packet format of the message
+        :param handler: callable receiving the unpacked message
+        :param user: True for a handler registered by the user
+        :return:
+        """
+        if isinstance(code, str):
+            code = ord(code)
+        code &= 0xFF
+        self._packeter.registerCodec(code, packet_format)
+        self._message_handlers[code] = handler
+        self._user_handler_codes[code] = 1 if user else 0
+        self._telemetry_stats.add_code(code)
+
+    def get_frame_counts(self) -> dict:
+        """
+        Returns how many messages have been received for each message code
+        :return: dictionary of message code (as char) and count
+        """
+        return self._telemetry_stats.get_counts()
+
+    def get_message_age(self, code: int | str) -> int | None:
+        """
+        Returns how long ago the last message with the given code was received
+        :param code: the message code, as int or single char (e.g. 'i' for the IMU)
+        :return: age in milliseconds, None if no message was received yet
+        """
+        if isinstance(code, str):
+            code = ord(code)
+        if not self._message_sequence[code]:
+            return None
+        return ticks_diff(ticks_ms(), self._message_ticks[code])
+
+    def _snapshot_entry(self, now: int, value: int | tuple, n: int, *codes: str) -> dict:
+        """
+        Builds a snapshot entry with the most recent of the given message codes
+        :param now: ticks_ms of the snapshot
+        :param value: offset of the values in the sensor state, or a tuple of values not kept in it
+        :param n: number of values in the sensor state
+        :param codes: the message codes updating the values
+        :return:
+        """
+        sequence = 0
+        ticks = 0
+        for code in codes:
+            if self._message_sequence[ord(code)] > sequence:
+                sequence = self._message_sequence[ord(code)]
+                ticks = self._message_ticks[ord(code)]
+        if not sequence:
+            return {'value': None, 'age_ms': None, 'sequence': None}
+        if isinstance(value, int):
+            value = self._sensors.read_unsafe(value, n)
+        return {'value': value, 'age_ms': ticks_diff(now, ticks), 'sequence': sequence}
+
+    def get_snapshot(self) -> dict:
+        """
+        Returns a consistent view of all the sensor readouts, in robot units (mm, deg, rpm, mm/s, deg/s).
+        Each entry has the value, its age in milliseconds and the sequence number of the message that updated it,
+        so that control loops can skip stale data
+        :return: dictionary of sensor entries, plus the overall sequence number and the snapshot ticks_ms
+        """
+        sensors = self._sensors
+        while True:
+            version = sensors.read_begin()
+            now = ticks_ms()
+            snapshot = {
+                'sequence': self._sequence,
+                'ticks': now,
+                'wheels_speed': self._snapshot_entry(now, _ArduinoAlvikSensorState.WHEELS_SPEED, 2, 'j'),
+                'wheels_position': self._snapshot_entry(now, _ArduinoAlvikSensorState.WHEELS_POSITION, 2, 'w'),
+                'drive_speed': self._snapshot_entry(now, _ArduinoAlvikSensorState.DRIVE_SPEED, 2, 'v'),
+                'pose': self._snapshot_entry(now, _ArduinoAlvikSensorState.POSE, 3, 'z'),
+                'imu': self._snapshot_entry(now, _ArduinoAlvikSensorState.IMU, 6, 'i'),
+                'orientation': self._snapshot_entry(now, _ArduinoAlvikSensorState.ORIENTATION, 3, 'q'),
+                'line_sensors': self._snapshot_entry(now, _ArduinoAlvikSensorState.LINE_SENSORS, 3, 'l'),
+                'color': self._snapshot_entry(now, _ArduinoAlvikSensorState.COLOR, 3, 'c'),
+                'distance': self._snapshot_entry(now, _ArduinoAlvikSensorState.DISTANCE, 7, 'd', 'f'),
+                'battery': self._snapshot_entry(now, (self._battery_perc, self._battery_is_charging), 0, 'p'),
+                'touch': self._snapshot_entry(now, (self._touch_byte,), 0, 't'),
+                'move': self._snapshot_entry(now, (self._move_byte,), 0, 'm')
+            }
+            if not sensors.read_retry(version):
+                return snapshot
+
+    def start_recording(self, file_path: str = 'telemetry.bin', ring_size: int = 8192, block_size: int = 2048):
+        """
+        Starts recording every message received from the robot (code, timestamp and raw payload) to a binary log.
+        Messages are buffered in RAM and written to flash in blocks, use tools/read_telemetry_log.py to load the log
+        :param file_path: path of the log file, overwritten if it exists
+        :param ring_size: size of the RAM ring buffer in bytes, messages are dropped when it is full
+        :param block_size: number of bytes written to the file at once
+        :return:
+        """
+        self.stop_recording()
+        self._recorder = TelemetryRecorder(file_path, self._packeter.codecs, ring_size, block_size)
+
+    def stop_recording(self) -> dict | None:
+        """
+        Stops recording, writing the buffered messages to the log file
+        :return: number of recorded and dropped messages, None if not recording
+        """
+        recorder = self._recorder
+        if recorder is None:
+            return None
+        self._recorder = None
+        recorder.close()
+        return {'records': recorder.records, 'dropped': recorder.dropped}
+
+    def get_telemetry_stats(self) -> dict:
+        """
+        Returns the statistics of the messages received from the robot: per message code counts, rates (Hz) and
+        inter-arrival time histograms, parser errors and the high-water marks of the receive buffers
+        :return: dictionary of statistics
+        """
+        return self._telemetry_stats.get_stats()
+
+    def reset_telemetry_stats(self) -> None:
+        """
+        Resets the statistics of the messages received from the robot
+        :return:
+        """
+        self._telemetry_stats.reset()
+
+    def set_command_rate(self, rate: float = 50) -> None:
+        """
+        Sets the control rate of the setpoint commands (wheels speed, drive, LEDs and servos).
+        Only the last setpoint of each kind is sent, unchanged setpoints are not sent again
+        and all of them are written together at most rate times per second
+        :param rate: control rate (Hz), 0 or None writes every command as soon as it is called (default behaviour)
+        :return:
+        """
+        self._commands.set_rate(rate)
+
+    def get_command_stats(self) -> dict:
+        """
+        Returns the statistics of the commands sent to the robot: submitted, coalesced and suppressed setpoints,
+        number of writes and bytes written
+        :return: dictionary of statistics
+        """
+        return self._commands.get_stats()
+
+    def set_update_delay(self, min_delay: int = UPDATE_MIN_DELAY_MS, max_delay: int = UPDATE_MAX_DELAY_MS) -> None:
+        """
+        Sets the delay of the update loop: it runs every min_delay ms while bytes are arriving from the robot,
+        and backs off doubling the delay up to max_delay ms while the link is idle.
+        A higher max_delay leaves more CPU time to user code and BLE, but delays the processing of the telemetry
+        :param min_delay: minimum delay (ms)
+        :param max_delay: maximum delay (ms)
+        :return:
+        """
+        self._update_pacer.set_delays(min_delay, max_delay)
+
+    def get_update_stats(self) -> dict:
+        """
+        Returns the statistics of the update loop: number of loops, average delay (ms)
+        and duty cycle (fraction of the time spent reading and parsing instead of sleeping)
+        :return: dictionary of statistics
+        """
+        return self._update_pacer.get_stats()
+
+    def reset_update_stats(self) -> None:
+        """
+        Resets the statistics of the update loop
+        :return:
+        """
+        self._update_pacer.reset_stats()
+
+    def batch(self):
+        """
+        Returns a context manager that packs all the commands sent inside it back to back
+        and writes them to the robot with a single write when it exits, e.g.:
+            with alvik.batch():
+                alvik.left_led.set_color(1, 0, 0)
+                alvik.right_led.set_color(0, 0, 1)
+                alvik.set_wheels_speed(10, 10)
+        With a command rate set (see set_command_rate), the setpoints keep their rate: those not yet due when
+        the batch exits are written by the next flush of the control period.
+        Nothing is written before the batch exits, so the robot cannot be waited for inside it: the blocking motion
+        calls (move, rotate, set_wheels_position, wheel set_position and motion_queue.wait_done) raise RuntimeError,
+        use blocking=False and wait after the batch
+        :return:
+        """
+        return self._commands
+
+    def _register_message_handlers(self) -> None:
+        """
+        Registers the handlers of the messages sent by the robot firmware
+        :return:
+        """
+        self._set_message_handler('j', PACKET_C2F, self._on_joint_speed, False)
+        self._set_message_handler('l', PACKET_C3I, self._on_line_sensors, False)
+        self._set_message_handler('c', PACKET_C3I, self._on_color_sensor, False)
+        self._set_message_handler('i', PACKET_C6F, self._on_imu, False)
+        self._set_message_handler('p', PACKET_C1F, self._on_battery, False)
+        self._set_message_handler('d', PACKET_C3I, self._on_distance, False)
+        self._set_message_handler('t', PACKET_C1B, self._on_touch, False)
+        self._set_message_handler('m', PACKET_C1B, self._on_move, False)
+        self._set_message_handler('b', PACKET_C1B, self._on_behaviour, False)
+        self._set_message_handler('f', PACKET_C7I, self._on_tof_matrix, False)
+        self._set_message_handler('q', PACKET_C3F, self._on_orientation, False)
+        self._set_message_handler('w', PACKET_C2F, self._on_wheels_position, False)
+        self._set_message_handler('v', PACKET_C2F, self._on_velocity, False)
+        self._set_message_handler('x', PACKET_C1B, self._on_ack, False)
+        self._set_message_handler('z', PACKET_C3F, self._on_pose, False)
+        self._set_message_handler(0x7E, PACKET_C3B, self._on_fw_version, False)
+
+    def _on_joint_speed(self, message: tuple) -> None:
+        # joint speed
+        self._sensors.write(_ArduinoAlvikSensorState.WHEELS_SPEED, message)
+
+    def _on_line_sensors(self, message: tuple) -> None:
+        # line sensor
+        self._sensors.write(_ArduinoAlvikSensorState.LINE_SENSORS, message)
+
+    def _on_color_sensor(self, message: tuple) -> None:
+        # color sensor
+        self._sensors.write(_ArduinoAlvikSensorState.COLOR, message)
+
+    def _on_imu(self, message: tuple) -> None:
+        # imu
+        self._sensors.write(_ArduinoAlvikSensorState.IMU, message)
+
+    def _on_battery(self, message: tuple) -> None:
+        # battery percentage
+        battery_perc = message[1]
+        self._battery_is_charging = battery_perc > 0
+        self._battery_perc = abs(battery_perc)
+
+    def _on_distance(self, message: tuple) -> None:
+        # distance sensor
+        # left, center and right of the left, center_left, center, center_right, right, top, bottom tof values
+        self._sensors.write(_ArduinoAlvikSensorState.DISTANCE, message, stride=2)
+
+    def _on_touch(self, message: tuple) -> None:
+        # touch input
+        self._touch_byte = message[1]
+
+    def _on_move(self, message: tuple) -> None:
+        # tilt/shake input
+        self._move_byte = message[1]
+
+    def _on_behaviour(self, message: tuple) -> None:
+        # behaviour
+        self._behaviour = message[1]
+
+    def _on_tof_matrix(self, message: tuple) -> None:
+        # tof matrix
+        self._sensors.write(_ArduinoAlvikSensorState.DISTANCE, message)
+
+    def _on_orientation(self, message: tuple) -> None:
+        # imu position
+        self._sensors.write(_ArduinoAlvikSensorState.ORIENTATION, message)
+
+    def _on_wheels_position(self, message: tuple) -> None:
+        # wheels position
+        self._sensors.write(_ArduinoAlvikSensorState.WHEELS_POSITION, message)
+
+    def _on_velocity(self, message: tuple) -> None:
+        # robot velocity
+        self._sensors.write(_ArduinoAlvikSensorState.DRIVE_SPEED, message)
+
+    def _on_ack(self, message: tuple) -> None:
+        # robot ack
+        ack = message[1]
+        if ack == 0x00 or ticks_diff(ticks_ms(), self._ack_ticks) > ACK_GUARD_MS:
+            # the robot has processed the last X K: the acks received from now on are not stale
+            self._ack_cleared = True
+        if self._waiting_ack is None:
+            self._last_ack = 0x00
+            return
+        self._last_ack = ack
+        if ack != 0x00 and ack == self._waiting_ack and self._ack_cleared:
+            # answered by _acknowledge_target once the sensors write window is closed
+            self._target_reached = True
+
+    def _on_pose(self, message: tuple) -> None:
+        # robot pose
+        self._sensors.write(_ArduinoAlvikSensorState.POSE, message)
+
+    def _on_fw_version(self, message: tuple) -> None:
+        # firmware version
+        self._fw_version = list(message[1:])
+
     def get_battery_charge(self) -> int | None:
         """
         Returns the battery SOC
@@ -887,10 +1270,17 @@ class ArduinoAlvik:
             blue_avg += blue
             sleep_ms(10)
 
-        red_avg = int(red_avg / 100)
-        green_avg = int(green_avg / 100)
-        blue_avg = int(blue_avg / 100)
+        self._save_color_calibration(background, int(red_avg / 100), int(green_avg / 100), int(blue_avg / 100))
 
+    def _save_color_calibration(self, background: str, red_avg: int, green_avg: int, blue_avg: int) -> None:
+        """
+        Sets the color calibration and saves it to color_calibration.py
+        :param background: str white or black
+        :param red_avg: average raw red reading
+        :param green_avg: average raw green reading
+        :param blue_avg: average raw blue reading
+        :return:
+        """
         if background == 'white':
             self._white_cal = [red_avg, green_avg, blue_avg]
         elif background == 'black':
@@ -927,7 +1317,7 @@ class ArduinoAlvik:
         :return: red, green, blue
         """
 
-        return self._red, self._green, self._blue
+        return self._sensors.read(_ArduinoAlvikSensorState.COLOR, 3, integer=True)
 
     def _normalize_color(self, r: float, g: float, b: float) -> (float, float, float):
         """
@@ -1065,11 +1455,8 @@ class ArduinoAlvik:
         :return: left_tof, center_left_tof, center_tof, center_right_tof, right_tof
         """
 
-        return (convert_distance(self._left_tof, 'mm', unit),
-                convert_distance(self._center_left_tof, 'mm', unit),
-                convert_distance(self._center_tof, 'mm', unit),
-                convert_distance(self._center_right_tof, 'mm', unit),
-                convert_distance(self._right_tof, 'mm', unit))
+        return tuple(convert_array(convert_distance, self._sensors.read(_ArduinoAlvikSensorState.DISTANCE, 5),
+                                   'mm', unit))
 
     def get_distance_top(self, unit: str = 'cm') -> float | None:
         """
@@ -1077,7 +1464,7 @@ class ArduinoAlvik:
         :param unit:
         :return:
         """
-        return convert_distance(self._top_tof, 'mm', unit)
+        return convert_distance(self._sensors.read(_ArduinoAlvikSensorState.DISTANCE + 5, 1)[0], 'mm', unit)
 
     def get_distance_bottom(self, unit: str = 'cm') -> float | None:
         """
@@ -1085,7 +1472,7 @@ class ArduinoAlvik:
         :param unit:
         :return:
         """
-        return convert_distance(self._bottom_tof, 'mm', unit)
+        return convert_distance(self._sensors.read(_ArduinoAlvikSensorState.DISTANCE + 6, 1)[0], 'mm', unit)
 
     def get_version(self, version: str = 'fw') -> str:
         """
@@ -1138,15 +1525,24 @@ class ArduinoAlvik:
         print(f'REQUIRED FW VERSION: {self._required_fw_version}')
         print(f'FIRMWARE VERSION: {self._fw_version}')
 
+        left_tof, center_left_tof, center_tof, center_right_tof, right_tof, top_tof, bottom_tof = \
+            self._sensors.read(_ArduinoAlvikSensorState.DISTANCE, 7, integer=True)
+        left_line, center_line, right_line = self.get_line_sensors()
+        ax, ay, az, gx, gy, gz = self.get_imu()
+        x, y, theta = self._sensors.read(_ArduinoAlvikSensorState.POSE, 3)
+        roll, pitch, yaw = self.get_orientation()
+        red, green, blue = self.get_color_raw()
+        linear_velocity, angular_velocity = self._sensors.read(_ArduinoAlvikSensorState.DRIVE_SPEED, 2)
+
         print('---SENSORS---')
-        print(f'TOF: T:{self._top_tof} B:{self._bottom_tof} L:{self._left_tof} CL:{self._center_left_tof}' +
-              f' C:{self._center_tof} CR:{self._center_right_tof} R:{self._right_tof}')
-        print(f'LINE: L:{self._left_line} C:{self._center_line} R:{self._right_line}')
-        print(f'ACC: X:{self._ax} Y:{self._ay} Z:{self._az}')
-        print(f'GYR: X:{self._gx} Y:{self._gy} Z:{self._gz}')
-        print(f'POS: X:{self._x} Y:{self._y} TH:{self._theta}')
-        print(f'IMU: ROLL:{self._roll} PITCH:{self._pitch} YAW:{self._yaw}')
-        print(f'COLOR: R:{self._red} G:{self._green} B:{self._blue}')
+        print(f'TOF: T:{top_tof} B:{bottom_tof} L:{left_tof} CL:{center_left_tof}' +
+              f' C:{center_tof} CR:{center_right_tof} R:{right_tof}')
+        print(f'LINE: L:{left_line} C:{center_line} R:{right_line}')
+        print(f'ACC: X:{ax} Y:{ay} Z:{az}')
+        print(f'GYR: X:{gx} Y:{gy} Z:{gz}')
+        print(f'POS: X:{x} Y:{y} TH:{theta}')
+        print(f'IMU: ROLL:{roll} PITCH:{pitch} YAW:{yaw}')
+        print(f'COLOR: R:{red} G:{green} B:{blue}')
         print(f'BATT(%) {self._battery_perc}')
 
         print('---COMMUNICATION---')
@@ -1154,8 +1550,8 @@ class ArduinoAlvik:
         print(f'LAST ACK: {self._last_ack}')
 
         print('---MOTORS---')
-        print(f'LINEAR VEL: {self._linear_velocity}')
-        print(f'ANGULAR VEL: {self._angular_velocity}')
+        print(f'LINEAR VEL: {linear_velocity}')
+        print(f'ANGULAR VEL: {angular_velocity}')
 
     def set_timer(self, mode: str, period: int, callback: callable, args: tuple = ()) -> None:
         """
@@ -1318,7 +1714,7 @@ class ArduinoAlvik:
     def _update_events(self, delay_: int = 100):
         """
         Updates the touch state so that touch events can be generated
-        :param delay_:
+        :param delay_: sampling period of the touch and move events
         :return:
         """
         while True:
@@ -1331,7 +1727,23 @@ class ArduinoAlvik:
                 self._timer_events.update_state(ticks_ms())
                 # MORE events update callbacks to be added
 
-            sleep_ms(delay_)
+            sleep_ms(self._events_delay(delay_))
+
+    def _events_delay(self, delay_: int) -> int:
+        """
+        Returns the delay of the events loop: touch and move events are sampled every delay_ ms, the timer is served
+        when it expires, and with nothing to sample the loop backs off to EVENTS_MAX_DELAY_MS
+        :param delay_: sampling period of the touch and move events
+        :return: the delay (ms)
+        """
+        if self._touch_events.has_callbacks() or self._move_events.has_callbacks():
+            delay = delay_
+        else:
+            delay = EVENTS_MAX_DELAY_MS
+        remaining = self._timer_events.time_to_trigger()
+        if 0 <= remaining < delay:
+            delay = remaining
+        return delay
 
     @classmethod
     def _stop_events_thread(cls):
@@ -1342,144 +1754,1370 @@ class ArduinoAlvik:
         cls._events_thread_running = False
 
 
-class _ArduinoAlvikI2C:
+class _ArduinoAlvikCommandScheduler:
+    """
+    Packs and writes the commands to the robot.
+    Frames are packed in place in a preallocated output buffer, never in the shared ucPack msg.
+    When a control rate is set, the setpoint commands (wheels speed, drive, LEDs and servos) are coalesced in slots:
+    only the last value of each slot is sent, values equal to the last sent ones are suppressed and the pending
+    slots are flushed with a single write at most once per control period.
+    All the other commands are written at once, preceded by the pending setpoints to keep the order.
+    Inside a batch the commands are packed back to back and written together when the batch ends: the setpoints
+    still go through their slots and join the batch only when the control period is elapsed (or before a command),
+    so a batch groups the writes without bypassing the control rate.
+    Packing and writing happen under a lock, so commands sent by different threads never clobber each other
+    """
 
-    _main_thread_id = None
+    MOTION = 0          # J and V frames
+    LEFT_WHEEL = 1      # W L V frames
+    RIGHT_WHEEL = 2     # W R V frames
+    LEDS = 3
+    SERVOS = 4
+    N_SLOTS = 5
+    SLOT_SIZE = 16      # the largest setpoint frame (C2F) is 13 bytes
 
-    def __init__(self, sda: int, scl: int):
+    def __init__(self, transport, packeter: ucPack, batch_size: int = 256):
         """
-        Alvik I2C wrapper
-        :param sda:
-        :param scl:
+        Command scheduler initialization, coalescing is disabled until a control rate is set
+        :param transport: the transport commands are written to
+        :param packeter: the ucPack defining the frame format
+        :param batch_size: bytes of commands that can be packed before a write (the largest frame is 37 bytes)
         """
+        self._transport = transport
+        self._packeter = packeter
         self._lock = _thread.allocate_lock()
+        self._period = 0
+        self._last_flush = ticks_ms()
+        self._frames = bytearray(self.N_SLOTS * self.SLOT_SIZE)
+        self._sizes = bytearray(self.N_SLOTS)
+        self._sent = bytearray(self.N_SLOTS * self.SLOT_SIZE)
+        self._sent_sizes = bytearray(self.N_SLOTS)
+        self._pending = 0
+        # output buffer: the pending setpoints are copied right before _tail, where commands and batches are packed
+        self._tail = self.N_SLOTS * self.SLOT_SIZE
+        self._out = bytearray(self._tail + batch_size)
+        self._out_view = memoryview(self._out)
+        self._batch_depth = 0
+        self._batch_size = 0
+        self._batch_owner = None
+        self.reset_stats()
 
-        self._is_single_thread = False
-
-        self.sda = sda
-        self.scl = scl
-
-    def set_main_thread(self, thread_id: int):
+    def reset_stats(self) -> None:
         """
-        Sets the main thread of control. It will be the only thread allowed if set_single_thread is True
+        Resets the counters
+        :return:
         """
-        with self._lock:
-            self.__class__._main_thread_id = thread_id
+        self.submitted = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self.writes = 0
+        self.bytes_written = 0
 
-    def set_single_thread(self, value):
+    def get_stats(self) -> dict:
         """
-        Sets the single thread mode on/off.
-        In single mode only the main thread is allowed to access the bus
+        Returns the counters
+        :return:
         """
-        self._is_single_thread = value
+        return {
+            'rate': 1000 / self._period if self._period else 0,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'suppressed': self.suppressed,
+            'writes': self.writes,
+            'bytes_written': self.bytes_written,
+        }
 
-    def is_accessible(self):
+    def set_rate(self, rate: float) -> None:
         """
-        Returns True if bus is accessible by the current thread
+        Sets the control rate
+        :param rate: maximum number of setpoint writes per second, 0 or None disables coalescing
+        :return:
         """
-        return not self._is_single_thread or _thread.get_ident() == self.__class__._main_thread_id
+        held = self._acquire()
+        try:
+            if self._pending and not self._batch_depth:
+                self._flush(ticks_ms())
+            self._period = int(1000 / rate) if rate else 0
+            self._invalidate()
+        finally:
+            if held:
+                self._lock.release()
 
-    def start(self):
+    def invalidate(self) -> None:
         """
-        Bitbanging start condition
+        Forgets the last sent setpoints, so that the next ones are written even if unchanged (e.g. after a reset)
         :return:
         """
-        _SDA = Pin(self.sda, Pin.OUT)
-        _SDA.value(1)
-        sleep_ms(100)
-        _SDA.value(0)
+        held = self._acquire()
+        try:
+            self._invalidate()
+        finally:
+            if held:
+                self._lock.release()
 
-    def init(self, scl, sda, freq=400_000) -> None:
+    def _invalidate(self) -> None:
+        for slot in range(0, self.N_SLOTS):
+            self._sent_sizes[slot] = 0
+
+    def _acquire(self) -> bool:
         """
-        init method just for call compatibility
+        Takes the lock, unless the calling thread already holds it for a batch
+        :return: True if the caller has to release the lock
         """
-        print("AlvikWarning:: init Unsupported. Alvik defines/initializes its own I2C bus")
+        if self._batch_owner == _thread.get_ident():
+            return False
+        self._lock.acquire()
+        return True
 
-    def deinit(self):
+    def begin_batch(self) -> None:
         """
-        deinit method just for call compatibility
+        Starts packing the commands without writing them.
+        The calling thread owns the batch: commands sent by the other threads wait until the batch ends
+        :return:
         """
-        print("AlvikWarning:: deinit Unsupported. Alvik defines/initializes its own I2C bus")
+        if self._acquire():
+            self._batch_owner = _thread.get_ident()
+        self._batch_depth += 1
 
-    def stop(self):
-        """ Bitbanging stop condition (untested)
+    def end_batch(self) -> None:
+        """
+        Writes all the commands packed since begin_batch with a single write
         :return:
         """
-        _SDA = Pin(self.sda, Pin.OUT)
-        _SDA.value(0)
-        sleep_ms(100)
-        _SDA.value(1)
+        if self._batch_owner != _thread.get_ident():
+            raise RuntimeError('end_batch called by a thread not owning the batch')
+        self._batch_depth -= 1
+        if self._batch_depth:
+            return
+        try:
+            now = ticks_ms()
+            if self._pending and ticks_diff(now, self._last_flush) >= self._period:
+                self._append_pending(now)
+            if self._batch_size:
+                self._flush_batch()
+        finally:
+            self._batch_size = 0
+            self._batch_owner = None
+            self._lock.release()
 
-    def scan(self) -> list[int]:
+    def __enter__(self):
+        self.begin_batch()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_batch()
+
+    def submit(self, slot: int, packet_format: (str, int), code: int, *values) -> None:
         """
-        I2C scan method
+        Submits a setpoint command
+        :param slot: the slot the command belongs to
+        :param packet_format: ucPack packet format
+        :param code: command code
+        :param values: the values to pack, already fitting their struct types
         :return:
         """
-        if not self.is_accessible():
-            return []
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.scan()
+        held = self._acquire()
+        try:
+            self._submit(slot, packet_format, code, values)
+        finally:
+            if held:
+                self._lock.release()
 
-    def readfrom(self, addr, nbytes, stop=True) -> bytes:
+    def _submit(self, slot: int, packet_format: (str, int), code: int, values: tuple) -> None:
+        self.submitted += 1
+        if not self._period:
+            self._send(packet_format, code, values)
+            return
+
+        bit = 1 << slot
+        if slot == self.MOTION:
+            # J and V set both wheels, overriding the single wheel setpoints
+            superseded = self._pending & ((1 << self.LEFT_WHEEL) | (1 << self.RIGHT_WHEEL))
+            if superseded:
+                self._pending &= ~superseded
+                self.coalesced += 1
+            self._sent_sizes[self.LEFT_WHEEL] = 0
+            self._sent_sizes[self.RIGHT_WHEEL] = 0
+        elif slot == self.LEFT_WHEEL or slot == self.RIGHT_WHEEL:
+            self._sent_sizes[self.MOTION] = 0
+
+        if self._pending & bit:
+            self.coalesced += 1
+            self._pending &= ~bit
+
+        base = slot * self.SLOT_SIZE
+        size = self._packeter.packetInto(self._frames, base, packet_format, code, *values)
+        if self._sent_sizes[slot] == size and self._equal(self._sent, self._frames, base, size):
+            self.suppressed += 1
+            return
+
+        self._sizes[slot] = size
+        self._pending |= bit
+        now = ticks_ms()
+        if ticks_diff(now, self._last_flush) >= self._period:
+            if self._batch_depth:
+                self._append_pending(now)
+            else:
+                self._flush(now)
+
+    def send(self, packet_format: (str, int), code: int, *values) -> None:
         """
-        Wrapping i2c readfrom
+        Sends a command at once, after the pending setpoints
+        :param packet_format: ucPack packet format
+        :param code: command code
+        :param values: the values to pack, already fitting their struct types
+        :return:
         """
-        if not self.is_accessible():
-            return bytes(nbytes)
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.readfrom(addr, nbytes, stop)
+        held = self._acquire()
+        try:
+            self._send_command(packet_format, code, values)
+        finally:
+            if held:
+                self._lock.release()
 
-    def writeto(self, addr, buf, stop=True) -> int:
+    def try_send(self, packet_format: (str, int), code: int, *values) -> bool:
         """
-        Wrapping i2c writeto
+        Sends a command like send, unless another thread is sending or owns a batch: it never waits
+        :param packet_format: ucPack packet format
+        :param code: command code
+        :param values: the values to pack, already fitting their struct types
+        :return: True if the command was sent (or appended to the batch of the calling thread)
         """
-        if not self.is_accessible():
-            return 0
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.writeto(addr, buf, stop)
+        if self._batch_owner == _thread.get_ident():
+            held = False
+        elif self._lock.acquire(0):
+            held = True
+        else:
+            return False
+        try:
+            self._send_command(packet_format, code, values)
+        finally:
+            if held:
+                self._lock.release()
+        return True
 
-    def readinto(self, buf, nack=True) -> None:
+    def _send_command(self, packet_format: (str, int), code: int, values: tuple) -> None:
+        self._send(packet_format, code, values)
+        # the robot may leave the speed control (e.g. move, rotate), the next setpoints are always written
+        self._sent_sizes[self.MOTION] = 0
+        self._sent_sizes[self.LEFT_WHEEL] = 0
+        self._sent_sizes[self.RIGHT_WHEEL] = 0
+
+    def in_batch(self) -> bool:
         """
-        Wrapping i2c readinto
+        Returns True if the calling thread owns a batch
+        :return:
         """
-        if not self.is_accessible():
-            return
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.readinto(buf, nack)
+        return self._batch_owner == _thread.get_ident()
 
-    def write(self, buf) -> int:
+    def flush(self) -> None:
         """
-        Wrapping i2c write
+        Writes the pending setpoints at once, without waiting for the control period (e.g. to stop the robot).
+        Inside a batch they are appended to it
+        :return:
         """
-        if not self.is_accessible():
-            return 0
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.write(buf)
+        held = self._acquire()
+        try:
+            if self._pending:
+                if self._batch_depth:
+                    self._append_pending(ticks_ms())
+                else:
+                    self._flush(ticks_ms())
+        finally:
+            if held:
+                self._lock.release()
 
-    def readfrom_into(self, addr, buf, stop=True) -> None:
+    def time_to_service(self, now: int) -> int:
         """
-        Wrapping i2c readfrom_into
+        Returns the time left before the pending setpoints are due
+        :param now: ticks_ms
+        :return: ms, -1 if no setpoint is pending
         """
-        if not self.is_accessible():
-            return
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.readfrom_into(addr, buf, stop)
+        if not self._pending:
+            return -1
+        remaining = self._period - ticks_diff(now, self._last_flush)
+        return remaining if remaining > 0 else 0
 
-    def writevto(self, addr, vector, stop=True) -> int:
+    def service(self) -> None:
         """
-        Wrapping i2c writevto
+        Flushes the pending setpoints if the control period is elapsed. Meant to be called periodically,
+        it never waits: nothing is done while another thread is sending or owns a batch
+        :return:
         """
-        if not self.is_accessible():
+        if not self._pending or self._batch_owner is not None:
+            return
+        if not self._lock.acquire(0):
+            return
+        try:
+            now = ticks_ms()
+            if self._pending and ticks_diff(now, self._last_flush) >= self._period:
+                self._flush(now)
+        finally:
+            self._lock.release()
+
+    def _send(self, packet_format: (str, int), code: int, values: tuple) -> None:
+        """
+        Packs a command after the pending setpoints and writes it, or appends it to the batch
+        :return:
+        """
+        size = packet_format[1] + 4
+        if self._batch_depth:
+            if self._pending:
+                # the pending setpoints precede the command, as outside a batch
+                self._append_pending(ticks_ms())
+            if not self._reserve(size):
+                self._flush_batch()
+            self._packeter.packetInto(self._out, self._tail + self._batch_size, packet_format, code, *values)
+            self._batch_size += size
+            return
+        self._packeter.packetInto(self._out, self._tail, packet_format, code, *values)
+        if self._pending:
+            self._flush(ticks_ms(), size)
+        else:
+            self._write(self._out_view[self._tail:self._tail + size])
+
+    def _reserve(self, size: int) -> bool:
+        """
+        Returns True if size bytes fit in the batch
+        :return:
+        """
+        return self._tail + self._batch_size + size <= len(self._out)
+
+    def _flush_batch(self) -> None:
+        """
+        Writes the commands packed in the batch
+        :return:
+        """
+        self._write(self._out_view[self._tail:self._tail + self._batch_size])
+        self._batch_size = 0
+
+    def _append_pending(self, now: int) -> None:
+        """
+        Appends the pending setpoints to the batch
+        :param now: current ticks_ms
+        :return:
+        """
+        for slot in range(0, self.N_SLOTS):
+            if not self._pending & (1 << slot):
+                continue
+            size = self._sizes[slot]
+            if not self._reserve(size):
+                self._flush_batch()
+            base = slot * self.SLOT_SIZE
+            start = self._tail + self._batch_size
+            self._out[start:start + size] = self._frames[base:base + size]
+            self._batch_size += size
+            self._remember(slot, size)
+        self._pending = 0
+        self._last_flush = now
+
+    def _flush(self, now: int, tail_size: int = 0) -> None:
+        """
+        Writes all the pending setpoints, followed by tail_size bytes packed at _tail, with a single write
+        :param now: current ticks_ms
+        :param tail_size:
+        :return:
+        """
+        out = self._out
+        start = self._tail
+        for slot in range(self.N_SLOTS - 1, -1, -1):
+            if not self._pending & (1 << slot):
+                continue
+            size = self._sizes[slot]
+            base = slot * self.SLOT_SIZE
+            start -= size
+            out[start:start + size] = self._frames[base:base + size]
+            self._remember(slot, size)
+        self._pending = 0
+        self._last_flush = now
+        self._write(self._out_view[start:self._tail + tail_size])
+
+    def _remember(self, slot: int, size: int) -> None:
+        """
+        Saves the frame of a slot as the last sent one
+        :return:
+        """
+        base = slot * self.SLOT_SIZE
+        self._sent[base:base + size] = self._frames[base:base + size]
+        self._sent_sizes[slot] = size
+
+    def _write(self, buf) -> None:
+        self._transport.write(buf)
+        self.writes += 1
+        self.bytes_written += len(buf)
+
+    @staticmethod
+    def _equal(a: bytearray, b: bytearray, offset: int, size: int) -> bool:
+        """
+        Compares size bytes of a and b from offset
+        :return:
+        """
+        for i in range(offset, offset + size):
+            if a[i] != b[i]:
+                return False
+        return True
+
+
+class _ArduinoAlvikMotionQueue:
+    """
+    Queue of motion primitives (move, rotate, arc and wait) executed one after the other.
+    The command of the next primitive is sent by the update thread as soon as the robot acknowledges
+    the target of the previous one, so that a path made of several segments runs without gaps.
+    The queue starts as soon as a primitive is added to it
+    """
+
+    MOVE = 0
+    ROTATE = 1
+    ARC = 2
+    WAIT = 3
+
+    def __init__(self, alvik: ArduinoAlvik):
+        """
+        Motion queue initialization
+        :param alvik: the ArduinoAlvik executing the primitives
+        """
+        self._alvik = alvik
+        self._lock = _thread.allocate_lock()
+        self._idle = _thread.allocate_lock()        # locked while the queue is running
+        self._segments = []
+        self._current = None
+        self._wait_end = 0
+        self._done = 0
+        self._total = 0
+        self._progress_callback = None
+        self._listeners = []
+        self._progress_events = []                  # (done, total) waiting to be notified by service
+        self._command = None                        # command of the running primitive not sent yet
+        alvik._target_listeners.append(self._on_target)
+
+    def move(self, distance: float, unit: str = 'cm'):
+        """
+        Adds a straight movement to the queue
+        :param distance:
+        :param unit: the distance unit
+        :return: the queue, to chain the primitives
+        """
+        return self._add(self.MOVE, convert_distance(distance, unit, 'mm'))
+
+    def rotate(self, angle: float, unit: str = 'deg'):
+        """
+        Adds an in place rotation to the queue
+        :param angle: positive angles turn left
+        :param unit: the angle unit
+        :return: the queue, to chain the primitives
+        """
+        return self._add(self.ROTATE, convert_angle(angle, unit, 'deg'))
+
+    def arc(self, radius: float, angle: float, distance_unit: str = 'cm', angle_unit: str = 'deg'):
+        """
+        Adds a movement along an arc of circle to the queue.
+        The arc starts from the wheels position: it raises ValueError if the robot has not sent it yet
+        :param radius: radius of the arc, measured at the center of the robot
+        :param angle: angle of the arc, positive angles turn left
+        :param distance_unit: unit of the radius
+        :param angle_unit: unit of the angle
+        :return: the queue, to chain the primitives
+        """
+        left, right = self._alvik._sensors.read(_ArduinoAlvikSensorState.WHEELS_POSITION, 2)
+        if left is None:
+            # the arc is planned from the wheels position, that is not received yet
+            raise ValueError('arc added before the wheels position of the robot is known')
+        return self._add(self.ARC, convert_distance(radius, distance_unit, 'mm'),
+                         convert_angle(angle, angle_unit, 'deg'))
+
+    def wait(self, duration: int):
+        """
+        Adds a pause to the queue
+        :param duration: pause duration in milliseconds
+        :return: the queue, to chain the primitives
+        """
+        return self._add(self.WAIT, duration)
+
+    def on_progress(self, callback: callable, args: tuple = ()) -> None:
+        """
+        Registers a callback executed every time a primitive is completed, as callback(done, total, *args).
+        The callback runs in the update loop once the received messages are parsed, so it can read the sensors.
+        Keep it short and never wait for the robot in it (e.g. a blocking move)
+        :param callback: the callable, None to remove it
+        :param args: arguments tuple to pass to the callable after done and total
+        :return:
+        """
+        self._progress_callback = (callback, args) if callback is not None else None
+
+    def get_progress(self) -> (int, int):
+        """
+        Returns the progress of the queue
+        :return: completed primitives, primitives added since the queue started
+        """
+        return self._done, self._total
+
+    def is_done(self) -> bool:
+        """
+        Returns True if all the primitives have been executed
+        :return:
+        """
+        return self._current is None
+
+    def wait_done(self) -> None:
+        """
+        Blocks until all the primitives have been executed or the queue is cancelled.
+        It cannot be called inside a batch (RuntimeError)
+        :return:
+        """
+        self._alvik._check_not_in_batch()
+        self._idle.acquire()
+        self._idle.release()
+
+    def cancel(self) -> None:
+        """
+        Discards the primitives left and stops the robot
+        :return:
+        """
+        if self._abort():
+            self._alvik.brake()
+
+    def _abort(self) -> bool:
+        """
+        Discards the primitives left, without commanding the robot
+        :return: True if the queue was running
+        """
+        with self._lock:
+            running = self._current is not None
+            self._segments = []
+            self._current = None
+            self._command = None
+            if running:
+                self._alvik._cancel_target()
+                self._idle.release()
+                self._progress_events.append((self._done, self._total))
+        return running
+
+    def time_to_service(self, now: int) -> int:
+        """
+        Returns the time left before the running pause is over, 0 if a progress is waiting to be notified
+        and 1 while the command of the running primitive waits for the command scheduler
+        :param now: ticks_ms
+        :return: ms, -1 if no pause is running
+        """
+        if self._progress_events:
             return 0
+        if self._command is not None:
+            return 1
+        if self._current is not self.WAIT:
+            return -1
+        remaining = ticks_diff(self._wait_end, now)
+        return remaining if remaining > 0 else 0
+
+    def service(self) -> None:
+        """
+        Sends the command left by _start_next, ends the running pause when it is over and notifies the progress,
+        it is called by the update thread
+        :return:
+        """
+        if self._command is not None and self._lock.acquire(0):
+            try:
+                if self._command is not None:
+                    self._send_command()
+            finally:
+                self._lock.release()
+        if self._current is self.WAIT and ticks_diff(ticks_ms(), self._wait_end) >= 0:
+            self._advance()
+        if self._progress_events:
+            self._notify()
+
+    def _add(self, *segment):
+        with self._lock:
+            self._segments.append(segment)
+            self._total += 1
+            if self._current is None:
+                self._idle.acquire()
+                self._done = 0
+                self._total = 1
+                self._start_next()
+        return self
+
+    def _on_target(self) -> None:
+        """
+        Target listener: the robot has reached the target of the running primitive
+        :return:
+        """
+        current = self._current
+        if current is None or current is self.WAIT:
+            return
+        self._advance()
+
+    def _advance(self) -> None:
+        with self._lock:
+            if self._current is None:
+                return
+            self._done += 1
+            self._current = None
+            if self._segments:
+                self._start_next()
+            else:
+                self._idle.release()
+            self._progress_events.append((self._done, self._total))
+
+    def _notify(self) -> None:
+        """
+        Runs the progress callback for each progress event, then the listeners
+        :return:
+        """
+        with self._lock:
+            events = self._progress_events
+            self._progress_events = []
+        progress = self._progress_callback
+        if progress is not None:
+            for done, total in events:
+                progress[0](done, total, *progress[1])
+        for listener in self._listeners:
+            listener()
+
+    def _start_next(self) -> None:
+        """
+        Sends the command of the next primitive, the lock must be held.
+        It runs in the update thread too, so it never waits for the command scheduler: while another thread is
+        sending or owns a batch, the command is left to service
+        :return:
+        """
+        alvik = self._alvik
+        kind, value, *arc_angle = self._segments.pop(0)
+        if kind == self.ARC:
+            left, right = alvik._sensors.read(_ArduinoAlvikSensorState.WHEELS_POSITION, 2)
+            if left is None:
+                # already checked by arc(): never leave the queue running on a primitive that was not sent
+                self._segments = []
+                self._idle.release()
+                return
+        self._current = kind
+        if kind == self.WAIT:
+            self._wait_end = ticks_add(ticks_ms(), value)
+            return
+        if kind == self.MOVE:
+            alvik._expect_target(ord('M'))
+            self._command = (PACKET_C1F, ord('G'), value)
+        elif kind == self.ROTATE:
+            alvik._expect_target(ord('R'))
+            self._command = (PACKET_C1F, ord('R'), value)
+        else:
+            # wheels travel along arcs of radius +/- half track, relative to their current position
+            angle = arc_angle[0] * pi / 180
+            mm_to_deg = 360 / (pi * WHEEL_DIAMETER_MM)
+            alvik._expect_target(ord('P'))
+            self._command = (PACKET_C2F, ord('A'),
+                             left + angle * (value - WHEEL_TRACK_MM / 2) * mm_to_deg,
+                             right + angle * (value + WHEEL_TRACK_MM / 2) * mm_to_deg)
+        self._send_command()
+
+    def _send_command(self) -> None:
+        """
+        Sends the command of the running primitive unless the command scheduler is busy, the lock must be held
+        :return:
+        """
+        if self._alvik._commands.try_send(*self._command):
+            self._command = None
+
+
+class _ArduinoAlvikUpdatePacer:
+    """
+    Adaptive delay of the update loop.
+    While bytes are arriving the loop runs every min_delay ms, while the link is idle the delay doubles up to
+    max_delay ms. A UART backlog above the threshold makes the loop run again without waiting, and the delay never
+    exceeds the time left before the next scheduled work (setpoints flush, end of a motion pause).
+    It also measures the duty cycle of the loop
+    """
+
+    def __init__(self, min_delay: int = UPDATE_MIN_DELAY_MS, max_delay: int = UPDATE_MAX_DELAY_MS,
+                 backlog_threshold: int = UART_BACKLOG_THRESHOLD):
+        """
+        Update pacer initialization
+        :param min_delay: delay (ms) while bytes are arriving
+        :param max_delay: maximum delay (ms) while the link is idle
+        :param backlog_threshold: bytes left in the UART that skip the delay
+        """
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._backlog_threshold = backlog_threshold
+        self._delay = min_delay
+        self.received = 0           # bytes received by the current loop, updated by the reader
+        self.reset_stats()
+
+    def set_delays(self, min_delay: int, max_delay: int) -> None:
+        """
+        Sets the delays
+        :param min_delay: delay (ms) while bytes are arriving
+        :param max_delay: maximum delay (ms) while the link is idle
+        :return:
+        """
+        if min_delay < 0 or max_delay < min_delay:
+            raise ValueError('update delays must satisfy 0 <= min_delay <= max_delay')
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._delay = min_delay
+
+    def reset_stats(self) -> None:
+        """
+        Resets the counters
+        :return:
+        """
+        self._loops = 0
+        self._idle_loops = 0
+        self._work_us = 0
+        self._delay_ms = 0
+        self._start = ticks_ms()
+
+    def next_delay(self, backlog: int, due: int = -1) -> int:
+        """
+        Returns the delay before the next loop and resets the received bytes
+        :param backlog: bytes left in the UART
+        :param due: time (ms) left before the next scheduled work, -1 if none
+        :return: the delay (ms)
+        """
+        if backlog >= self._backlog_threshold:
+            self._delay = self._min_delay
+            delay = 0
+        elif self.received or backlog:
+            self._delay = delay = self._min_delay
+        else:
+            self._idle_loops += 1
+            delay = self._delay * 2 if self._delay else 1
+            self._delay = delay = delay if delay < self._max_delay else self._max_delay
+        self.received = 0
+        if 0 <= due < delay:
+            delay = due
+        return delay
+
+    def record(self, work_us: int, delay: int) -> None:
+        """
+        Records a loop
+        :param work_us: time spent working (us)
+        :param delay: delay before the next loop (ms)
+        :return:
+        """
+        self._loops += 1
+        self._work_us += work_us
+        self._delay_ms += delay
+
+    def get_stats(self) -> dict:
+        """
+        Returns the counters
+        :return:
+        """
+        elapsed = ticks_diff(ticks_ms(), self._start)
+        return {
+            'loops': self._loops,
+            'idle_loops': self._idle_loops,
+            'average_delay': self._delay_ms / self._loops if self._loops else 0,
+            'duty_cycle': self._work_us / (elapsed * 1000) if elapsed > 0 else 0,
+            'min_delay': self._min_delay,
+            'max_delay': self._max_delay,
+        }
+
+
+class _ArduinoAlvikTelemetryStats:
+    """
+    Statistics of the messages received from the robot.
+    All the counters are allocated when the message codes are registered (see add_code),
+    recording a message does not allocate memory
+    """
+
+    # upper bounds (ms) of the inter-arrival time histogram buckets, the last bucket collects everything above
+    HISTOGRAM_BOUNDS = (2, 5, 10, 20, 50, 100, 200)
+    HISTOGRAM_BUCKETS = len(HISTOGRAM_BOUNDS) + 1
+
+    def __init__(self, packeter: ucPack):
+        """
+        Telemetry statistics initialization
+        :param packeter: the ucPack parsing the received messages
+        """
+        self._packeter = packeter
+        self._counts = array('L', [0] * 256)
+        self._last_ticks = array('L', [0] * 256)
+        self._slots = array('H', [0] * 256)  # histogram slot + 1 of each message code, 0 if not registered
+        self._n_slots = 0
+        self._histograms = array('L')
+        self._uart_high_water = 0
+        self._buffer_high_water = 0
+        self._parser_offsets = (0, 0, 0, 0)
+        self._start = ticks_ms()
+
+    def reset(self):
+        """
+        Resets all the counters
+        :return:
+        """
+        for i in range(0, 256):
+            self._counts[i] = 0
+        for i in range(0, len(self._histograms)):
+            self._histograms[i] = 0
+        self._uart_high_water = 0
+        self._buffer_high_water = 0
+        packeter = self._packeter
+        self._parser_offsets = (packeter.frames, packeter.crc_errors, packeter.resyncs, packeter.skipped_bytes)
+        self._start = ticks_ms()
+
+    def add_code(self, code: int):
+        """
+        Allocates the inter-arrival time histogram of a message code, called when its handler is registered
+        :param code: message code
+        :return:
+        """
+        if self._slots[code]:
+            return
+        self._histograms.extend(array('L', [0] * self.HISTOGRAM_BUCKETS))
+        self._n_slots += 1
+        self._slots[code] = self._n_slots
+
+    def record(self, code: int, now: int):
+        """
+        Records the arrival of a message
+        :param code: message code
+        :param now: arrival time (ticks_ms)
+        :return:
+        """
+        count = self._counts[code] + 1
+        self._counts[code] = count
+        if count > 1:
+            slot = self._slots[code]
+            if slot:
+                interval = ticks_diff(now, self._last_ticks[code])
+                bucket = 0
+                for bound in self.HISTOGRAM_BOUNDS:
+                    if interval < bound:
+                        break
+                    bucket += 1
+                self._histograms[(slot - 1) * self.HISTOGRAM_BUCKETS + bucket] += 1
+        self._last_ticks[code] = now
+
+    def record_backlog(self, uart_bytes: int, buffer_bytes: int):
+        """
+        Records how many bytes were waiting on the UART and in the packeter buffer
+        :param uart_bytes: bytes available on the UART before reading
+        :param buffer_bytes: bytes in the packeter buffer after reading
+        :return:
+        """
+        if uart_bytes > self._uart_high_water:
+            self._uart_high_water = uart_bytes
+        if buffer_bytes > self._buffer_high_water:
+            self._buffer_high_water = buffer_bytes
+
+    def get_counts(self) -> dict:
+        """
+        Returns the number of messages received for each message code
+        :return: dictionary of message code (as char) and count
+        """
+        return {chr(code): count for code, count in enumerate(self._counts) if count}
+
+    def get_stats(self) -> dict:
+        """
+        Returns a summary of the statistics
+        :return:
+        """
+        elapsed_ms = max(ticks_diff(ticks_ms(), self._start), 1)
+        messages = dict()
+        for code, count in enumerate(self._counts):
+            if not count:
+                continue
+            slot = self._slots[code]
+            offset = (slot - 1) * self.HISTOGRAM_BUCKETS
+            messages[chr(code)] = {
+                'count': count,
+                'rate': count * 1000 / elapsed_ms,
+                'histogram': list(self._histograms[offset:offset + self.HISTOGRAM_BUCKETS]) if slot else None
+            }
+        packeter = self._packeter
+        return {
+            'elapsed_ms': elapsed_ms,
+            'messages': messages,
+            'histogram_bounds_ms': self.HISTOGRAM_BOUNDS,
+            'frames': packeter.frames - self._parser_offsets[0],
+            'crc_errors': packeter.crc_errors - self._parser_offsets[1],
+            'resyncs': packeter.resyncs - self._parser_offsets[2],
+            'skipped_bytes': packeter.skipped_bytes - self._parser_offsets[3],
+            'uart_high_water': self._uart_high_water,
+            'buffer_high_water': self._buffer_high_water
+        }
+
+
+class _ArduinoAlvikSensorState:
+    """
+    Sensor readouts shared between the update thread and user code.
+    The values live in a preallocated float array guarded seqlock style: the update thread (the only writer)
+    makes the version odd while it publishes a whole message and even again when it is done, readers copy the
+    values and retry if the version was odd or changed meanwhile. Readers never take a lock
+    """
+
+    # offsets of the values in the array
+    WHEELS_SPEED = 0        # left, right (rpm)
+    WHEELS_POSITION = 2     # left, right (deg)
+    DRIVE_SPEED = 4         # linear (mm/s), angular (deg/s)
+    POSE = 6                # x (mm), y (mm), theta (deg)
+    IMU = 9                 # ax, ay, az, gx, gy, gz
+    ORIENTATION = 15        # roll, pitch, yaw
+    LINE_SENSORS = 18       # left, center, right
+    COLOR = 21              # red, green, blue
+    DISTANCE = 24           # left, center_left, center, center_right, right, top, bottom (mm)
+    SIZE = 31
+
+    def __init__(self):
+        self._values = array('f', [0.0] * self.SIZE)
+        self._valid = bytearray(self.SIZE)
+        self._version = 0
+
+    def begin_write(self):
+        """
+        Starts publishing values, readers will retry until end_write
+        :return:
+        """
+        self._version += 1
+
+    def end_write(self):
+        """
+        Ends publishing values
+        :return:
+        """
+        self._version += 1
+
+    def write(self, offset: int, message: tuple, stride: int = 1):
+        """
+        Writes the values of a message (code excluded). Call between begin_write and end_write
+        :param offset: offset of the first value
+        :param message: the unpacked message, the first element is the message code
+        :param stride: distance between two consecutive values in the array
+        :return:
+        """
+        for i in range(1, len(message)):
+            index = offset + (i - 1) * stride
+            self._values[index] = message[i]
+            self._valid[index] = 1
+
+    def read_begin(self) -> int:
+        """
+        Waits for any write in progress to end
+        :return: the version to check with read_retry
+        """
+        while True:
+            version = self._version
+            if not version & 1:
+                return version
+
+    def read_retry(self, version: int) -> bool:
+        """
+        Returns True if the values changed since read_begin, and the read must be retried
+        :param version: the version returned by read_begin
+        :return:
+        """
+        return self._version != version
+
+    def read_unsafe(self, offset: int, n: int, integer: bool = False) -> tuple:
+        """
+        Returns n values, None for the values never received. Call between read_begin and read_retry
+        :param offset: offset of the first value
+        :param n: number of values
+        :param integer: True to convert the values to int
+        :return:
+        """
+        values = self._values[offset:offset + n]
+        valid = self._valid[offset:offset + n]
+        return tuple(None if not valid[i] else (int(values[i]) if integer else values[i]) for i in range(0, n))
+
+    def read(self, offset: int, n: int, integer: bool = False) -> tuple:
+        """
+        Returns a consistent copy of n values, None for the values never received
+        :param offset: offset of the first value
+        :param n: number of values
+        :param integer: True to convert the values to int
+        :return:
+        """
+        while True:
+            version = self.read_begin()
+            values = self.read_unsafe(offset, n, integer)
+            if not self.read_retry(version):
+                return values
+
+
+class _ArduinoAlvikI2C:
+    """
+    I2C bus of Alvik, shared by the threads and by the Modulinos (see modulino.I2CHelper.set_interface).
+    The machine.I2C object is created on first use and kept: it is dropped, and created again on next use,
+    after a bus error or a bitbanged start/stop condition. Per operation latency counters are recorded.
+    Writes can be queued with queue_writeto: the writes queued within the same tick are sent together in one
+    transaction by flush, called by the update loop, and a write queued for an address replaces the one
+    still waiting, e.g. the frames of a LED animation
+    """
+
+    _main_thread_id = None
+
+    # operations of the latency counters
+    OPERATIONS = ('scan', 'readfrom', 'writeto', 'readinto', 'write', 'readfrom_into', 'writevto',
+                  'readfrom_mem', 'readfrom_mem_into', 'writeto_mem')
+    SCAN = 0
+    READFROM = 1
+    WRITETO = 2
+    READINTO = 3
+    WRITE = 4
+    READFROM_INTO = 5
+    WRITEVTO = 6
+    READFROM_MEM = 7
+    READFROM_MEM_INTO = 8
+    WRITETO_MEM = 9
+
+    def __init__(self, sda: int, scl: int):
+        """
+        Alvik I2C wrapper
+        :param sda:
+        :param scl:
+        """
+        self._lock = _thread.allocate_lock()
+
+        self._is_single_thread = False
+
+        self.sda = sda
+        self.scl = scl
+
+        self._i2c = None
+        self._owner = None
+        self._depth = 0
+        self._calls = array('L', [0] * len(self.OPERATIONS))
+        self._errors = array('L', [0] * len(self.OPERATIONS))
+        self._total_us = array('L', [0] * len(self.OPERATIONS))
+        self._max_us = array('L', [0] * len(self.OPERATIONS))
+        self._inits = 0
+
+        self._queue = dict()            # address -> last write queued
+        self._queued = []               # addresses waiting for the flush, in queue order
+        self._failed = dict()           # address -> queued writes failed
+        self._tick = I2C_TICK_MS
+        self._last_flush = ticks_ms()
+        self._queued_writes = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._stats_start = ticks_ms()
+
+    def set_main_thread(self, thread_id: int):
+        """
+        Sets the main thread of control. It will be the only thread allowed if set_single_thread is True
+        """
         with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.writevto(addr, vector, stop)
+            self.__class__._main_thread_id = thread_id
+
+    def set_single_thread(self, value):
+        """
+        Sets the single thread mode on/off.
+        In single mode only the main thread is allowed to access the bus
+        """
+        self._is_single_thread = value
+
+    def is_accessible(self):
+        """
+        Returns True if bus is accessible by the current thread
+        """
+        return not self._is_single_thread or _thread.get_ident() == self.__class__._main_thread_id
+
+    def start(self):
+        """
+        Bitbanging start condition
+        :return:
+        """
+        held = self._acquire()
+        try:
+            self._i2c = None            # SDA is reconfigured as a plain output
+            _SDA = Pin(self.sda, Pin.OUT)
+            _SDA.value(1)
+            sleep_ms(100)
+            _SDA.value(0)
+        finally:
+            if held:
+                self._lock.release()
+
+    def init(self, scl, sda, freq=400_000) -> None:
+        """
+        init method just for call compatibility
+        """
+        print("AlvikWarning:: init Unsupported. Alvik defines/initializes its own I2C bus")
+
+    def deinit(self):
+        """
+        deinit method just for call compatibility
+        """
+        print("AlvikWarning:: deinit Unsupported. Alvik defines/initializes its own I2C bus")
+
+    def stop(self):
+        """ Bitbanging stop condition (untested)
+        :return:
+        """
+        held = self._acquire()
+        try:
+            self._i2c = None            # SDA is reconfigured as a plain output
+            _SDA = Pin(self.sda, Pin.OUT)
+            _SDA.value(0)
+            sleep_ms(100)
+            _SDA.value(1)
+        finally:
+            if held:
+                self._lock.release()
+
+    def transaction(self):
+        """
+        Returns a context manager holding the bus across several operations, e.g. a register write and its read:
+            with alvik.i2c.transaction():
+                alvik.i2c.writeto(addr, register)
+                alvik.i2c.readfrom_into(addr, buf)
+        Other threads wait until it exits
+        :return:
+        """
+        return self
+
+    def begin_transaction(self) -> None:
+        """
+        Takes the bus for the calling thread until end_transaction. Transactions can be nested
+        :return:
+        """
+        if self._acquire():
+            self._owner = _thread.get_ident()
+        self._depth += 1
+
+    def end_transaction(self) -> None:
+        """
+        Releases the bus taken by begin_transaction
+        :return:
+        """
+        if self._owner != _thread.get_ident():
+            raise RuntimeError('end_transaction called by a thread not owning the bus')
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._lock.release()
+
+    def __enter__(self):
+        self.begin_transaction()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_transaction()
+        return False
+
+    def set_tick(self, tick_ms: int) -> None:
+        """
+        Sets the period of the flush of the queued writes
+        :param tick_ms: period in milliseconds, 0 sends the queued writes at every update loop
+        :return:
+        """
+        if tick_ms < 0:
+            raise ValueError('the tick must not be negative')
+        self._tick = tick_ms
+
+    def queue_writeto(self, addr, buf) -> int:
+        """
+        Queues a write, sent by the next flush together with the other queued writes.
+        The buffer is copied, a write still queued for the same address is replaced
+        :param addr: the device address
+        :param buf: the bytes to write
+        :return: the number of bytes queued
+        """
+        if not self.is_accessible():
+            return 0
+        held = self._acquire()
+        try:
+            frame = self._queue.get(addr)
+            if frame is None or len(frame) != len(buf):
+                frame = self._queue[addr] = bytearray(buf)
+            else:
+                frame[:] = buf
+            if addr in self._queued:
+                self._coalesced += 1
+            else:
+                self._queued.append(addr)
+            self._queued_writes += 1
+        finally:
+            if held:
+                self._lock.release()
+        return len(buf)
+
+    def flush(self) -> None:
+        """
+        Sends the queued writes in a single transaction. A write failing is dropped and counted for its address,
+        see failed_writes
+        :return:
+        """
+        if not self._queued or not self.is_accessible():
+            return
+        with self.transaction():
+            for addr in self._queued:
+                try:
+                    self._call(self.WRITETO, 'writeto', addr, self._queue[addr], True)
+                except OSError:
+                    self._failed[addr] = self._failed.get(addr, 0) + 1
+            self._queued.clear()
+            self._flushes += 1
+            self._last_flush = ticks_ms()
+
+    def failed_writes(self, addr) -> int:
+        """
+        Returns how many queued writes to an address failed, so that the device can send its state again
+        :param addr: the device address
+        :return:
+        """
+        return self._failed.get(addr, 0)
+
+    def time_to_service(self, now: int) -> int:
+        """
+        Returns the time left before the queued writes are due
+        :param now: current ticks_ms
+        :return: milliseconds to wait, -1 if no write is queued
+        """
+        if not self._queued:
+            return -1
+        return max(0, self._tick - ticks_diff(now, self._last_flush))
+
+    def service(self) -> None:
+        """
+        Flushes the queued writes once per tick, called by the update loop
+        :return:
+        """
+        if self._queued and ticks_diff(ticks_ms(), self._last_flush) >= self._tick:
+            self.flush()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the counters of each operation: calls, errors, average and maximum latency (us),
+        the number of times the bus was initialized, the utilization of the bus (busy time over the time
+        elapsed since the counters were reset) and the counters of the queued writes
+        :return:
+        """
+        elapsed_us = ticks_diff(ticks_ms(), self._stats_start) * 1000
+        stats = {
+            'inits': self._inits,
+            'errors': sum(self._errors),
+            'utilization': sum(self._total_us) / elapsed_us if elapsed_us > 0 else 0.0,
+            'queued_writes': self._queued_writes,
+            'coalesced_writes': self._coalesced,
+            'flushes': self._flushes,
+            'failed_writes': sum(self._failed.values()),
+        }
+        for op, name in enumerate(self.OPERATIONS):
+            calls = self._calls[op]
+            if calls:
+                stats[name] = {
+                    'calls': calls,
+                    'errors': self._errors[op],
+                    'average_us': self._total_us[op] / calls,
+                    'max_us': self._max_us[op],
+                }
+        return stats
+
+    def reset_stats(self) -> None:
+        """
+        Resets the counters
+        :return:
+        """
+        for op in range(0, len(self.OPERATIONS)):
+            self._calls[op] = 0
+            self._errors[op] = 0
+            self._total_us[op] = 0
+            self._max_us[op] = 0
+        self._inits = 0
+        self._queued_writes = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._stats_start = ticks_ms()
+
+    def _acquire(self) -> bool:
+        """
+        Takes the lock, unless the calling thread owns the bus in a transaction
+        :return: True if the lock was taken and must be released
+        """
+        if self._owner is not None and self._owner == _thread.get_ident():
+            return False
+        self._lock.acquire()
+        return True
+
+    def _call(self, op: int, name: str, *args, **kwargs):
+        """
+        Runs a machine.I2C method on the cached bus, recording its latency. The lock must not be held
+        :param op: operation of the counters
+        :param name: name of the machine.I2C method
+        :return: the method result
+        """
+        held = self._acquire()
+        start = ticks_us()
+        try:
+            i2c = self._i2c
+            if i2c is None:
+                i2c = self._i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
+                self._inits += 1
+            return getattr(i2c, name)(*args, **kwargs)
+        except OSError:
+            self._errors[op] += 1
+            self._i2c = None            # initialized again on next use
+            raise
+        finally:
+            elapsed = ticks_diff(ticks_us(), start)
+            self._calls[op] += 1
+            self._total_us[op] += elapsed
+            if elapsed > self._max_us[op]:
+                self._max_us[op] = elapsed
+            if held:
+                self._lock.release()
+
+    def scan(self) -> list[int]:
+        """
+        I2C scan method
+        :return:
+        """
+        if not self.is_accessible():
+            return []
+        return self._call(self.SCAN, 'scan')
+
+    def readfrom(self, addr, nbytes, stop=True) -> bytes:
+        """
+        Wrapping i2c readfrom
+        """
+        if not self.is_accessible():
+            return bytes(nbytes)
+        return self._call(self.READFROM, 'readfrom', addr, nbytes, stop)
+
+    def writeto(self, addr, buf, stop=True) -> int:
+        """
+        Wrapping i2c writeto. The queued writes are sent first, to keep the order of the writes
+        """
+        if not self.is_accessible():
+            return 0
+        if self._queued:
+            self.flush()
+        return self._call(self.WRITETO, 'writeto', addr, buf, stop)
+
+    def readinto(self, buf, nack=True) -> None:
+        """
+        Wrapping i2c readinto
+        """
+        if not self.is_accessible():
+            return
+        return self._call(self.READINTO, 'readinto', buf, nack)
+
+    def write(self, buf) -> int:
+        """
+        Wrapping i2c write
+        """
+        if not self.is_accessible():
+            return 0
+        return self._call(self.WRITE, 'write', buf)
+
+    def readfrom_into(self, addr, buf, stop=True) -> None:
+        """
+        Wrapping i2c readfrom_into
+        """
+        if not self.is_accessible():
+            return
+        return self._call(self.READFROM_INTO, 'readfrom_into', addr, buf, stop)
+
+    def writevto(self, addr, vector, stop=True) -> int:
+        """
+        Wrapping i2c writevto
+        """
+        if not self.is_accessible():
+            return 0
+        return self._call(self.WRITEVTO, 'writevto', addr, vector, stop)
 
     def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8) -> bytes:
         """
@@ -1487,9 +3125,7 @@ class _ArduinoAlvikI2C:
         """
         if not self.is_accessible():
             return bytes(nbytes)
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.readfrom_mem(addr, memaddr, nbytes, addrsize=addrsize)
+        return self._call(self.READFROM_MEM, 'readfrom_mem', addr, memaddr, nbytes, addrsize=addrsize)
 
     def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8) -> None:
         """
@@ -1497,9 +3133,7 @@ class _ArduinoAlvikI2C:
         """
         if not self.is_accessible():
             return
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
+        return self._call(self.READFROM_MEM_INTO, 'readfrom_mem_into', addr, memaddr, buf, addrsize=addrsize)
 
     def writeto_mem(self, addr, memaddr, buf, addrsize=8) -> None:
         """
@@ -1507,16 +3141,63 @@ class _ArduinoAlvikI2C:
         """
         if not self.is_accessible():
             return
-        with self._lock:
-            i2c = I2C(0, scl=Pin(self.scl, Pin.OUT), sda=Pin(self.sda, Pin.OUT))
-            return i2c.writeto_mem(addr, memaddr, buf, addrsize=addrsize)
+        return self._call(self.WRITETO_MEM, 'writeto_mem', addr, memaddr, buf, addrsize=addrsize)
+
+
+class _ArduinoAlvikBatteryGauge:
+    """
+    Fuel gauge of the battery, read over I2C by the ESP32 while the robot is off (when it is on, the robot
+    sends the SOC). The readings are cached: the gauge is read at most once per refresh interval
+    """
 
+    ADDRESS = 0x36
+    SOC_REGISTER = 0x06
+
+    def __init__(self, i2c: _ArduinoAlvikI2C, refresh: int = BATTERY_REFRESH_MS):
+        """
+        Battery gauge initialization
+        :param i2c: the I2C bus of the gauge
+        :param refresh: minimum interval between two readings (ms)
+        """
+        self._i2c = i2c
+        self._register = bytes((self.SOC_REGISTER,))
+        self._soc = bytearray(2)
+        self._refresh = refresh
+        self._last_read = None
+        self.soc = None             # last reading (%), negative while the battery is discharging
+
+    def set_refresh(self, refresh: int) -> None:
+        """
+        Sets the refresh interval
+        :param refresh: minimum interval between two readings (ms)
+        :return:
+        """
+        self._refresh = refresh
+
+    def read(self, force: bool = False) -> float | None:
+        """
+        Reads the SOC if the refresh interval is elapsed
+        :param force: True to read it anyway
+        :return: the SOC (%), negative while discharging, None if the cached reading is still fresh
+        """
+        now = ticks_ms()
+        if not force and self._last_read is not None and ticks_diff(now, self._last_read) < self._refresh:
+            return None
+        self._i2c.start()
+        with self._i2c.transaction():
+            self._i2c.writeto(self.ADDRESS, self._register)
+            self._i2c.readfrom_into(self.ADDRESS, self._soc)
+        self.soc = struct.unpack('h', self._soc)[0] * 0.00390625
+        self._last_read = now
+        return self.soc
 
 
 class _ArduinoAlvikServo:
 
-    def __init__(self, packeter: ucPack, label: str, servo_id: int, position: list[int | None]):
+    def __init__(self, packeter: ucPack, label: str, servo_id: int, position: list[int | None],
+                 commands: _ArduinoAlvikCommandScheduler):
         self._packeter = packeter
+        self._commands = commands
         self._label = label
         self._id = servo_id
         self._position = position
@@ -1528,8 +3209,8 @@ class _ArduinoAlvikServo:
         :return:
         """
         self._position[self._id] = position
-        self._packeter.packetC2B(ord('S'), self._position[0] & 0xFF, self._position[1] & 0xFF)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.SERVOS, PACKET_C2B, ord('S'),
+                              self._position[0] & 0xFF, self._position[1] & 0xFF)
 
     def get_position(self) -> int:
         """
@@ -1544,10 +3225,12 @@ class _ArduinoAlvikWheel:
     def __init__(self, packeter: ucPack, label: int, wheel_diameter_mm: float = WHEEL_DIAMETER_MM,
                  alvik: ArduinoAlvik = None):
         self._packeter = packeter
+        self._commands = alvik._commands
+        self._slot = _ArduinoAlvikCommandScheduler.LEFT_WHEEL if label == ord('L') \
+            else _ArduinoAlvikCommandScheduler.RIGHT_WHEEL
         self._label = label
         self._wheel_diameter_mm = wheel_diameter_mm
-        self._speed = None
-        self._position = None
+        self._index = 0 if label == ord('L') else 1     # index of the wheel values in the sensor state
         self._alvik = alvik
 
     def reset(self, initial_position: float = 0.0, unit: str = 'deg'):
@@ -1558,8 +3241,7 @@ class _ArduinoAlvikWheel:
         :return:
         """
         initial_position = convert_angle(initial_position, unit, 'deg')
-        self._packeter.packetC2B1F(ord('W'), self._label & 0xFF, ord('Z'), initial_position)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.send(PACKET_C2B1F, ord('W'), self._label & 0xFF, ord('Z'), initial_position)
 
     def set_pid_gains(self, kp: float = MOTOR_KP_DEFAULT, ki: float = MOTOR_KI_DEFAULT, kd: float = MOTOR_KD_DEFAULT):
         """
@@ -1570,15 +3252,15 @@ class _ArduinoAlvikWheel:
         :return:
         """
 
-        self._packeter.packetC1B3F(ord('P'), self._label & 0xFF, kp, ki, kd)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.send(PACKET_C1B3F, ord('P'), self._label & 0xFF, kp, ki, kd)
 
     def stop(self):
         """
-        Stop Alvik wheel
+        Stop Alvik wheel, at once even if a command rate is set
         :return:
         """
         self.set_speed(0)
+        self._commands.flush()
 
     def set_speed(self, velocity: float, unit: str = 'rpm'):
         """
@@ -1593,8 +3275,7 @@ class _ArduinoAlvikWheel:
         else:
             velocity = convert_rotational_speed(velocity, unit, 'rpm')
 
-        self._packeter.packetC2B1F(ord('W'), self._label & 0xFF, ord('V'), velocity)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(self._slot, PACKET_C2B1F, ord('W'), self._label & 0xFF, ord('V'), velocity)
 
     def get_speed(self, unit: str = 'rpm') -> float | None:
         """
@@ -1602,11 +3283,20 @@ class _ArduinoAlvikWheel:
         :param unit: the unit of the output speed
         :return:
         """
+        speed = self._alvik._sensors.read(_ArduinoAlvikSensorState.WHEELS_SPEED + self._index, 1)[0]
+        return self._convert_speed(speed, unit)
+
+    @staticmethod
+    def _convert_speed(speed: float | None, unit: str) -> float | None:
+        """
+        Converts a wheel speed from rpm
+        :param speed: the speed in rpm
+        :param unit: the unit of the output speed
+        :return:
+        """
         if unit == '%':
-            speed = (self._speed / MOTOR_MAX_RPM) * 100 if self._speed is not None else None
-        else:
-            speed = convert_rotational_speed(self._speed, 'rpm', unit)
-        return speed
+            return (speed / MOTOR_MAX_RPM) * 100 if speed is not None else None
+        return convert_rotational_speed(speed, 'rpm', unit)
 
     def get_position(self, unit: str = 'deg') -> float | None:
         """
@@ -1614,7 +3304,8 @@ class _ArduinoAlvikWheel:
         :param unit: the unit of the output position
         :return:
         """
-        return convert_angle(self._position, 'deg', unit)
+        position = self._alvik._sensors.read(_ArduinoAlvikSensorState.WHEELS_POSITION + self._index, 1)[0]
+        return convert_angle(position, 'deg', unit)
 
     def set_position(self, position: float, unit: str = 'deg', blocking: bool = True):
         """
@@ -1625,11 +3316,10 @@ class _ArduinoAlvikWheel:
         :return:
         """
         position = convert_angle(position, unit, 'deg')
-        self._packeter.packetC2B1F(ord('W'), self._label & 0xFF, ord('P'), position)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
-        self._alvik._waiting_ack = ord('P')
+        self._alvik._expect_target(ord('P'), blocking)
+        self._commands.send(PACKET_C2B1F, ord('W'), self._label & 0xFF, ord('P'), position)
         if blocking:
-            self._alvik._wait_for_target(idle_time=(position / MOTOR_CONTROL_DEG_S))
+            self._alvik._wait_for_target()
 
     def is_target_reached(self):
         """
@@ -1640,8 +3330,10 @@ class _ArduinoAlvikWheel:
 
 
 class _ArduinoAlvikRgbLed:
-    def __init__(self, packeter: ucPack, label: str, led_state: list[int | None], rgb_mask: list[int]):
+    def __init__(self, packeter: ucPack, label: str, led_state: list[int | None], rgb_mask: list[int],
+                 commands: _ArduinoAlvikCommandScheduler):
         self._packeter = packeter
+        self._commands = commands
         self.label = label
         self._rgb_mask = rgb_mask
         self._led_state = led_state
@@ -1661,8 +3353,7 @@ class _ArduinoAlvikRgbLed:
         led_status = led_status | self._rgb_mask[1] if green else led_status & (0b11111111 - self._rgb_mask[1])
         led_status = led_status | self._rgb_mask[2] if blue else led_status & (0b11111111 - self._rgb_mask[2])
         self._led_state[0] = led_status
-        self._packeter.packetC1B(ord('L'), led_status & 0xFF)
-        uart.write(self._packeter.msg[0:self._packeter.msg_size])
+        self._commands.submit(_ArduinoAlvikCommandScheduler.LEDS, PACKET_C1B, ord('L'), led_status & 0xFF)
 
 
 class _ArduinoAlvikEvents:
@@ -1804,6 +3495,19 @@ class _ArduinoAlvikTimerEvents(_ArduinoAlvikEvents):
         self._callbacks = dict()
         super().register_callback(event_name, callback, args)
 
+    def time_to_trigger(self, now=None) -> int:
+        """
+        Returns the time left before the timer triggers in ms, -1 if it will not trigger
+        :param now:
+        :return:
+        """
+        if self._stopped or not self._callbacks or (self.ONE_SHOT in self._callbacks and self._triggered):
+            return -1
+        if now is None:
+            now = ticks_ms()
+        remaining = self._period + 1 - ticks_diff(now, self._last_trigger)
+        return remaining if remaining > 0 else 0
+
     def _is_period_expired(self, now=None) -> bool:
         """
         True if the timer period is expired
@@ -0,0 +1,483 @@
+# ASYNCIO ALVIK #
+
+import sys
+import _thread
+import asyncio
+from time import ticks_ms
+
+from ucPack import PACKET_C1F, PACKET_C2F, PACKET_C3F
+
+from .arduino_alvik import ArduinoAlvik, _ArduinoAlvikMoveEvents, _ArduinoAlvikTimerEvents
+from .conversions import *
+from .pinout_definitions import RESET_STM32
+
+
+class AsyncAlvikEventStream:
+    """
+    Asynchronous iterator over the events of Alvik, e.g.:
+        async for event in alvik.touch_events():
+            print(event)
+    The oldest events are dropped when the stream is not consumed fast enough
+    """
+
+    def __init__(self, size: int = 8):
+        """
+        Event stream initialization
+        :param size: maximum number of events waiting to be consumed
+        """
+        self._events = []
+        self._size = size
+        self._flag = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event: str) -> None:
+        """
+        Adds an event to the stream
+        :param event: the event name
+        :return:
+        """
+        if len(self._events) >= self._size:
+            self._events.pop(0)
+            self.dropped += 1
+        self._events.append(event)
+        self._flag.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while not self._events:
+            self._flag.clear()
+            await self._flag.wait()
+        return self._events.pop(0)
+
+
+class AsyncAlvikWheel:
+    """
+    asyncio wrapper of a wheel of Alvik: set_position is a coroutine, every other method is the one of the wheel
+    """
+
+    def __init__(self, alvik, wheel):
+        """
+        Wheel wrapper initialization
+        :param alvik: the AsyncAlvik owning the wheel
+        :param wheel: the wheel of the wrapped ArduinoAlvik
+        """
+        self._alvik = alvik
+        self._wheel = wheel
+
+    def __getattr__(self, name: str):
+        return getattr(self._wheel, name)
+
+    async def set_position(self, position: float, unit: str = 'deg', blocking: bool = True) -> None:
+        """
+        Sets the wheel position
+        :param position: the position of the motor
+        :param unit: the unit of measurement
+        :param blocking: if True, returns when the wheel reaches the position
+        :return:
+        """
+        if blocking:
+            self._alvik._check_not_in_batch()
+        self._wheel.set_position(position, unit, blocking=False)
+        if blocking:
+            await self._alvik._wait_for_target()
+
+
+class AsyncAlvikMotionQueue:
+    """
+    asyncio wrapper of the motion queue of Alvik: wait_done is a coroutine, the primitives chain on the wrapper
+    and every other method is the one of the queue
+    """
+
+    def __init__(self, alvik, queue):
+        """
+        Motion queue wrapper initialization
+        :param alvik: the AsyncAlvik owning the queue
+        :param queue: the motion queue of the wrapped ArduinoAlvik
+        """
+        self._alvik = alvik
+        self._queue = queue
+
+    def __getattr__(self, name: str):
+        return getattr(self._queue, name)
+
+    def move(self, distance: float, unit: str = 'cm'):
+        """
+        Adds a straight movement to the queue
+        :param distance:
+        :param unit: the distance unit
+        :return: the queue, to chain the primitives
+        """
+        self._queue.move(distance, unit)
+        return self
+
+    def rotate(self, angle: float, unit: str = 'deg'):
+        """
+        Adds an in place rotation to the queue
+        :param angle: positive angles turn left
+        :param unit: the angle unit
+        :return: the queue, to chain the primitives
+        """
+        self._queue.rotate(angle, unit)
+        return self
+
+    def arc(self, radius: float, angle: float, distance_unit: str = 'cm', angle_unit: str = 'deg'):
+        """
+        Adds a movement along an arc of circle to the queue
+        :param radius: radius of the arc, measured at the center of the robot
+        :param angle: angle of the arc, positive angles turn left
+        :param distance_unit: unit of the radius
+        :param angle_unit: unit of the angle
+        :return: the queue, to chain the primitives
+        """
+        self._queue.arc(radius, angle, distance_unit, angle_unit)
+        return self
+
+    def wait(self, duration: int):
+        """
+        Adds a pause to the queue
+        :param duration: pause duration in milliseconds
+        :return: the queue, to chain the primitives
+        """
+        self._queue.wait(duration)
+        return self
+
+    async def wait_done(self) -> None:
+        """
+        Waits until all the primitives have been executed or the queue is cancelled
+        :return:
+        """
+        await self._alvik.wait_motion_queue()
+
+
+class AsyncAlvik:
+    """
+    asyncio driver of Alvik.
+    The messages of the robot are read by an asyncio task instead of the update thread, the events are generated
+    by a second task instead of the events thread, and the motion commands can be awaited.
+    The methods waiting for the robot are coroutines: begin, move, rotate, set_wheels_position, reset_pose,
+    color_calibration, left_wheel/right_wheel.set_position and motion_queue.wait_done.
+    Every other method of ArduinoAlvik is forwarded as is, none of them waits for the reader task
+    """
+
+    def __init__(self, alvik: ArduinoAlvik = None, events_ms: int = 50):
+        """
+        AsyncAlvik initialization. The delay of the reader task adapts to the traffic, see set_update_delay
+        :param alvik: the ArduinoAlvik to drive (defaults to a new one), its threads must not be started
+        :param events_ms: sampling period of the touch and move events
+        """
+        self._alvik = alvik if alvik is not None else ArduinoAlvik()
+        self._events_ms = events_ms
+        self._running = False
+        self._restarting = False
+        self._reader_task = None
+        self._events_task = None
+        self._target_flag = asyncio.Event()
+        self._alvik._target_listeners.append(self._target_flag.set)
+        self._motion_flag = asyncio.Event()
+        self._alvik.motion_queue._listeners.append(self._motion_flag.set)
+        self.left_wheel = AsyncAlvikWheel(self, self._alvik.left_wheel)
+        self.right_wheel = AsyncAlvikWheel(self, self._alvik.right_wheel)
+        self.motion_queue = AsyncAlvikMotionQueue(self, self._alvik.motion_queue)
+
+    def __getattr__(self, name: str):
+        return getattr(self._alvik, name)
+
+    async def begin(self) -> int:
+        """
+        Begins all Alvik operations
+        :return:
+        """
+        alvik = self._alvik
+        if not alvik.is_on():
+            print("\n********** Please turn on your Arduino Alvik! **********\n")
+            while not alvik.is_on():
+                await asyncio.sleep_ms(500)
+        alvik.i2c.set_main_thread(_thread.get_ident())
+        self._running = True
+        self._reader_task = asyncio.create_task(self._reader())
+
+        await asyncio.sleep_ms(100)
+
+        await self._reset_hw()
+        alvik._flush_uart()
+        await self._wait_for_ack()
+        if not await self._wait_for_fw_check():
+            print('\n********** PLEASE UPDATE ALVIK FIRMWARE (required: ' +
+                  '.'.join(map(str, alvik._required_fw_version)) + ')! Check documentation **********\n')
+            sys.exit(-2)
+        alvik.set_illuminator(True)
+        alvik.set_behaviour(1)
+        alvik.set_behaviour(2)
+        alvik._set_color_reference()
+        if alvik._has_events_registered():
+            self._start_events()
+        alvik.set_servo_positions(90, 90)
+        return 0
+
+    def stop(self) -> None:
+        """
+        Stops all Alvik operations and the asyncio tasks
+        :return:
+        """
+        self._running = False
+        self._alvik.stop()
+        for task in (self._reader_task, self._events_task):
+            if task is not None:
+                task.cancel()
+        self._reader_task = None
+        self._events_task = None
+
+    @staticmethod
+    async def _reset_hw() -> None:
+        """
+        Resets the STM32
+        :return:
+        """
+        RESET_STM32.value(0)
+        await asyncio.sleep_ms(100)
+        RESET_STM32.value(1)
+        await asyncio.sleep_ms(100)
+
+    async def _wait_for_ack(self) -> None:
+        """
+        Waits until receives 0x00 ack from robot
+        :return:
+        """
+        alvik = self._alvik
+        alvik._waiting_ack = 0x00
+        while alvik._last_ack != 0x00:
+            await asyncio.sleep_ms(20)
+        alvik._waiting_ack = None
+
+    async def _wait_for_fw_check(self) -> bool:
+        """
+        Waits until receives version from robot, check required version and return true if everything is ok
+        :return:
+        """
+        while self._alvik._fw_version == [None, None, None]:
+            await asyncio.sleep_ms(20)
+        return self._alvik.check_firmware_compatibility()
+
+    async def _reader(self) -> None:
+        """
+        Reads and parses the messages of the robot, the asyncio counterpart of ArduinoAlvik._update
+        :return:
+        """
+        alvik = self._alvik
+        while self._running:
+            if not alvik.is_on() and not self._restarting:
+                self._restarting = True
+                asyncio.create_task(self._restart())
+            await asyncio.sleep_ms(alvik._update_once())
+
+    async def _restart(self) -> None:
+        """
+        Waits for the robot to be turned on again and restores its state
+        :return:
+        """
+        alvik = self._alvik
+        print("Alvik is off")
+        try:
+            while not alvik.is_on():
+                await asyncio.sleep_ms(500)
+            await self._reset_hw()
+            alvik._flush_uart()
+            alvik._commands.invalidate()
+            alvik.motion_queue._abort()
+            alvik._cancel_target()
+            await asyncio.sleep_ms(1000)
+            await self._wait_for_ack()
+            await asyncio.sleep_ms(2000)
+            alvik.set_illuminator(True)
+            alvik.set_behaviour(1)
+        finally:
+            self._restarting = False
+
+    # MOTION #
+
+    async def _wait_for_target(self) -> None:
+        """
+        Waits until the robot reaches the target, the reader task acknowledges it as soon as it is received
+        :return:
+        """
+        while self._alvik._waiting_ack is not None:
+            self._target_flag.clear()
+            await self._target_flag.wait()
+
+    async def wait_motion_queue(self) -> None:
+        """
+        Waits until all the primitives of the motion queue have been executed or the queue is cancelled
+        :return:
+        """
+        self._alvik._check_not_in_batch()
+        queue = self._alvik.motion_queue
+        while not queue.is_done():
+            self._motion_flag.clear()
+            await self._motion_flag.wait()
+
+    async def rotate(self, angle: float, unit: str = 'deg', blocking: bool = True) -> None:
+        """
+        Rotates the robot by given angle
+        :param angle:
+        :param unit: the angle unit
+        :param blocking: if True, returns when the rotation is completed
+        :return:
+        """
+        alvik = self._alvik
+        angle = convert_angle(angle, unit, 'deg')
+        alvik._expect_target(ord('R'), blocking)
+        alvik._commands.send(PACKET_C1F, ord('R'), angle)
+        if blocking:
+            await self._wait_for_target()
+
+    async def move(self, distance: float, unit: str = 'cm', blocking: bool = True) -> None:
+        """
+        Moves the robot by given distance
+        :param distance:
+        :param unit: the distance unit
+        :param blocking: if True, returns when the movement is completed
+        :return:
+        """
+        alvik = self._alvik
+        distance = convert_distance(distance, unit, 'mm')
+        alvik._expect_target(ord('M'), blocking)
+        alvik._commands.send(PACKET_C1F, ord('G'), distance)
+        if blocking:
+            await self._wait_for_target()
+
+    async def set_wheels_position(self, left_angle: float, right_angle: float, unit: str = 'deg',
+                                  blocking: bool = True) -> None:
+        """
+        Sets left/right motor angle
+        :param left_angle:
+        :param right_angle:
+        :param unit: the angle unit
+        :param blocking: if True, returns when the wheels reach the position
+        :return:
+        """
+        alvik = self._alvik
+        left_angle = convert_angle(left_angle, unit, 'deg')
+        right_angle = convert_angle(right_angle, unit, 'deg')
+        alvik._expect_target(ord('P'), blocking)
+        alvik._commands.send(PACKET_C2F, ord('A'), left_angle, right_angle)
+        if blocking:
+            await self._wait_for_target()
+
+    async def reset_pose(self, x: float, y: float, theta: float, distance_unit: str = 'cm', angle_unit: str = 'deg'):
+        """
+        Resets the robot pose
+        :param x: x coordinate of the robot
+        :param y: y coordinate of the robot
+        :param theta: angle of the robot
+        :param distance_unit: unit of x and y
+        :param angle_unit: unit of theta
+        :return:
+        """
+        x = convert_distance(x, distance_unit, 'mm')
+        y = convert_distance(y, distance_unit, 'mm')
+        theta = convert_angle(theta, angle_unit, 'deg')
+        self._alvik._commands.send(PACKET_C3F, ord('Z'), x, y, theta)
+        await asyncio.sleep_ms(1000)
+
+    # SENSORS #
+
+    async def color_calibration(self, background: str = 'white') -> None:
+        """
+        Calibrates the color sensor, averaging the readings received by the reader task for one second
+        :param background: str white or black
+        :return:
+        """
+        if background not in ['black', 'white']:
+            return
+
+        red_avg = green_avg = blue_avg = 0
+
+        for _ in range(0, 100):
+            red, green, blue = self._alvik.get_color_raw()
+            red_avg += red
+            green_avg += green
+            blue_avg += blue
+            await asyncio.sleep_ms(10)
+
+        self._alvik._save_color_calibration(background, int(red_avg / 100), int(green_avg / 100),
+                                            int(blue_avg / 100))
+
+    # EVENTS #
+
+    def _start_events(self) -> None:
+        """
+        Starts the events task
+        :return:
+        """
+        if self._events_task is None:
+            self._alvik._timer_events.reset()
+            self._alvik._move_events.reset(_ArduinoAlvikMoveEvents.NZ_TILT)
+            self._events_task = asyncio.create_task(self._update_events())
+
+    async def _update_events(self) -> None:
+        """
+        Updates the events state, the asyncio counterpart of ArduinoAlvik._update_events
+        :return:
+        """
+        alvik = self._alvik
+        while self._running:
+            if alvik.is_on():
+                alvik._touch_events.update_state(alvik._touch_byte)
+                alvik._move_events.update_state(alvik._move_byte)
+                alvik._timer_events.update_state(ticks_ms())
+            await asyncio.sleep_ms(alvik._events_delay(self._events_ms))
+
+    def _stream(self, events, size: int) -> AsyncAlvikEventStream:
+        """
+        Creates a stream of all the events of an events handler. Callbacks already registered keep working
+        :param events: the events handler
+        :param size: size of the stream
+        :return:
+        """
+        stream = AsyncAlvikEventStream(size)
+        for event_name in events.available_events:
+            previous = events._callbacks.get(event_name)
+            events.register_callback(event_name, self._dispatch, (stream, event_name, previous))
+        if self._running:
+            self._start_events()
+        return stream
+
+    @staticmethod
+    def _dispatch(stream: AsyncAlvikEventStream, event_name: str, previous) -> None:
+        stream.push(event_name)
+        if previous is not None:
+            previous[0](*previous[1])
+
+    def touch_events(self, size: int = 8) -> AsyncAlvikEventStream:
+        """
+        Returns a stream of the touch events ('on_ok_pressed', 'on_cancel_pressed', ...)
+        :param size: maximum number of events waiting to be consumed
+        :return:
+        """
+        return self._stream(self._alvik._touch_events, size)
+
+    def move_events(self, size: int = 8) -> AsyncAlvikEventStream:
+        """
+        Returns a stream of the move events ('on_shake', 'on_x_tilt', ...)
+        :param size: maximum number of events waiting to be consumed
+        :return:
+        """
+        return self._stream(self._alvik._move_events, size)
+
+    def timer_events(self, mode: str, period: int, size: int = 8) -> AsyncAlvikEventStream:
+        """
+        Returns a stream of timer events
+        :param mode: _ArduinoAlvikTimerEvents.PERIODIC or .ONE_SHOT
+        :param period: period in milliseconds
+        :param size: maximum number of events waiting to be consumed
+        :return:
+        """
+        self._alvik._timer_events = _ArduinoAlvikTimerEvents(period)
+        stream = AsyncAlvikEventStream(size)
+        self._alvik._timer_events.register_callback(mode, stream.push, (mode,))
+        if self._running:
+            self._alvik._timer_events.reset()
+            self._start_events()
+        return stream
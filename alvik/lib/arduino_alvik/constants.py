@@ -2,4 +2,20 @@
 # COLOR SENSOR
 COLOR_FULL_SCALE = 4097
 WHITE_CAL = [450, 500, 510]
-BLACK_CAL = [160, 200, 190]
\ No newline at end of file
+BLACK_CAL = [160, 200, 190]
+
+# MOTION ACKNOWLEDGMENT
+# acks older than this, received after answering a target ack, may still refer to the previous target
+ACK_GUARD_MS = 100
+
+# UPDATE LOOP
+UPDATE_MIN_DELAY_MS = 1         # delay of the update loop while bytes are arriving
+UPDATE_MAX_DELAY_MS = 10        # the delay doubles up to this value while the link is idle
+UART_BACKLOG_THRESHOLD = 128    # bytes left in the UART that make the update loop run again without waiting
+EVENTS_MAX_DELAY_MS = 200       # delay of the events loop when there is nothing to sample
+
+# I2C BUS
+I2C_TICK_MS = 20                # the writes queued on the I2C bus are sent together once per tick
+
+# IDLE MODE
+BATTERY_REFRESH_MS = 5000       # the fuel gauge is read at most once per interval while the robot is off
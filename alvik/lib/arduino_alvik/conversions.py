@@ -1,4 +1,6 @@
 # MEASUREMENT UNITS CONVERSION #
+# The conversion factors are precomputed for every (from, to) pair of units: factors[from_unit][to_unit].
+# Units are case insensitive, a spelling missing from a table is looked up lowercase once and then cached
 
 from math import pi
 
@@ -16,7 +18,42 @@ def conversion_method(func):
     return wrapper
 
 
-@conversion_method
+def _factor_table(units: dict) -> dict:
+    """
+    Precomputes the conversion factors between all the units of a quantity
+    :param units: value of each unit in the reference unit
+    :return: factors[from_unit][to_unit]
+    """
+    return {from_unit: {to_unit: units[from_unit] / units[to_unit] for to_unit in units} for from_unit in units}
+
+
+_ROTATIONAL_SPEED_FACTORS = _factor_table({'rpm': 1.0, 'deg/s': 1/6, 'rad/s': 60/(2*pi), 'rev/s': 60})
+_ANGLE_FACTORS = _factor_table({'deg': 1.0, 'rad': 180/pi, 'rev': 360, 'revolution': 360, '%': 3.6, 'perc': 3.6})
+_DISTANCE_FACTORS = _factor_table({'cm': 1.0, 'mm': 0.1, 'm': 100, 'inch': 2.54, 'in': 2.54})
+_SPEED_FACTORS = _factor_table({'cm/s': 1.0, 'mm/s': 0.1, 'm/s': 100, 'inch/s': 2.54, 'in/s': 2.54})
+
+
+def _factor(factors: dict, name: str, from_unit: str, to_unit: str) -> float:
+    """
+    Returns a conversion factor from a table
+    :param factors: the factors table
+    :param name: name of the conversion, for the error message
+    :param from_unit: unit of input value
+    :param to_unit: unit of output value
+    :return:
+    """
+    try:
+        return factors[from_unit][to_unit]
+    except (KeyError, TypeError):
+        pass
+    try:
+        factor = factors[from_unit.lower()][to_unit.lower()]
+    except (KeyError, AttributeError):
+        raise ConversionError(f'Cannot {name} from {from_unit} to {to_unit}')
+    factors.setdefault(from_unit, dict())[to_unit] = factor
+    return factor
+
+
 def convert_rotational_speed(value: float, from_unit: str, to_unit: str) -> float:
     """
     Converts a rotational speed value from one unit to another
@@ -25,11 +62,12 @@ def convert_rotational_speed(value: float, from_unit: str, to_unit: str) -> floa
     :param to_unit: unit of output value
     :return:
     """
-    speeds = {'rpm': 1.0, 'deg/s': 1/6, 'rad/s': 60/(2*pi), 'rev/s': 60}
-    return value * speeds[from_unit.lower()] / speeds[to_unit.lower()]
+    try:
+        return value * _factor(_ROTATIONAL_SPEED_FACTORS, 'convert_rotational_speed', from_unit, to_unit)
+    except TypeError:
+        return None
 
 
-@conversion_method
 def convert_angle(value: float, from_unit: str, to_unit: str) -> float:
     """
     Converts an angle value from one unit to another
@@ -38,11 +76,12 @@ def convert_angle(value: float, from_unit: str, to_unit: str) -> float:
     :param to_unit: unit of output value
     :return:
     """
-    angles = {'deg': 1.0, 'rad': 180/pi, 'rev': 360, 'revolution': 360, '%': 3.6, 'perc': 3.6}
-    return value * angles[from_unit.lower()] / angles[to_unit.lower()]
+    try:
+        return value * _factor(_ANGLE_FACTORS, 'convert_angle', from_unit, to_unit)
+    except TypeError:
+        return None
 
 
-@conversion_method
 def convert_distance(value: float, from_unit: str, to_unit: str) -> float:
     """
     Converts a distance value from one unit to another
@@ -51,11 +90,12 @@ def convert_distance(value: float, from_unit: str, to_unit: str) -> float:
     :param to_unit: unit of output value
     :return:
     """
-    distances = {'cm': 1.0, 'mm': 0.1, 'm': 100, 'inch': 2.54, 'in': 2.54}
-    return value * distances[from_unit.lower()] / distances[to_unit.lower()]
+    try:
+        return value * _factor(_DISTANCE_FACTORS, 'convert_distance', from_unit, to_unit)
+    except TypeError:
+        return None
 
 
-@conversion_method
 def convert_speed(value: float, from_unit: str, to_unit: str) -> float:
     """
     Converts a distance value from one unit to another
@@ -64,8 +104,51 @@ def convert_speed(value: float, from_unit: str, to_unit: str) -> float:
     :param to_unit: unit of output value
     :return:
     """
-    distances = {'cm/s': 1.0, 'mm/s': 0.1, 'm/s': 100, 'inch/s': 2.54, 'in/s': 2.54}
-    return value * distances[from_unit.lower()] / distances[to_unit.lower()]
+    try:
+        return value * _factor(_SPEED_FACTORS, 'convert_speed', from_unit, to_unit)
+    except TypeError:
+        return None
+
+
+_FACTORS = {
+    convert_rotational_speed: (_ROTATIONAL_SPEED_FACTORS, 'convert_rotational_speed'),
+    convert_angle: (_ANGLE_FACTORS, 'convert_angle'),
+    convert_distance: (_DISTANCE_FACTORS, 'convert_distance'),
+    convert_speed: (_SPEED_FACTORS, 'convert_speed'),
+}
+
+
+def conversion_factor(converter, from_unit: str, to_unit: str) -> float:
+    """
+    Returns the factor of a conversion, to resolve it once out of a loop, e.g.:
+        k = conversion_factor(convert_distance, 'mm', 'cm')
+    :param converter: the conversion function (convert_rotational_speed, convert_angle, convert_distance, convert_speed)
+    :param from_unit: unit of input values
+    :param to_unit: unit of output values
+    :return:
+    """
+    factors, name = _FACTORS[converter]
+    return _factor(factors, name, from_unit, to_unit)
+
+
+def convert_array(converter, values, from_unit: str, to_unit: str, out=None):
+    """
+    Converts a sequence of values from one unit to another, resolving the conversion factor once.
+    None values stay None
+    :param converter: the conversion function (convert_rotational_speed, convert_angle, convert_distance, convert_speed)
+    :param values: list, tuple or array of values
+    :param from_unit: unit of input values
+    :param to_unit: unit of output values
+    :param out: list or array receiving the converted values (it can be values itself), a new list if None
+    :return: out
+    """
+    factor = conversion_factor(converter, from_unit, to_unit)
+    if out is None:
+        out = [None] * len(values)
+    for i in range(0, len(values)):
+        value = values[i]
+        out[i] = value * factor if value is not None else None
+    return out
 
 
 class ConversionError(Exception):
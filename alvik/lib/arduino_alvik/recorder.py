@@ -0,0 +1,113 @@
+# TELEMETRY RECORDER #
+
+import struct
+import _thread
+
+from ucPack.CircularBuffer import CircularBuffer
+
+# Log file layout (little endian):
+#   header:  b'ALVK' | version (1 byte) | number of codecs (1 byte)
+#            then for each codec: code (1 byte) | length of the struct format (1 byte) | struct format (ascii)
+#   records: ticks_ms (uint32, wrapping around at 2**30 as on MicroPython) | payload length (1 byte) | payload
+#            (message code included)
+LOG_MAGIC = b'ALVK'
+LOG_VERSION = 1
+RECORD_HEADER_FORMAT = '<IB'
+RECORD_HEADER_SIZE = 5
+
+
+class TelemetryRecorder:
+    """
+    Records the messages received from the robot in a preallocated RAM ring buffer
+    and flushes them to a binary log file in large blocks
+    """
+
+    def __init__(self, file_path: str, codecs: dict, ring_size: int = 8192, block_size: int = 2048):
+        """
+        Telemetry recorder initialization
+        :param file_path: path of the log file, overwritten if it exists
+        :param codecs: ucPack codecs (message code: (struct format, payload size)) written in the log header
+        :param ring_size: size of the RAM ring buffer in bytes
+        :param block_size: number of bytes written to the file at once
+        """
+        self._ring = CircularBuffer(ring_size)
+        self._block_size = min(block_size, ring_size)
+        self._header = bytearray(RECORD_HEADER_SIZE)
+        self._lock = _thread.allocate_lock()          # guards the ring buffer
+        self._file_lock = _thread.allocate_lock()     # serializes the writes to the file
+        self._closed = False
+        self.records = 0
+        self.dropped = 0
+
+        self._file = open(file_path, 'wb')
+        self._file.write(LOG_MAGIC)
+        self._file.write(bytes((LOG_VERSION, len(codecs))))
+        for code, packet_format in codecs.items():
+            self._file.write(bytes((code, len(packet_format[0]))))
+            self._file.write(packet_format[0].encode())
+
+    def record(self, ticks: int, payload, payload_size: int) -> bool:
+        """
+        Appends a message to the ring buffer. The message is dropped if the ring buffer is full
+        :param ticks: arrival time of the message (ticks_ms)
+        :param payload: the raw payload, message code included
+        :param payload_size: size of the payload
+        :return: True if the message was recorded
+        """
+        with self._lock:
+            if self._ring.getSize() + RECORD_HEADER_SIZE + payload_size > len(self._ring.ptr()):
+                self.dropped += 1
+                return False
+            struct.pack_into(RECORD_HEADER_FORMAT, self._header, 0, ticks, payload_size)
+            self._ring.extend(self._header)
+            self._ring.extend(memoryview(payload)[0:payload_size])
+            self.records += 1
+        return True
+
+    def pending(self) -> int:
+        """
+        Returns the number of bytes waiting to be written to the file
+        :return:
+        """
+        return self._ring.getSize()
+
+    def service(self) -> int:
+        """
+        Writes one block to the file if a whole block is ready. Meant to be called periodically
+        :return: the number of bytes written
+        """
+        if self._ring.getSize() < self._block_size:
+            return 0
+        return self.flush(self._block_size)
+
+    def flush(self, n_bytes: int = None) -> int:
+        """
+        Writes the buffered bytes to the file
+        :param n_bytes: maximum number of bytes to write (defaults to all)
+        :return: the number of bytes written
+        """
+        with self._file_lock:
+            if self._closed:
+                return 0
+            # the bytes in the views are not touched by record, which only appends to the free space
+            with self._lock:
+                first, second = self._ring.views(0, n_bytes)
+            self._file.write(first)
+            if len(second):
+                self._file.write(second)
+            written = len(first) + len(second)
+            with self._lock:
+                self._ring.discard(written)
+        return written
+
+    def close(self) -> None:
+        """
+        Flushes everything and closes the log file
+        :return:
+        """
+        self.flush()
+        with self._file_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.close()
@@ -0,0 +1,394 @@
+# STM32 FIRMWARE SIMULATOR #
+#
+# Simulates the motor controller side of the ucPack link, so that ArduinoAlvik can run without the robot:
+#   alvik = ArduinoAlvik(transport=SimulatedSTM32())
+# It runs both on MicroPython and on CPython.
+
+import math
+import _thread
+
+from ucPack import ucPack
+from ucPack import PACKET_C1B, PACKET_C2B, PACKET_C3B, PACKET_C7I, PACKET_C1F, PACKET_C2F, PACKET_C3F, PACKET_C6F, \
+    PACKET_C1B3F, PACKET_C2B1F
+from ucPack.CircularBuffer import CircularBuffer
+
+try:
+    from .transport import AlvikTransport, ticks_ms, ticks_diff
+    from .robot_definitions import *
+except ImportError:                                 # loaded outside of the arduino_alvik package (CPython tools)
+    from transport import AlvikTransport, ticks_ms, ticks_diff
+    from robot_definitions import *
+
+# default telemetry rates (Hz)
+DEFAULT_RATES = {
+    'j': 25,        # wheels speed
+    'w': 25,        # wheels position
+    'z': 25,        # pose
+    'v': 25,        # robot velocity
+    'i': 50,        # imu
+    'q': 50,        # orientation
+    'f': 10,        # tof matrix
+    'x': 10,        # ack
+    'p': 1,         # battery
+}
+
+_TELEMETRY_CODECS = {
+    'j': PACKET_C2F, 'w': PACKET_C2F, 'z': PACKET_C3F, 'v': PACKET_C2F, 'i': PACKET_C6F, 'q': PACKET_C3F,
+    'f': PACKET_C7I, 'x': PACKET_C1B, 'p': PACKET_C1F, '~': PACKET_C3B,
+}
+
+_COMMAND_CODECS = {
+    'X': PACKET_C1B, 'B': PACKET_C1B, 'L': PACKET_C1B, 'S': PACKET_C2B, 'R': PACKET_C1F, 'G': PACKET_C1F,
+    'J': PACKET_C2F, 'A': PACKET_C2F, 'V': PACKET_C2F, 'Z': PACKET_C3F, 'W': PACKET_C2B1F, 'P': PACKET_C1B3F,
+}
+
+_STEP_MS = 5                                        # integration step
+_SPEED_TIME_CONSTANT_MS = 50                        # first order response of the speed control
+_BOOT_PERIOD_MS = 100                               # period of the version message until the first command
+_WHEEL_MM_PER_DEG = math.pi * WHEEL_DIAMETER_MM / 360
+
+
+class SimulatedSTM32(AlvikTransport):
+    """
+    Simulated motor controller.
+    It decodes the commands written by ArduinoAlvik, integrates the differential drive kinematics
+    and sends back the telemetry at the configured rates. The simulation advances every time the transport is polled
+    """
+
+    def __init__(self, rates: dict = None, fw_version: (int, int, int) = (1, 0, 4), tx_buffer_size: int = 2048):
+        """
+        Simulator initialization
+        :param rates: telemetry rates in Hz by message code, they update DEFAULT_RATES (0 disables a message)
+        :param fw_version: firmware version reported to the library
+        :param tx_buffer_size: size of the buffer of the bytes not read yet, oldest bytes are lost when it overflows
+        """
+        self._lock = _thread.allocate_lock()
+        self._rx = ucPack(200)
+        for code, packet_format in _COMMAND_CODECS.items():
+            self._rx.registerCodec(ord(code), packet_format)
+        self._tx = ucPack(200)
+        for code, packet_format in _TELEMETRY_CODECS.items():
+            self._tx.registerCodec(ord(code), packet_format)
+        self._tx_buffer = CircularBuffer(tx_buffer_size)
+
+        self._periods = dict()
+        self.set_rates(DEFAULT_RATES)
+        if rates is not None:
+            self.set_rates(rates)
+        self._fw_version = fw_version
+
+        # statistics
+        self.commands = dict()
+        self.bytes_sent = 0
+        self.overflows = 0
+
+        self.reset()
+
+    def set_rates(self, rates: dict) -> None:
+        """
+        Sets the telemetry rates
+        :param rates: rates in Hz by message code (0 disables a message)
+        :return:
+        """
+        with self._lock:
+            for code, rate in rates.items():
+                if ord(code) not in self._tx.codecs:
+                    raise ValueError(f'Unknown telemetry message {code}')
+                self._periods[ord(code)] = 1000 / rate if rate else 0
+
+    def reset(self) -> None:
+        """
+        Reboots the simulated firmware: the robot stands still at the origin
+        :return:
+        """
+        with self._lock:
+            self._last_ticks = ticks_ms()
+            self._clock = 0.0                               # simulated time (ms)
+            self._next = {code: 0.0 for code in self._periods}
+            self._next_boot = 0.0
+            self._booting = True
+            self._rx.resetParser()
+            self._tx_buffer = CircularBuffer(len(self._tx_buffer.ptr()))
+
+            self._speed = [0.0, 0.0]                        # actual wheels speed (rpm)
+            self._target_speed = [0.0, 0.0]                 # speed setpoints (rpm)
+            self._position = [0.0, 0.0]                     # wheels position (deg)
+            self._target_position = None                    # position setpoints (deg), None in speed control
+            self._position_speed = MOTOR_CONTROL_DEG_S      # wheels speed in position control (deg/s)
+            self._pending_ack = 0x00                        # ack sent when the position target is reached
+            self._target_clock = 0.0                        # time the position target was set (ms)
+            self.last_motion_ms = 0.0                       # duration of the last position control motion
+            self._ack = 0x00
+            self._x = 0.0                                   # pose (mm, mm, deg)
+            self._y = 0.0
+            self._theta = 0.0
+            self._linear_velocity = 0.0                     # mm/s
+            self._angular_velocity = 0.0                    # deg/s
+            self._acceleration = 0.0                        # mm/s^2
+            self.behaviour = 0
+            self.leds = 0
+            self.servo_positions = [0, 0]
+            self.distances = [500, 500, 500, 500, 500, 500, 500]
+            self.battery = 80.0
+
+    @staticmethod
+    def is_on() -> bool:
+        """
+        The simulated robot is always on
+        :return:
+        """
+        return True
+
+    # TRANSPORT #
+
+    def any(self) -> int:
+        with self._lock:
+            self._advance()
+            return self._tx_buffer.getSize()
+
+    def readinto(self, buf, n_bytes: int = None) -> int | None:
+        with self._lock:
+            self._advance()
+            size = len(buf) if n_bytes is None else min(n_bytes, len(buf))
+            n_read = self._tx_buffer.peek_into(buf, 0, size)
+            self._tx_buffer.discard(n_read)
+            return n_read if n_read else None
+
+    def write(self, buf) -> int:
+        with self._lock:
+            self._advance()
+            view = memoryview(buf)
+            offset = 0
+            while offset < len(view):
+                # feed the parser no more than its free space, a write may hold many frames
+                n_bytes = min(len(view) - offset, self._rx.buffer_size - self._rx.buffer.getSize())
+                self._rx.buffer.extend(view[offset:offset + n_bytes])
+                offset += n_bytes
+                while self._rx.checkPayload():
+                    self._on_command(self._rx.unpacket())
+            return len(buf)
+
+    # COMMANDS #
+
+    def _on_command(self, message: tuple) -> None:
+        """
+        Executes a command
+        :param message: the unpacked command, code included
+        :return:
+        """
+        code = chr(message[0])
+        self.commands[code] = self.commands.get(code, 0) + 1
+        self._booting = False
+
+        if code == 'J':
+            self._set_speed(message[1], message[2])
+        elif code == 'V':
+            linear_rpm = message[1] / (_WHEEL_MM_PER_DEG * 6)
+            angular_rpm = math.radians(message[2]) * WHEEL_TRACK_MM / 2 / (_WHEEL_MM_PER_DEG * 6)
+            self._set_speed(linear_rpm - angular_rpm, linear_rpm + angular_rpm)
+        elif code == 'G':
+            delta = message[1] / _WHEEL_MM_PER_DEG
+            self._set_target(self._position[0] + delta, self._position[1] + delta,
+                             MOTOR_CONTROL_MM_S / _WHEEL_MM_PER_DEG, ord('M'))
+        elif code == 'R':
+            delta = math.radians(message[1]) * WHEEL_TRACK_MM / 2 / _WHEEL_MM_PER_DEG
+            self._set_target(self._position[0] - delta, self._position[1] + delta,
+                             MOTOR_CONTROL_DEG_S, ord('R'))
+        elif code == 'A':
+            self._set_target(message[1], message[2], MOTOR_CONTROL_DEG_S, ord('P'))
+        elif code == 'W':
+            self._on_wheel_command(0 if message[1] == ord('L') else 1, chr(message[2]), message[3])
+        elif code == 'Z':
+            self._x, self._y, self._theta = message[1], message[2], message[3]
+        elif code == 'X':
+            if message[1] == ord('K'):
+                self._ack = 0x00
+        elif code == 'B':
+            self.behaviour = message[1]
+        elif code == 'L':
+            self.leds = message[1]
+        elif code == 'S':
+            self.servo_positions = [message[1], message[2]]
+
+    def _on_wheel_command(self, index: int, command: str, value: float) -> None:
+        """
+        Executes a single wheel command
+        :param index: 0 left, 1 right
+        :param command: V speed, P position, Z position reset
+        :param value:
+        :return:
+        """
+        if command == 'V':
+            speed = list(self._target_speed)
+            speed[index] = value
+            self._set_speed(speed[0], speed[1])
+        elif command == 'P':
+            target = list(self._position if self._target_position is None else self._target_position)
+            target[index] = value
+            self._set_target(target[0], target[1], MOTOR_CONTROL_DEG_S, ord('P'))
+        elif command == 'Z':
+            self._position[index] = value
+            if self._target_position is not None:
+                self._target_position[index] = value
+
+    def _set_speed(self, left: float, right: float) -> None:
+        """
+        Switches to speed control
+        :param left: rpm
+        :param right: rpm
+        :return:
+        """
+        self._target_position = None
+        self._target_speed = [max(-MOTOR_MAX_RPM, min(MOTOR_MAX_RPM, left)),
+                              max(-MOTOR_MAX_RPM, min(MOTOR_MAX_RPM, right))]
+
+    def _set_target(self, left: float, right: float, speed: float, ack: int) -> None:
+        """
+        Switches to position control
+        :param left: target position (deg)
+        :param right: target position (deg)
+        :param speed: speed of the faster wheel (deg/s)
+        :param ack: ack sent when the target is reached
+        :return:
+        """
+        self._target_position = [left, right]
+        self._position_speed = min(speed, MOTOR_MAX_RPM * 6)
+        self._pending_ack = ack
+        self._target_clock = self._clock
+
+    # SIMULATION #
+
+    def _advance(self) -> None:
+        """
+        Advances the simulation to the current time and queues the telemetry that became due
+        :return:
+        """
+        now = ticks_ms()
+        elapsed = ticks_diff(now, self._last_ticks)
+        self._last_ticks = now
+        target = self._clock + elapsed
+        while self._clock < target:
+            dt = min(_STEP_MS, target - self._clock)
+            self._step(dt / 1000)
+            self._clock += dt
+            self._send_due()
+
+    def _step(self, dt: float) -> None:
+        """
+        Integrates the wheels and the robot pose
+        :param dt: time step (s)
+        :return:
+        """
+        previous = list(self._position)
+        previous_linear_velocity = self._linear_velocity
+
+        if self._target_position is None:
+            alpha = min(1.0, dt * 1000 / _SPEED_TIME_CONSTANT_MS)
+            for i in range(0, 2):
+                self._speed[i] += (self._target_speed[i] - self._speed[i]) * alpha
+                self._position[i] += self._speed[i] * 6 * dt
+        else:
+            errors = [self._target_position[0] - self._position[0], self._target_position[1] - self._position[1]]
+            largest = max(abs(errors[0]), abs(errors[1]))
+            step = self._position_speed * dt
+            if largest <= step:
+                self._position = list(self._target_position)
+                self._target_position = None
+                self._target_speed = [0.0, 0.0]
+                self._ack = self._pending_ack
+                self.last_motion_ms = self._clock + dt * 1000 - self._target_clock
+            else:
+                # both wheels arrive together
+                for i in range(0, 2):
+                    self._position[i] += errors[i] / largest * step
+            for i in range(0, 2):
+                self._speed[i] = (self._position[i] - previous[i]) / (6 * dt)
+
+        left_mm = (self._position[0] - previous[0]) * _WHEEL_MM_PER_DEG
+        right_mm = (self._position[1] - previous[1]) * _WHEEL_MM_PER_DEG
+        distance = (left_mm + right_mm) / 2
+        rotation = (right_mm - left_mm) / WHEEL_TRACK_MM
+        heading = math.radians(self._theta) + rotation / 2
+        self._x += distance * math.cos(heading)
+        self._y += distance * math.sin(heading)
+        self._theta = (self._theta + math.degrees(rotation) + 180) % 360 - 180
+        self._linear_velocity = distance / dt
+        self._angular_velocity = math.degrees(rotation) / dt
+        self._acceleration = (self._linear_velocity - previous_linear_velocity) / dt
+
+    def _send_due(self) -> None:
+        """
+        Queues the telemetry messages whose time has come
+        :return:
+        """
+        clock = self._clock
+        if self._booting and clock >= self._next_boot:
+            self._send('~', *self._fw_version)
+            self._send('x', 0x00)
+            self._next_boot = clock + _BOOT_PERIOD_MS
+
+        for code, period in self._periods.items():
+            if not period or clock < self._next[code]:
+                continue
+            # a late poll does not produce a burst of stale messages
+            self._next[code] = max(self._next[code] + period, clock)
+            self._send_telemetry(code)
+
+    def _send_telemetry(self, code: int) -> None:
+        """
+        Queues a telemetry message
+        :param code:
+        :return:
+        """
+        if code == ord('j'):
+            self._send('j', self._speed[0], self._speed[1])
+        elif code == ord('w'):
+            self._send('w', self._position[0], self._position[1])
+        elif code == ord('z'):
+            self._send('z', self._x, self._y, self._theta)
+        elif code == ord('v'):
+            self._send('v', self._linear_velocity, self._angular_velocity)
+        elif code == ord('i'):
+            self._send('i', self._acceleration / 9806.65, 0.0, 1.0, 0.0, 0.0, self._angular_velocity)
+        elif code == ord('q'):
+            self._send('q', 0.0, 0.0, self._theta)
+        elif code == ord('f'):
+            self._send('f', *self.distances)
+        elif code == ord('x'):
+            self._send('x', self._ack)
+        elif code == ord('p'):
+            self._send('p', self.battery)
+
+    def _send(self, code: str, *values) -> None:
+        """
+        Packs a message into the transmission buffer
+        :param code:
+        :param values:
+        :return:
+        """
+        size = self._tx.packet(ord(code), *values)
+        if self._tx_buffer.getSize() + size > len(self._tx_buffer.ptr()):
+            self.overflows += 1
+        self._tx_buffer.extend(self._tx.msg[0:size])
+        self.bytes_sent += size
+
+    def get_state(self) -> dict:
+        """
+        Returns the simulated robot state
+        :return:
+        """
+        with self._lock:
+            return {
+                'clock_ms': self._clock,
+                'wheels_speed': tuple(self._speed),
+                'wheels_position': tuple(self._position),
+                'pose': (self._x, self._y, self._theta),
+                'ack': self._ack,
+                'last_motion_ms': self.last_motion_ms,
+                'commands': dict(self.commands),
+                'rx_frames': self._rx.frames,
+                'rx_crc_errors': self._rx.crc_errors,
+                'rx_skipped_bytes': self._rx.skipped_bytes,
+                'bytes_sent': self.bytes_sent,
+                'overflows': self.overflows,
+            }
@@ -43,6 +43,16 @@ uart = UART(_UART_ID, baudrate=_BAUDRATE, bits=_BITS, parity=_PARITY, stop=_STOP
             rx=_RX_PIN)  # parity 0 equals to Even, 1 to Odd
 
 
+def STM32_setTransport(transport) -> None:
+    """
+    Replaces the UART used to talk with the STM32 bootloader
+    :param transport: an object with the read/write methods of machine.UART (see arduino_alvik.transport)
+    :return:
+    """
+    global uart
+    uart = transport
+
+
 def STM32_startCommunication() -> bytes:
     """
     Starts communication with STM32 sending just 0x7F. Blocking
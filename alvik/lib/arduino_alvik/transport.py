@@ -0,0 +1,247 @@
+# TRANSPORTS #
+#
+# A transport is the byte link between ArduinoAlvik and the motor controller.
+# It has the same methods of machine.UART used by the library: any(), read(), readinto() and write(),
+# so machine.UART itself is a transport. Optionally it can provide is_on() to replace the check of the STM32 power pin.
+
+import struct
+
+# ticks_ms wraps around at TICKS_PERIOD, as on MicroPython
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:                                 # CPython
+    from time import monotonic
+
+    def ticks_ms() -> int:
+        return int(monotonic() * 1000) & TICKS_MAX
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        return ((ticks1 - ticks2 + TICKS_PERIOD // 2) & TICKS_MAX) - TICKS_PERIOD // 2
+
+# Capture file layout (little endian):
+#   header:  b'ALVC' | version (1 byte)
+#   chunks:  ticks_ms (uint32, wrapping around at TICKS_PERIOD) | chunk length (uint16) | bytes received from the UART
+CAPTURE_MAGIC = b'ALVC'
+CAPTURE_VERSION = 1
+CHUNK_HEADER_FORMAT = '<IH'
+CHUNK_HEADER_SIZE = 6
+
+
+class AlvikTransport:
+    """
+    Base class of the transports
+    """
+
+    def any(self) -> int:
+        """
+        Returns the number of bytes that can be read without blocking
+        :return:
+        """
+        raise NotImplementedError
+
+    def readinto(self, buf, n_bytes: int = None) -> int | None:
+        """
+        Reads the available bytes into buf
+        :param buf:
+        :param n_bytes: maximum number of bytes to read (defaults to the size of buf)
+        :return: the number of bytes read, None if nothing was available
+        """
+        raise NotImplementedError
+
+    def read(self, n_bytes: int = None) -> bytes | None:
+        """
+        Reads the available bytes
+        :param n_bytes: maximum number of bytes to read (defaults to all)
+        :return: the bytes read, None if nothing was available
+        """
+        available = self.any()
+        if n_bytes is not None:
+            available = min(n_bytes, available)
+        if available <= 0:
+            return None
+        buf = bytearray(available)
+        n_read = self.readinto(buf)
+        return bytes(buf[0:n_read]) if n_read else None
+
+    def write(self, buf) -> int | None:
+        """
+        Writes buf
+        :param buf:
+        :return: the number of bytes written
+        """
+        raise NotImplementedError
+
+
+class CaptureTransport(AlvikTransport):
+    """
+    Wraps a transport and saves every chunk of bytes read from it, with its arrival time, to a capture file.
+    The capture can be played back with ReplayTransport
+    """
+
+    def __init__(self, transport, file_path: str):
+        """
+        Capture transport initialization
+        :param transport: the wrapped transport (e.g. the uart of the robot)
+        :param file_path: path of the capture file, overwritten if it exists
+        """
+        self._transport = transport
+        self._header = bytearray(CHUNK_HEADER_SIZE)
+        self._file = open(file_path, 'wb')
+        self._file.write(CAPTURE_MAGIC)
+        self._file.write(bytes((CAPTURE_VERSION,)))
+        if hasattr(transport, 'is_on'):
+            self.is_on = transport.is_on
+
+    def _save(self, data) -> None:
+        """
+        Appends a chunk to the capture file
+        :param data:
+        :return:
+        """
+        if self._file is None or not data:
+            return
+        struct.pack_into(CHUNK_HEADER_FORMAT, self._header, 0, ticks_ms(), len(data))
+        self._file.write(self._header)
+        self._file.write(data)
+
+    def any(self) -> int:
+        return self._transport.any()
+
+    def read(self, n_bytes: int = None) -> bytes | None:
+        data = self._transport.read() if n_bytes is None else self._transport.read(n_bytes)
+        self._save(data)
+        return data
+
+    def readinto(self, buf, n_bytes: int = None) -> int | None:
+        n_read = self._transport.readinto(buf) if n_bytes is None else self._transport.readinto(buf, n_bytes)
+        if n_read:
+            self._save(memoryview(buf)[0:n_read])
+        return n_read
+
+    def write(self, buf) -> int | None:
+        return self._transport.write(buf)
+
+    def close(self) -> None:
+        """
+        Closes the capture file, the wrapped transport keeps working
+        :return:
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ReplayTransport(AlvikTransport):
+    """
+    Plays back a capture file as if the bytes were arriving from the robot.
+    The chunks are released with their original timing scaled by speed, or all at once if speed is 0.
+    The written bytes are counted and discarded
+    """
+
+    def __init__(self, file_path: str, speed: float = 1.0):
+        """
+        Replay transport initialization
+        :param file_path: path of a capture file written by CaptureTransport
+        :param speed: playback speed, 1.0 is real time, 2.0 twice as fast, 0 as fast as possible
+        """
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        if data[0:4] != CAPTURE_MAGIC:
+            raise ValueError(f'{file_path} is not an Alvik capture')
+        if data[4] != CAPTURE_VERSION:
+            raise ValueError(f'Unsupported capture version {data[4]}')
+
+        stream = bytearray()
+        self._times = []                            # release time of each chunk (ms from the first one)
+        self._ends = []                             # end of each chunk in the stream
+        offset = 5
+        last_ticks = None
+        time = 0
+        while offset + CHUNK_HEADER_SIZE <= len(data):
+            ticks, length = struct.unpack_from(CHUNK_HEADER_FORMAT, data, offset)
+            offset += CHUNK_HEADER_SIZE
+            if offset + length > len(data):
+                break                               # truncated chunk
+            if last_ticks is not None:
+                # ticks_ms may wrap around during the capture, the time advances by the difference of the ticks
+                time += ticks_diff(ticks, last_ticks)
+            last_ticks = ticks
+            stream.extend(data[offset:offset + length])
+            self._times.append(time)
+            self._ends.append(len(stream))
+            offset += length
+
+        self._stream = memoryview(stream)
+        self.speed = speed
+        self.bytes_written = 0
+        self.rewind()
+
+    def rewind(self) -> None:
+        """
+        Restarts the playback from the beginning, the clock starts with the first read
+        :return:
+        """
+        self._position = 0
+        self._due_index = 0
+        self._due_end = 0
+        self._start = None
+
+    def is_on(self) -> bool:
+        """
+        The replayed robot is always on
+        :return:
+        """
+        return True
+
+    def done(self) -> bool:
+        """
+        Returns True when every byte of the capture has been read
+        :return:
+        """
+        return self._position >= len(self._stream)
+
+    def _release(self) -> int:
+        """
+        Releases the chunks whose time has come
+        :return: the number of released bytes not read yet
+        """
+        if self._start is None:
+            self._start = ticks_ms()
+        if not self.speed:
+            self._due_index = len(self._ends)
+            self._due_end = len(self._stream)
+        else:
+            elapsed = ticks_diff(ticks_ms(), self._start) * self.speed
+            while self._due_index < len(self._ends) and self._times[self._due_index] <= elapsed:
+                self._due_end = self._ends[self._due_index]
+                self._due_index += 1
+        return self._due_end - self._position
+
+    def any(self) -> int:
+        return self._release()
+
+    def readinto(self, buf, n_bytes: int = None) -> int | None:
+        size = len(buf) if n_bytes is None else min(n_bytes, len(buf))
+        n_read = min(size, self._release())
+        if n_read <= 0:
+            return None
+        memoryview(buf)[0:n_read] = self._stream[self._position:self._position + n_read]
+        self._position += n_read
+        return n_read
+
+    def read(self, n_bytes: int = None) -> bytes | None:
+        available = self._release()
+        if n_bytes is not None:
+            available = min(n_bytes, available)
+        if available <= 0:
+            return None
+        data = bytes(self._stream[self._position:self._position + available])
+        self._position += available
+        return data
+
+    def write(self, buf) -> int:
+        self.bytes_written += len(buf)
+        return len(buf)
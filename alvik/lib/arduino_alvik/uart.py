@@ -8,6 +8,7 @@ _BAUDRATE = 460800
 _BITS = 8
 _PARITY = None
 _STOP = 1
+_RXBUF = 1024    # room for the telemetry received while the update loop sleeps
 
 uart = UART(_UART_ID, baudrate=_BAUDRATE, bits=_BITS, parity=_PARITY, stop=_STOP, tx=_TX_PIN,
-            rx=_RX_PIN)  # parity 0 equals to Even, 1 to Odd
+            rx=_RX_PIN, rxbuf=_RXBUF)  # parity 0 equals to Even, 1 to Odd
@@ -4,7 +4,7 @@ __license__ = "MPL 2.0"
 __maintainer__ = "Arduino"
 
 # Import core classes and/or functions to expose them at the package level
-from .modulino import Modulino
+from .modulino import Modulino, I2CHelper
 from .pixels import ModulinoPixels, ModulinoColor
 from .thermo import ModulinoThermo
 from .buzzer import ModulinoBuzzer
@@ -12,4 +12,23 @@ from .buttons import ModulinoButtons
 from .knob import ModulinoKnob
 from .movement import ModulinoMovement
 from .distance import ModulinoDistance
-from .pressure import ModulinoPressure
\ No newline at end of file
+from .pressure import ModulinoPressure
+
+MODULINO_TYPES = [ModulinoPixels, ModulinoThermo, ModulinoBuzzer, ModulinoButtons, ModulinoKnob,
+                  ModulinoMovement, ModulinoDistance, ModulinoPressure]
+
+def discover_all(i2c_bus=None):
+  """
+  Instantiates every known modulino found on the bus with a single scan.
+  A modulino type found at several of its default addresses is instantiated once per address.
+  Returns the list of the modulinos found.
+  """
+  if i2c_bus is None:
+    i2c_bus = I2CHelper.get_interface()
+  devices_on_bus = I2CHelper.scan(i2c_bus, refresh=True)
+  modulinos = []
+  for modulino_type in MODULINO_TYPES:
+    for address in modulino_type.discoverable_addresses():
+      if address in devices_on_bus:
+        modulinos.append(modulino_type(i2c_bus, address))
+  return modulinos
@@ -1,5 +1,5 @@
 from machine import Pin, I2C
-from time import sleep
+from time import sleep, ticks_ms, ticks_diff
 from micropython import const
 import re
 import os
@@ -21,6 +21,8 @@ class I2CHelper:
     """
     i2c_bus = None
     frequency = const(100000) # Modulinos operate at 100kHz
+    scan_refresh_ms = 2000 # A scan is reused for this long, devices plugged or unplugged are seen after it
+    _scans = [] # (bus, ticks_ms of the scan, addresses found) of each bus scanned
 
     @staticmethod
     def extract_i2c_info(i2c_bus):
@@ -62,6 +64,47 @@ class I2CHelper:
       # otherwise it gets stuck.
       return I2C(interface, freq=I2CHelper.frequency)
 
+    @staticmethod
+    def scan(i2c_bus, refresh=False):
+      """
+      Returns the addresses of the devices on the bus.
+      The result of a scan is cached and reused for scan_refresh_ms, refresh forces a new scan.
+      """
+      now = ticks_ms()
+      for i, (bus, scanned_ms, devices) in enumerate(I2CHelper._scans):
+        if bus is i2c_bus:
+          if refresh or ticks_diff(now, scanned_ms) >= I2CHelper.scan_refresh_ms:
+            devices = i2c_bus.scan()
+            I2CHelper._scans[i] = (i2c_bus, now, devices)
+          return devices
+      devices = i2c_bus.scan()
+      I2CHelper._scans.append((i2c_bus, now, devices))
+      return devices
+
+    @staticmethod
+    def set_scan_refresh(refresh_ms):
+      """
+      Sets how long a scan is reused before the bus is scanned again
+      """
+      if refresh_ms < 0:
+        raise ValueError("The refresh interval must not be negative")
+      I2CHelper.scan_refresh_ms = refresh_ms
+
+    @staticmethod
+    def invalidate_scans():
+      """
+      Forgets the cached scans, the next lookup scans the bus again
+      """
+      I2CHelper._scans.clear()
+
+    @staticmethod
+    def set_interface(i2c_bus):
+      """
+      Sets the bus shared by the modulinos created without an explicit bus,
+      e.g. the I2C bus of Alvik: I2CHelper.set_interface(alvik.i2c)
+      """
+      I2CHelper.i2c_bus = i2c_bus
+
     @staticmethod
     def get_interface() -> I2C:
       if(I2CHelper.i2c_bus is None):        
@@ -106,25 +149,32 @@ class Modulino:
 
     self.address = address
     self.name = name
+    self._failed_writes = 0 # queued writes of this device reported failed by the bus
 
     if self.address == None and len(self.default_addresses) > 0:
-      if self.convert_default_addresses:
-        # Need to convert the 8-bit address to 7-bit
-        actual_addresses = list(map(lambda addr: addr >> 1, self.default_addresses))
-        self.address = self.discover(actual_addresses)
-      else:
-        self.address = self.discover(self.default_addresses)
+      self.address = self.discover(self.discoverable_addresses())
+
+  @classmethod
+  def discoverable_addresses(cls):
+    """
+    Returns the 7-bit default addresses of this modulino type.
+    """
+    if cls.convert_default_addresses:
+      # Need to convert the 8-bit address to 7-bit
+      return [addr >> 1 for addr in cls.default_addresses]
+    return cls.default_addresses
 
   def discover(self, default_addresses):
     """
     Tries to find the given modulino device in the device chain
     based on the pre-defined default addresses.
     If the address has been changed to a custom one it won't be found with this function.
+    The bus is scanned once for all the modulinos, see I2CHelper.scan.
     """
     if(len(default_addresses) == 0):
       return None
     
-    devices_on_bus = self.i2c_bus.scan()
+    devices_on_bus = I2CHelper.scan(self.i2c_bus)
     for addr in default_addresses:
       if addr in devices_on_bus:
         return addr
@@ -145,10 +195,11 @@ class Modulino:
   def connected(self):
     """
     Determines if the given modulino is connected to the i2c bus.
+    The answer comes from the last scan of the bus, refreshed every I2CHelper.scan_refresh_ms.
     """
     if not bool(self):
       return False
-    return self.address in self.i2c_bus.scan()
+    return self.address in I2CHelper.scan(self.i2c_bus)
 
   @property
   def pin_strap_address(self):
@@ -191,6 +242,34 @@ class Modulino:
     self.i2c_bus.writeto(self.address, data_buffer)
     return True
 
+  def queue_write(self, data_buffer):
+    """
+    Queues the given buffer for the i2c device when the bus supports it (e.g. the I2C bus of Alvik):
+    the writes queued within the same tick are sent together and only the last one queued for
+    a device is sent. Other buses write the buffer right away.
+    Returns False if the buffer was not queued (e.g. the bus is not accessible from this thread).
+    """
+    if self.address == None:
+      return False
+    queue_writeto = getattr(self.i2c_bus, 'queue_writeto', None)
+    if queue_writeto is None:
+      self.i2c_bus.writeto(self.address, data_buffer)
+      return True
+    return queue_writeto(self.address, data_buffer) > 0
+
+  def queued_write_failed(self):
+    """
+    Returns True if the bus reported a queued write of this device as failed since the last call,
+    e.g. a bus error while the queued writes were sent. Buses writing right away raise the error instead.
+    """
+    failed_writes = getattr(self.i2c_bus, 'failed_writes', None)
+    if failed_writes is None or self.address == None:
+      return False
+    count = failed_writes(self.address)
+    failed = count != self._failed_writes
+    self._failed_writes = count
+    return failed
+
   @property
   def has_default_address(self):
     """
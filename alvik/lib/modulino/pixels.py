@@ -1,5 +1,6 @@
 from .modulino import Modulino
 from micropython import const
+import struct
 
 class ModulinoColor:
   def __init__(self, r, g, b):
@@ -21,12 +22,19 @@ ModulinoColor.WHITE = ModulinoColor(255, 255, 255)
 
 NUM_LEDS = const(8)
 
+# Each LED is a 4 bytes word, little endian: brightness | 0xE0, blue, green, red
+_LED_WORD = "<BBBB"
+# First byte of the word for each brightness percentage, 0..100 mapped to 0..0x1F
+_BRIGHTNESS = bytes(0xE0 | (brightness * 0x1f // 100) for brightness in range(101))
+_CLEARED_FRAME = bytes([0xE0] * NUM_LEDS * 4)
+
 class ModulinoPixels(Modulino):
   default_addresses = [0x6C]
 
   def __init__(self, i2c_bus = None, address=None):
     super().__init__(i2c_bus, address, "LEDS")
-    self.clear_all()
+    self.data = bytearray(_CLEARED_FRAME)
+    self._shown = None # copy of the last frame sent, None until the first show
 
   def _map(self, x, in_min, in_max, out_min, out_max) -> int | float:
     return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
@@ -35,35 +43,53 @@ class ModulinoPixels(Modulino):
     return int(self._map(x, in_min, in_max, out_min, out_max)) 
   
   def set_range_rgb(self, index_from, index_to, r, g, b, brightness=100):
-    self.set_range_color(index_from, index_to, ModulinoColor(r, g, b), brightness)
+    for i in range(index_from, index_to + 1):
+      self.set_rgb(i, r, g, b, brightness)
 
   def set_range_color(self, index_from, index_to, color, brightness=100):
-    for i in range(index_from, index_to + 1):
-      self.set_color(i, color, brightness)
+    self.set_range_rgb(index_from, index_to, color.r, color.g, color.b, brightness)
 
   def set_all_rgb(self, r, g, b, brightness=100):
-    self.set_all_color(ModulinoColor(r, g, b), brightness)
+    self.set_range_rgb(0, NUM_LEDS - 1, r, g, b, brightness)
 
   def set_all_color(self, color, brightness=100):
     self.set_range_color(0, NUM_LEDS - 1, color, brightness)
 
   def set_color(self, idx, rgb : ModulinoColor , brightness=100):
-    if idx < 0 or idx >= NUM_LEDS:
-      raise ValueError(f"LED index out of range {idx} (Valid: 0..{NUM_LEDS - 1})")
-
-    byte_index = idx * 4
-    mapped_brightness = self._mapi(brightness, 0, 100, 0, 0x1f)
-    color_data_bytes =  int(rgb) | mapped_brightness | 0xE0
-    self.data[byte_index: byte_index+4] = color_data_bytes.to_bytes(4, 'little')
+    self.set_rgb(idx, rgb.r, rgb.g, rgb.b, brightness)
 
   def set_rgb(self, idx, r, g, b, brightness=100):
-    self.set_color(idx, ModulinoColor(r, g, b), brightness)
+    """
+    Sets the color of an LED in the frame, sent by show.
+    The brightness is a percentage (0..100).
+    """
+    if idx < 0 or idx >= NUM_LEDS:
+      raise ValueError(f"LED index out of range {idx} (Valid: 0..{NUM_LEDS - 1})")
+    if brightness < 0 or brightness > 100:
+      raise ValueError(f"Brightness out of range {brightness} (Valid: 0..100)")
+    struct.pack_into(_LED_WORD, self.data, idx * 4, _BRIGHTNESS[int(brightness)], b, g, r)
 
   def clear(self, idx):
-    self.set_color(idx, ModulinoColor(0, 0, 0), 0)
+    self.set_rgb(idx, 0, 0, 0, 0)
 
   def clear_all(self):
-    self.data = bytearray([0xE0] * NUM_LEDS * 4)
+    self.data[:] = _CLEARED_FRAME
 
-  def show(self):
-    self.write(self.data)
+  def show(self, force=False):
+    """
+    Sends the frame to the LEDs. A frame equal to the last one sent is skipped,
+    force sends it anyway (e.g. after the modulino was plugged again).
+    A frame whose queued write failed is sent again by the next show.
+    Returns True if the frame was sent.
+    """
+    if self.queued_write_failed():
+      self._shown = None # the last frame may not have reached the LEDs
+    if not force and self._shown == self.data:
+      return False
+    if not self.queue_write(self.data):
+      return False
+    if self._shown is None:
+      self._shown = bytearray(self.data)
+    else:
+      self._shown[:] = self.data
+    return True
@@ -11,6 +11,8 @@ class ModulinoThermo(Modulino):
     # The default I2C address of the HS3003 sensor cannot be changed by the user
     # so we can define it as a constant and avoid discovery overhead.
     DEFAULT_ADDRESS = const(0x44)
+    default_addresses = [DEFAULT_ADDRESS]
+    convert_default_addresses = False
 
     def __init__(self, i2c_bus = None, address: int = DEFAULT_ADDRESS) -> None:
         super().__init__(i2c_bus, address, "THERMO")
@@ -1,8 +1,12 @@
+# bytearray.find is not available on every MicroPython port
+_HAS_FIND = hasattr(bytearray, 'find')
+
 
 class CircularBuffer:
 
     def __init__(self, dimension: int):
         self._buffer = bytearray(dimension)
+        self._view = memoryview(self._buffer)
         self._head = 0
         self._tail = 0
         self._size = 0
@@ -67,12 +71,137 @@ class CircularBuffer:
         :return:
         """
 
-        copy_index = 0
-        if len(self._buffer) < len(to_be_copied):
-            copy_index = len(to_be_copied) - len(self._buffer)
+        self.extend(to_be_copied)
+
+    def extend(self, buf):
+        """
+        Pushes a whole buffer of bytes with (at most) two slice copies.
+        As for push, the oldest bytes are overwritten when the buffer is full
+        :param buf: bytes, bytearray, memoryview or list of int (must be in the range 0-255)
+        :return:
+        """
+
+        capacity = len(self._buffer)
+        n = len(buf)
+        if n == 0:
+            return
+        if not isinstance(buf, memoryview):
+            buf = memoryview(buf) if isinstance(buf, (bytes, bytearray)) else memoryview(bytearray(buf))
+
+        if n >= capacity:
+            self._buffer[0:capacity] = buf[n - capacity:n]
+            self._head = 0
+            self._tail = 0
+            self._size = capacity
+            return
+
+        first = min(n, capacity - self._tail)
+        self._buffer[self._tail:self._tail + first] = buf[0:first]
+        if first < n:
+            self._buffer[0:n - first] = buf[first:n]
+
+        self._tail += n
+        if self._tail >= capacity:
+            self._tail -= capacity
+        self._size += n
+        if self._size >= capacity:
+            self._size = capacity
+            self._head = self._tail
 
-        for i in range(copy_index, len(to_be_copied)):
-            self.push(to_be_copied[i])
+    def peek_into(self, dst, offset: int, n: int) -> int:
+        """
+        Copies n bytes starting at offset (from the head) into dst, without removing them
+        :param dst: destination bytearray or memoryview, at least n bytes long
+        :param offset: index of the first byte to copy
+        :param n: number of bytes to copy
+        :return: the number of bytes actually copied
+        """
+
+        n = min(n, self._size - offset)
+        if n <= 0:
+            return 0
+        first, second = self.views(offset, n)
+        len_first = len(first)
+        dst[0:len_first] = first
+        if len_first < n:
+            dst[len_first:n] = second
+        return n
+
+    def discard(self, n: int) -> int:
+        """
+        Removes n bytes from the head of the buffer
+        :param n: number of bytes to remove
+        :return: the number of bytes actually removed
+        """
+
+        n = min(n, self._size)
+        if n <= 0:
+            return 0
+        self._head += n
+        if self._head >= len(self._buffer):
+            self._head -= len(self._buffer)
+        self._size -= n
+        return n
+
+    def find(self, value: int, offset: int = 0) -> int:
+        """
+        Returns the index (from the head) of the first byte equal to value, searching from offset
+        :param value: the byte to look for
+        :param offset: index of the first byte to check
+        :return: the index of the byte or -1 if not found
+        """
+
+        capacity = len(self._buffer)
+        n = self._size - offset
+        if n <= 0:
+            return -1
+        start = self._head + offset
+        if start >= capacity:
+            start -= capacity
+        first = min(n, capacity - start)
+
+        index = self._find(value, start, start + first)
+        if index >= 0:
+            return offset + index - start
+        if first < n:
+            index = self._find(value, 0, n - first)
+            if index >= 0:
+                return offset + first + index
+        return -1
+
+    def _find(self, value: int, start: int, end: int) -> int:
+        """
+        Returns the storage index of the first byte equal to value in [start, end)
+        :param value:
+        :param start:
+        :param end:
+        :return: the index of the byte or -1 if not found
+        """
+
+        if _HAS_FIND:
+            return self._buffer.find(bytes((value,)), start, end)
+        for i in range(start, end):
+            if self._buffer[i] == value:
+                return i
+        return -1
+
+    def views(self, offset: int = 0, n: int = None) -> (memoryview, memoryview):
+        """
+        Returns the contiguous views of n bytes starting at offset (from the head).
+        The second view is empty unless the bytes wrap around the end of the storage
+        :param offset: index of the first byte
+        :param n: number of bytes (defaults to all the bytes after offset)
+        :return: first and second memoryview
+        """
+
+        capacity = len(self._buffer)
+        if n is None or n > self._size - offset:
+            n = max(self._size - offset, 0)
+        start = self._head + offset
+        if start >= capacity:
+            start -= capacity
+        first = min(n, capacity - start)
+        return self._view[start:start + first], self._view[0:n - first]
 
     def getSize(self):
         """
@@ -89,7 +218,10 @@ class CircularBuffer:
         :return:
         """
 
-        return self._buffer[(self._head+index) % len(self._buffer)]
+        index += self._head
+        if index >= len(self._buffer):
+            index -= len(self._buffer)
+        return self._buffer[index]
 
     def ptr(self):
         return self._buffer
@@ -3,6 +3,59 @@ import struct
 from ucPack.CircularBuffer import CircularBuffer
 
 
+def _crc8_table() -> bytes:
+    """
+    Precomputes the CRC8-MAXIM (reflected polynomial 0x8C) of every byte value
+    :return: the 256 entries lookup table
+    """
+
+    table = bytearray(256)
+    for i in range(0, 256):
+        crc = i
+        for _ in range(0, 8):
+            crc = (crc >> 1) ^ 0x8C if crc & 0x01 else crc >> 1
+        table[i] = crc
+    return bytes(table)
+
+
+_CRC8_TABLE = _crc8_table()
+
+# packet formats: struct format of the payload (command code included, little endian, no padding) and its size
+PACKET_C1B = ('<BB', 2)
+PACKET_C2B = ('<BBB', 3)
+PACKET_C3B = ('<BBBB', 4)
+PACKET_C1I = ('<Bh', 3)
+PACKET_C2I = ('<Bhh', 5)
+PACKET_C3I = ('<Bhhh', 7)
+PACKET_C7I = ('<Bhhhhhhh', 15)
+PACKET_C1F = ('<Bf', 5)
+PACKET_C2F = ('<Bff', 9)
+PACKET_C3F = ('<Bfff', 13)
+PACKET_C4F = ('<Bffff', 17)
+PACKET_C6F = ('<Bffffff', 25)
+PACKET_C8F = ('<Bffffffff', 33)
+PACKET_C1B3F = ('<BBfff', 14)
+PACKET_C2B1F = ('<BBBf', 7)
+
+
+def _int16(i: int) -> int:
+    """
+    Wraps an int in the signed 16 bit range, as i & 0xFFFF reinterpreted as a short
+    :param i:
+    :return:
+    """
+
+    return ((i + 0x8000) & 0xFFFF) - 0x8000
+
+
+# streaming parser states
+_HUNT = 0       # looking for the start index
+_LEN = 1        # waiting for the payload length
+_BODY = 2       # collecting the payload
+_END = 3        # waiting for the end index
+_CRC = 4        # waiting for the crc8
+
+
 class ucPack:
 
     def __init__(self, buffer_size: int, start_index: int = ord('A'), end_index: int = ord('#')):
@@ -12,73 +65,142 @@ class ucPack:
         self.end_index = end_index
 
         self.payload = bytearray(buffer_size)
+        self._payload_view = memoryview(self.payload)
 
         self.msg = bytearray(buffer_size)
         self.msg_size = 0
 
+        # packet formats of the registered message codes
+        self.codecs = {}
+
+        self._state = _HUNT
+        self._offset = 0            # bytes of the candidate frame already checked
+        self._payload_size = 0
+        self._payload_index = 0
+        self._crc = 0x00
+
+        # parser statistics
+        self.frames = 0
+        self.crc_errors = 0
+        self.resyncs = 0
+        self.skipped_bytes = 0
+
     def checkPayload(self) -> bool:
         """
-        Parses and checks the buffer to get the payload
+        Parses the buffer to get the payload.
+        This is a streaming parser: the bytes of a frame are checked once as they arrive and the parser state
+        is kept between calls, so that frames can be split across several reads. Garbage is skipped straight
+        to the next start index. A candidate frame stays in the buffer until its crc is verified: when it turns
+        out to be invalid only its start index is dropped, and the hunt restarts from the following byte.
+        Call it until it returns False to get all the payloads in the buffer
+        :return: True if a valid payload has been parsed
+        """
+
+        buffer = self.buffer
+
+        while buffer.getSize() > self._offset:
+            state = self._state
+
+            if state == _HUNT:
+                # jump straight to the next start index
+                index = buffer.find(self.start_index)
+                if index < 0:
+                    self.skipped_bytes += buffer.discard(buffer.getSize())
+                    return False
+                if index > 0:
+                    self.skipped_bytes += buffer.discard(index)
+                self._offset = 1
+                self._state = _LEN
+
+            elif state == _LEN:
+                payload_size = buffer[1]
+                # memo: index|length|msg|stop|crc8, the whole frame must fit in the buffer
+                if payload_size == 0 or payload_size > min(len(self.payload), self.buffer_size - 4):
+                    self._resync()
+                else:
+                    self._payload_size = payload_size
+                    self._payload_index = 0
+                    self._crc = 0x00
+                    self._offset = 2
+                    self._state = _BODY
+
+            elif state == _BODY:
+                index = self._payload_index
+                n = buffer.peek_into(self._payload_view[index:self._payload_size], self._offset,
+                                     self._payload_size - index)
+                self._crc = self.crc8(self._payload_view[index:index + n], self._crc)
+                self._payload_index = index + n
+                self._offset += n
+                if self._payload_index == self._payload_size:
+                    self._state = _END
+
+            elif state == _END:
+                if buffer[self._offset] != self.end_index:
+                    self._resync()
+                else:
+                    self._offset += 1
+                    self._state = _CRC
+
+            else:
+                if buffer[self._offset] != self._crc:
+                    self.crc_errors += 1
+                    self._resync()
+                else:
+                    buffer.discard(self._offset + 1)
+                    self._offset = 0
+                    self._state = _HUNT
+                    self.frames += 1
+                    return True
+
+        return False
+
+    def _resync(self):
+        """
+        Drops the start index of the candidate frame and goes back hunting from the following byte
         :return:
         """
 
-        # check if buffer is empty
-        if self.buffer.isEmpty():
-            return False
-
-        # check the index byte
-        while not (self.buffer.top() == self.start_index) and (self.buffer.getSize() > 0):
-            self.buffer.pop()
-
-        # exit if only message index is received
-        if self.buffer.getSize() <= 1:
-            return False
-
-        # get the payload dimension
-        payload_size = self.buffer[1]
-
-        # check if packet is complete
-        if self.buffer.getSize() < (payload_size + 4):     # memo: index|length|msg|stop|crc8
-            return False
+        self.resyncs += 1
+        self.buffer.discard(1)
+        self._offset = 0
+        self._state = _HUNT
 
-        # check if stop byte is correct
-        if self.buffer[payload_size + 2] != self.end_index:
-            return False
-
-        # crc checking
-        for i in range(0, payload_size):
-            self.payload[i] = self.buffer[i + 2]
-
-        if self.crc8(self.payload[0:payload_size]) != self.buffer[payload_size + 3]:
-            self.buffer.pop()   # delete the index so it is possible to recheck
-            return False
-
-        # clear the buffer
-        for _ in range(0, payload_size + 4):
-            self.buffer.pop()
+    def resetParser(self):
+        """
+        Empties the buffer and drops any partially parsed frame
+        :return:
+        """
 
-        return True
+        self.buffer.discard(self.buffer.getSize())
+        self._offset = 0
+        self._state = _HUNT
 
     @staticmethod
-    def crc8(data: [int]) -> int:
+    def crc8(data: [int], crc: int = 0x00) -> int:
         """
         Calculates the CRC8-MAXIM of the data array
         :param data: the input data array
+        :param crc: the CRC of the data preceding this chunk, to compute the CRC incrementally
         :return: the calculated crc
         """
 
-        crc = 0x00
-
+        table = _CRC8_TABLE
         for extract in data:
-            for _ in range(0, 8):
-                sum = (crc ^ extract) & 0x01
-                crc = crc >> 1
-                if sum:
-                    crc = crc ^ 0x8C
-                extract = extract >> 1
+            crc = table[crc ^ extract]
 
         return crc
 
+    @staticmethod
+    def crc8_update(crc: int, b: int) -> int:
+        """
+        Updates a CRC8-MAXIM with a single byte, as it arrives
+        :param crc: the CRC of the bytes received so far (0x00 at the beginning of the payload)
+        :param b: the received byte
+        :return: the updated crc
+        """
+
+        return _CRC8_TABLE[crc ^ b]
+
     def payloadTop(self):
         """
         Returns the top element of the payload array
@@ -87,6 +209,83 @@ class ucPack:
 
         return self.payload[0]
 
+    def registerCodec(self, code: int, packet_format: (str, int)):
+        """
+        Registers the packet format of a message code, so that packet and unpacket can be used with it
+        :param code: the message code
+        :param packet_format: one of the PACKET_* formats, or a (struct format, payload size) tuple
+        :return:
+        """
+
+        self.codecs[code & 0xFF] = packet_format
+
+    def packet(self, code: int, *values) -> int:
+        """
+        Packets the values with the format registered for code + start and end indexes
+        :param code: a registered message code
+        :param values: the values to packet
+        :return: returns the size of the resulting msg array
+        """
+
+        return self._packet(self.codecs[code & 0xFF], code, *values)
+
+    def unpacket(self) -> tuple | None:
+        """
+        Unpackets the payload with the format registered for its message code
+        :return: code and values, None if the code is not registered
+        """
+
+        packet_format = self.codecs.get(self.payload[0])
+        if packet_format is None:
+            return None
+        return struct.unpack_from(packet_format[0], self.payload, 0)
+
+    def _packet(self, packet_format: (str, int), code: int, *values) -> int:
+        """
+        Packs code and values straight into msg, between start and end indexes
+        :param packet_format: (struct format, payload size)
+        :param code:
+        :param values:
+        :return: returns the size of the resulting msg array
+        """
+
+        self.msg_size = self.packetInto(self.msg, 0, packet_format, code, *values)
+        return self.msg_size
+
+    def packetInto(self, buf: bytearray, offset: int, packet_format: (str, int), code: int, *values) -> int:
+        """
+        Packs code and values straight into buf at offset, between start and end indexes.
+        The values must already fit their struct types (bytes masked, ints in the int16 range)
+        :param buf: the output buffer
+        :param offset: position of the frame in buf
+        :param packet_format: (struct format, payload size)
+        :param code:
+        :param values:
+        :return: returns the size of the frame
+        """
+
+        payload_size = packet_format[1]
+        buf[offset] = self.start_index & 0xFF
+        buf[offset + 1] = payload_size
+        struct.pack_into(packet_format[0], buf, offset + 2, code & 0xFF, *values)
+        end = offset + payload_size + 2
+        table = _CRC8_TABLE
+        crc = 0x00
+        for i in range(offset + 2, end):
+            crc = table[crc ^ buf[i]]
+        buf[end] = self.end_index & 0xFF
+        buf[end + 1] = crc
+        return payload_size + 4
+
+    def _unpacket(self, packet_format: (str, int)) -> tuple:
+        """
+        Unpacks the payload in place
+        :param packet_format: (struct format, payload size)
+        :return: code and values
+        """
+
+        return struct.unpack_from(packet_format[0], self.payload, 0)
+
     def packetC1B(self, code: int, b: int) -> int:
         """
         Packets the byte b with command code + start and end indexes
@@ -95,14 +294,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 2
-        self.msg[2] = code & 0xFF
-        self.msg[3] = b & 0xFF
-        self.msg[4] = self.end_index & 0xFF
-        self.msg[5] = self.crc8(self.msg[2:4])
-        self.msg_size = 6
-        return self.msg_size
+        return self._packet(PACKET_C1B, code, b & 0xFF)
 
     def unpacketC1B(self) -> (int, int):
         """
@@ -110,9 +302,7 @@ class ucPack:
         :return: code and byte
         """
 
-        code = self.payload[0]
-        b = self.payload[1]
-        return code, b
+        return self._unpacket(PACKET_C1B)
 
     def packetC2B(self, code: int, b1: int, b2: int) -> int:
         """
@@ -123,15 +313,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 3
-        self.msg[2] = code & 0xFF
-        self.msg[3] = b1 & 0xFF
-        self.msg[4] = b2 & 0xFF
-        self.msg[5] = self.end_index & 0xFF
-        self.msg[6] = self.crc8(self.msg[2:5])
-        self.msg_size = 7
-        return self.msg_size
+        return self._packet(PACKET_C2B, code, b1 & 0xFF, b2 & 0xFF)
 
     def unpacketC2B(self) -> (int, int, int):
         """
@@ -139,10 +321,7 @@ class ucPack:
         :return: code and bytes
         """
 
-        code = self.payload[0]
-        b1 = self.payload[1]
-        b2 = self.payload[2]
-        return code, b1, b2
+        return self._unpacket(PACKET_C2B)
 
     def packetC3B(self, code: int, b1: int, b2: int, b3: int) -> int:
         """
@@ -154,16 +333,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 4
-        self.msg[2] = code & 0xFF
-        self.msg[3] = b1 & 0xFF
-        self.msg[4] = b2 & 0xFF
-        self.msg[5] = b3 & 0xFF
-        self.msg[6] = self.end_index & 0xFF
-        self.msg[7] = self.crc8(self.msg[2:6])
-        self.msg_size = 8
-        return self.msg_size
+        return self._packet(PACKET_C3B, code, b1 & 0xFF, b2 & 0xFF, b3 & 0xFF)
 
     def unpacketC3B(self) -> (int, int, int, int):
         """
@@ -171,11 +341,7 @@ class ucPack:
         :return: code and bytes
         """
 
-        code = self.payload[0]
-        b1 = self.payload[1]
-        b2 = self.payload[2]
-        b3 = self.payload[3]
-        return code, b1, b2, b3
+        return self._unpacket(PACKET_C3B)
 
     def packetC1I(self, code: int, i: int) -> int:
         """
@@ -185,14 +351,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 3
-        self.msg[2] = code & 0xFF
-        self.msg[3:5] = bytearray(struct.pack("h", i & 0xFFFF))
-        self.msg[5] = self.end_index & 0xFF
-        self.msg[6] = self.crc8(self.msg[2:5])
-        self.msg_size = 7
-        return self.msg_size
+        return self._packet(PACKET_C1I, code, _int16(i))
 
     def unpacketC1I(self) -> (int, int):
         """
@@ -200,9 +359,7 @@ class ucPack:
         :return: code and int
         """
 
-        code = self.payload[0]
-        i = struct.unpack("h", self.payload[1:3])[0]
-        return code, i
+        return self._unpacket(PACKET_C1I)
 
     def packetC2I(self, code: int, i1: int, i2: int) -> int:
         """
@@ -213,15 +370,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 5
-        self.msg[2] = code & 0xFF
-        self.msg[3:5] = bytearray(struct.pack("h", i1 & 0xFFFF))
-        self.msg[5:7] = bytearray(struct.pack("h", i2 & 0xFFFF))
-        self.msg[7] = self.end_index & 0xFF
-        self.msg[8] = self.crc8(self.msg[2:7])
-        self.msg_size = 9
-        return self.msg_size
+        return self._packet(PACKET_C2I, code, _int16(i1), _int16(i2))
 
     def unpacketC2I(self) -> (int, int, int):
         """
@@ -229,10 +378,7 @@ class ucPack:
         :return: code and ints
         """
 
-        code = self.payload[0]
-        i1 = struct.unpack("h", self.payload[1:3])[0]
-        i2 = struct.unpack("h", self.payload[3:5])[0]
-        return code, i1, i2
+        return self._unpacket(PACKET_C2I)
 
     def packetC3I(self, code: int, i1: int, i2: int, i3: int) -> int:
         """
@@ -244,16 +390,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 5
-        self.msg[2] = code & 0xFF
-        self.msg[3:5] = bytearray(struct.pack("h", i1 & 0xFFFF))
-        self.msg[5:7] = bytearray(struct.pack("h", i2 & 0xFFFF))
-        self.msg[7:9] = bytearray(struct.pack("h", i3 & 0xFFFF))
-        self.msg[9] = self.end_index & 0xFF
-        self.msg[10] = self.crc8(self.msg[2:9])
-        self.msg_size = 11
-        return self.msg_size
+        return self._packet(PACKET_C3I, code, _int16(i1), _int16(i2), _int16(i3))
 
     def unpacketC3I(self) -> (int, int, int, int):
         """
@@ -261,11 +398,7 @@ class ucPack:
         :return: code and ints
         """
 
-        code = self.payload[0]
-        i1 = struct.unpack("h", self.payload[1:3])[0]
-        i2 = struct.unpack("h", self.payload[3:5])[0]
-        i3 = struct.unpack("h", self.payload[5:7])[0]
-        return code, i1, i2, i3
+        return self._unpacket(PACKET_C3I)
 
     def packetC7I(self, code: int, i1: int, i2: int, i3: int, i4: int, i5: int, i6: int, i7: int) -> int:
         """
@@ -281,20 +414,8 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 15
-        self.msg[2] = code & 0xFF
-        self.msg[3:5] = bytearray(struct.pack("h", i1 & 0xFFFF))
-        self.msg[5:7] = bytearray(struct.pack("h", i2 & 0xFFFF))
-        self.msg[7:9] = bytearray(struct.pack("h", i3 & 0xFFFF))
-        self.msg[9:11] = bytearray(struct.pack("h", i4 & 0xFFFF))
-        self.msg[11:13] = bytearray(struct.pack("h", i5 & 0xFFFF))
-        self.msg[13:15] = bytearray(struct.pack("h", i6 & 0xFFFF))
-        self.msg[15:17] = bytearray(struct.pack("h", i7 & 0xFFFF))
-        self.msg[17] = self.end_index & 0xFF
-        self.msg[18] = self.crc8(self.msg[2:17])
-        self.msg_size = 19
-        return self.msg_size
+        return self._packet(PACKET_C7I, code, _int16(i1), _int16(i2), _int16(i3), _int16(i4), _int16(i5), _int16(i6),
+                            _int16(i7))
 
     def unpacketC7I(self) -> (int, int, int, int, int, int, int, int):
         """
@@ -302,15 +423,7 @@ class ucPack:
         :return: code and ints
         """
 
-        code = self.payload[0]
-        i1 = struct.unpack("h", self.payload[1:3])[0]
-        i2 = struct.unpack("h", self.payload[3:5])[0]
-        i3 = struct.unpack("h", self.payload[5:7])[0]
-        i4 = struct.unpack("h", self.payload[7:9])[0]
-        i5 = struct.unpack("h", self.payload[9:11])[0]
-        i6 = struct.unpack("h", self.payload[11:13])[0]
-        i7 = struct.unpack("h", self.payload[13:15])[0]
-        return code, i1, i2, i3, i4, i5, i6, i7
+        return self._unpacket(PACKET_C7I)
 
     def packetC1F(self, code: int, f: float) -> int:
         """
@@ -320,14 +433,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 5
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f))
-        self.msg[7] = self.end_index & 0xFF
-        self.msg[8] = self.crc8(self.msg[2:7])
-        self.msg_size = 9
-        return self.msg_size
+        return self._packet(PACKET_C1F, code, f)
 
     def unpacketC1F(self) -> (int, float):
         """
@@ -335,9 +441,7 @@ class ucPack:
         :return: code and float number
         """
 
-        code = self.payload[0]
-        f = struct.unpack("f", self.payload[1:5])[0]
-        return code, f
+        return self._unpacket(PACKET_C1F)
 
     def packetC2F(self, code: int, f1: float, f2: float) -> int:
         """
@@ -348,15 +452,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 9
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f1))
-        self.msg[7:11] = bytearray(struct.pack("f", f2))
-        self.msg[11] = self.end_index & 0xFF
-        self.msg[12] = self.crc8(self.msg[2:11])
-        self.msg_size = 13
-        return self.msg_size
+        return self._packet(PACKET_C2F, code, f1, f2)
 
     def unpacketC2F(self) -> (int, float, float):
         """
@@ -364,10 +460,7 @@ class ucPack:
         :return: code, f1, f2
         """
 
-        code = self.payload[0]
-        f1 = struct.unpack("f", self.payload[1:5])[0]
-        f2 = struct.unpack("f", self.payload[5:9])[0]
-        return code, f1, f2
+        return self._unpacket(PACKET_C2F)
 
     def packetC3F(self, code: int, f1: float, f2: float, f3: float) -> int:
         """
@@ -379,16 +472,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 13
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f1))
-        self.msg[7:11] = bytearray(struct.pack("f", f2))
-        self.msg[11:15] = bytearray(struct.pack("f", f3))
-        self.msg[15] = self.end_index & 0xFF
-        self.msg[16] = self.crc8(self.msg[2:15])
-        self.msg_size = 17
-        return self.msg_size
+        return self._packet(PACKET_C3F, code, f1, f2, f3)
 
     def unpacketC3F(self) -> (int, float, float, float):
         """
@@ -396,11 +480,7 @@ class ucPack:
         :return: code, f1, f2, f3
         """
 
-        code = self.payload[0]
-        f1 = struct.unpack("f", self.payload[1:5])[0]
-        f2 = struct.unpack("f", self.payload[5:9])[0]
-        f3 = struct.unpack("f", self.payload[9:13])[0]
-        return code, f1, f2, f3
+        return self._unpacket(PACKET_C3F)
 
     def packetC4F(self, code: int, f1: float, f2: float, f3: float, f4: float) -> int:
         """
@@ -413,17 +493,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 17
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f1))
-        self.msg[7:11] = bytearray(struct.pack("f", f2))
-        self.msg[11:15] = bytearray(struct.pack("f", f3))
-        self.msg[15:19] = bytearray(struct.pack("f", f4))
-        self.msg[19] = self.end_index & 0xFF
-        self.msg[20] = self.crc8(self.msg[2:19])
-        self.msg_size = 21
-        return self.msg_size
+        return self._packet(PACKET_C4F, code, f1, f2, f3, f4)
 
     def unpacketC4F(self) -> (int, float, float, float, float):
         """
@@ -431,12 +501,7 @@ class ucPack:
         :return: code, f1, f2, f3, f4
         """
 
-        code = self.payload[0]
-        f1 = struct.unpack("f", self.payload[1:5])[0]
-        f2 = struct.unpack("f", self.payload[5:9])[0]
-        f3 = struct.unpack("f", self.payload[9:13])[0]
-        f4 = struct.unpack("f", self.payload[13:17])[0]
-        return code, f1, f2, f3, f4
+        return self._unpacket(PACKET_C4F)
 
     def packetC6F(self, code: int, f1: float, f2: float, f3: float, f4: float, f5: float, f6: float) -> int:
         """
@@ -451,19 +516,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 25
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f1))
-        self.msg[7:11] = bytearray(struct.pack("f", f2))
-        self.msg[11:15] = bytearray(struct.pack("f", f3))
-        self.msg[15:19] = bytearray(struct.pack("f", f4))
-        self.msg[19:23] = bytearray(struct.pack("f", f5))
-        self.msg[23:27] = bytearray(struct.pack("f", f6))
-        self.msg[27] = self.end_index & 0xFF
-        self.msg[28] = self.crc8(self.msg[2:27])
-        self.msg_size = 29
-        return self.msg_size
+        return self._packet(PACKET_C6F, code, f1, f2, f3, f4, f5, f6)
 
     def unpacketC6F(self) -> (int, float, float, float, float):
         """
@@ -471,14 +524,7 @@ class ucPack:
         :return: code, f1, f2, f3, f4
         """
 
-        code = self.payload[0]
-        f1 = struct.unpack("f", self.payload[1:5])[0]
-        f2 = struct.unpack("f", self.payload[5:9])[0]
-        f3 = struct.unpack("f", self.payload[9:13])[0]
-        f4 = struct.unpack("f", self.payload[13:17])[0]
-        f5 = struct.unpack("f", self.payload[17:21])[0]
-        f6 = struct.unpack("f", self.payload[21:25])[0]
-        return code, f1, f2, f3, f4, f5, f6
+        return self._unpacket(PACKET_C6F)
 
     def packetC8F(self, code: int, f1: float, f2: float, f3: float, f4: float,
                   f5: float, f6: float, f7: float, f8: float) -> int:
@@ -496,21 +542,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 33
-        self.msg[2] = code & 0xFF
-        self.msg[3:7] = bytearray(struct.pack("f", f1))
-        self.msg[7:11] = bytearray(struct.pack("f", f2))
-        self.msg[11:15] = bytearray(struct.pack("f", f3))
-        self.msg[15:19] = bytearray(struct.pack("f", f4))
-        self.msg[19:23] = bytearray(struct.pack("f", f5))
-        self.msg[23:27] = bytearray(struct.pack("f", f6))
-        self.msg[27:31] = bytearray(struct.pack("f", f7))
-        self.msg[31:35] = bytearray(struct.pack("f", f8))
-        self.msg[35] = self.end_index & 0xFF
-        self.msg[36] = self.crc8(self.msg[2:35])
-        self.msg_size = 37
-        return self.msg_size
+        return self._packet(PACKET_C8F, code, f1, f2, f3, f4, f5, f6, f7, f8)
 
     def unpacketC8F(self) -> (int, float, float, float, float, float, float, float, float):
         """
@@ -518,16 +550,7 @@ class ucPack:
         :return: code, f1, f2, f3, f4, f5, f6, f7, f8
         """
 
-        code = self.payload[0]
-        f1 = struct.unpack("f", self.payload[1:5])[0]
-        f2 = struct.unpack("f", self.payload[5:9])[0]
-        f3 = struct.unpack("f", self.payload[9:13])[0]
-        f4 = struct.unpack("f", self.payload[13:17])[0]
-        f5 = struct.unpack("f", self.payload[17:21])[0]
-        f6 = struct.unpack("f", self.payload[21:25])[0]
-        f7 = struct.unpack("f", self.payload[25:29])[0]
-        f8 = struct.unpack("f", self.payload[29:33])[0]
-        return code, f1, f2, f3, f4, f5, f6, f7, f8
+        return self._unpacket(PACKET_C8F)
 
     def packetC1B3F(self, code: int, b: int, f1: float, f2: float, f3: float) -> int:
         """
@@ -540,17 +563,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 14
-        self.msg[2] = code & 0xFF
-        self.msg[3] = b & 0xFF
-        self.msg[4:8] = bytearray(struct.pack("f", f1))
-        self.msg[8:12] = bytearray(struct.pack("f", f2))
-        self.msg[12:16] = bytearray(struct.pack("f", f3))
-        self.msg[16] = self.end_index & 0xFF
-        self.msg[17] = self.crc8(self.msg[2:16])
-        self.msg_size = 18
-        return self.msg_size
+        return self._packet(PACKET_C1B3F, code, b & 0xFF, f1, f2, f3)
 
     def unpacketC1B3F(self) -> (int, int, float, float, float):
         """
@@ -558,12 +571,7 @@ class ucPack:
         :return: code, b, f1, f2, f3
         """
 
-        code = self.payload[0]
-        b = self.payload[1]
-        f1 = struct.unpack("f", self.payload[2:6])[0]
-        f2 = struct.unpack("f", self.payload[6:10])[0]
-        f3 = struct.unpack("f", self.payload[10:14])[0]
-        return code, b, f1, f2, f3
+        return self._unpacket(PACKET_C1B3F)
 
     def packetC2B1F(self, code: int, b1: int, b2: int, f: float) -> int:
         """
@@ -575,16 +583,7 @@ class ucPack:
         :return: returns the size of the resulting msg array
         """
 
-        self.msg[0] = self.start_index & 0xFF
-        self.msg[1] = 7
-        self.msg[2] = code & 0xFF
-        self.msg[3] = b1 & 0xFF
-        self.msg[4] = b2 & 0xFF
-        self.msg[5:9] = bytearray(struct.pack("f", f))
-        self.msg[9] = self.end_index & 0xFF
-        self.msg[10] = self.crc8(self.msg[2:9])
-        self.msg_size = 11
-        return self.msg_size
+        return self._packet(PACKET_C2B1F, code, b1 & 0xFF, b2 & 0xFF, f)
 
     def unpacketC2B1F(self) -> (int, int, int, float):
         """
@@ -592,8 +591,4 @@ class ucPack:
         :return: code, b1, b2, f
         """
 
-        code = self.payload[0]
-        b1 = self.payload[1]
-        b2 = self.payload[2]
-        f = struct.unpack("f", self.payload[3:7])[0]
-        return code, b1, b2, f
+        return self._unpacket(PACKET_C2B1F)
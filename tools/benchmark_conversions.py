@@ -0,0 +1,99 @@
+"""
+Per call overhead of the unit conversions in the control loop
+
+Times the conversions done by set_wheels_speed, get_pose and get_distance in three ways: the previous
+implementation (decorated functions rebuilding the unit table at every call), the current convert_* functions
+and a conversion factor resolved once out of the loop.
+It runs on the robot and on the computer:
+    mpremote run tools/benchmark_conversions.py
+    python tools/benchmark_conversions.py
+"""
+
+import sys
+
+try:
+    from time import ticks_us, ticks_diff
+    from arduino_alvik.conversions import convert_rotational_speed, convert_distance, conversion_factor, \
+        convert_array, conversion_method
+except ImportError:                                 # on the computer, arduino_alvik/__init__.py needs the robot
+    import os
+    from time import perf_counter
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib', 'arduino_alvik'))
+    from conversions import convert_rotational_speed, convert_distance, conversion_factor, convert_array, \
+        conversion_method
+
+    def ticks_us():
+        return int(perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+from math import pi
+
+ITERATIONS = 2000
+
+
+@conversion_method
+def legacy_convert_rotational_speed(value: float, from_unit: str, to_unit: str) -> float:
+    speeds = {'rpm': 1.0, 'deg/s': 1/6, 'rad/s': 60/(2*pi), 'rev/s': 60}
+    return value * speeds[from_unit.lower()] / speeds[to_unit.lower()]
+
+
+@conversion_method
+def legacy_convert_distance(value: float, from_unit: str, to_unit: str) -> float:
+    distances = {'cm': 1.0, 'mm': 0.1, 'm': 100, 'inch': 2.54, 'in': 2.54}
+    return value * distances[from_unit.lower()] / distances[to_unit.lower()]
+
+
+def run(name: str, function) -> None:
+    start = ticks_us()
+    for i in range(0, ITERATIONS):
+        function(i)
+    elapsed = ticks_diff(ticks_us(), start)
+    print(f'{name:44} {elapsed / ITERATIONS:8.2f} us/call')
+
+
+def empty(i):
+    pass
+
+
+def legacy_wheels_speed(i):
+    legacy_convert_rotational_speed(i, 'deg/s', 'rpm')
+    legacy_convert_rotational_speed(i, 'deg/s', 'rpm')
+
+
+def wheels_speed(i):
+    convert_rotational_speed(i, 'deg/s', 'rpm')
+    convert_rotational_speed(i, 'deg/s', 'rpm')
+
+
+def wheels_speed_factor(i):
+    factor = conversion_factor(convert_rotational_speed, 'deg/s', 'rpm')
+    return i * factor, i * factor
+
+
+distances = (100.0, 200.0, 300.0, None, 500.0)
+converted = [None] * len(distances)
+
+
+def legacy_distance(i):
+    for value in distances:
+        legacy_convert_distance(value, 'mm', 'cm')
+
+
+def distance(i):
+    for value in distances:
+        convert_distance(value, 'mm', 'cm')
+
+
+def distance_array(i):
+    convert_array(convert_distance, distances, 'mm', 'cm', converted)
+
+
+run('loop overhead', empty)
+run('wheels speed, previous implementation', legacy_wheels_speed)
+run('wheels speed, convert_rotational_speed', wheels_speed)
+run('wheels speed, conversion_factor', wheels_speed_factor)
+run('5 distances, previous implementation', legacy_distance)
+run('5 distances, convert_distance', distance)
+run('5 distances, convert_array', distance_array)
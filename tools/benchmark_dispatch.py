@@ -0,0 +1,228 @@
+"""
+Dispatch time of the messages received by ArduinoAlvik._parse_message
+
+Replays a mixed telemetry capture (the message mix of the simulated STM32 firmware, see benchmark_ingest.py)
+through two decoders: the previous if/elif chain on the message code, with a per-format unpacket call
+in each branch, and the shipped ArduinoAlvik._parse_message with its built-in handler table. The latter also
+does the per-message statistics, the recorder check, the sensors write window and the sequence/ticks bookkeeping,
+that the previous decoder did not have: the comparison is the cost of the whole current path.
+The packets are framed once beforehand, so only the dispatch and the decoding are timed.
+It runs on the computer (CPython), not on the robot: the machine module and the MicroPython ticks functions
+are replaced by host stand-ins, so that arduino_alvik can be imported.
+
+Usage:
+    python benchmark_dispatch.py [seconds_of_telemetry]
+"""
+
+import os
+import sys
+import time
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib')
+sys.path.insert(0, LIB_PATH)
+
+
+def _install_host_stubs() -> None:
+    """
+    Provides the machine module and the MicroPython time functions needed to import arduino_alvik on CPython.
+    Nothing talks to the hardware: the pins, the UART and the I2C bus do nothing
+    :return:
+    """
+    import types
+
+    class _Device:
+        IN = OUT = PULL_UP = PULL_DOWN = OPEN_DRAIN = IRQ_FALLING = IRQ_RISING = 0
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: None
+
+    machine = types.ModuleType('machine')
+    machine.Pin = machine.UART = machine.I2C = _Device
+    machine.lightsleep = lambda *args: None
+    sys.modules['machine'] = machine
+
+    period = 1 << 30
+    time.ticks_ms = lambda: int(time.monotonic() * 1000) % period
+    time.ticks_us = lambda: int(time.monotonic() * 1000000) % period
+    time.ticks_diff = lambda ticks1, ticks2: (ticks1 - ticks2 + period // 2) % period - period // 2
+    time.ticks_add = lambda ticks, delta: (ticks + delta) % period
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+
+_install_host_stubs()
+
+from arduino_alvik.arduino_alvik import ArduinoAlvik
+from ucPack import ucPack, PACKET_C1B, PACKET_C3B, PACKET_C3I, PACKET_C7I, PACKET_C1F, PACKET_C2F, PACKET_C3F, \
+    PACKET_C6F
+from benchmark_ingest import telemetry_stream
+
+# messages sent by the robot firmware, as registered by ArduinoAlvik
+CODECS = {
+    'j': PACKET_C2F, 'l': PACKET_C3I, 'c': PACKET_C3I, 'i': PACKET_C6F, 'p': PACKET_C1F, 'd': PACKET_C3I,
+    't': PACKET_C1B, 'm': PACKET_C1B, 'b': PACKET_C1B, 'f': PACKET_C7I, 'q': PACKET_C3F, 'w': PACKET_C2F,
+    'v': PACKET_C2F, 'x': PACKET_C1B, 'z': PACKET_C3F, '~': PACKET_C3B,
+}
+
+
+class _ChainDecoder:
+    """
+    Previous decoder: the if/elif chain of ArduinoAlvik._parse_message
+    """
+
+    def __init__(self):
+        self._packeter = ucPack(200)
+        self._waiting_ack = None
+
+    def parse(self) -> int:
+        code = self._packeter.payloadTop()
+        if code == ord('j'):
+            _, self._left_speed, self._right_speed = self._packeter.unpacketC2F()
+        elif code == ord('l'):
+            _, self._left_line, self._center_line, self._right_line = self._packeter.unpacketC3I()
+        elif code == ord('c'):
+            _, self._red, self._green, self._blue = self._packeter.unpacketC3I()
+        elif code == ord('i'):
+            _, self._ax, self._ay, self._az, self._gx, self._gy, self._gz = self._packeter.unpacketC6F()
+        elif code == ord('p'):
+            _, battery_perc = self._packeter.unpacketC1F()
+            self._battery_is_charging = battery_perc > 0
+            self._battery_perc = abs(battery_perc)
+        elif code == ord('d'):
+            _, self._left_tof, self._center_tof, self._right_tof = self._packeter.unpacketC3I()
+        elif code == ord('t'):
+            _, self._touch_byte = self._packeter.unpacketC1B()
+        elif code == ord('m'):
+            _, self._move_byte = self._packeter.unpacketC1B()
+        elif code == ord('b'):
+            _, self._behaviour = self._packeter.unpacketC1B()
+        elif code == ord('f'):
+            (_, self._left_tof, self._center_left_tof, self._center_tof,
+             self._center_right_tof, self._right_tof, self._top_tof, self._bottom_tof) = self._packeter.unpacketC7I()
+        elif code == ord('q'):
+            _, self._roll, self._pitch, self._yaw = self._packeter.unpacketC3F()
+        elif code == ord('w'):
+            _, self._left_position, self._right_position = self._packeter.unpacketC2F()
+        elif code == ord('v'):
+            _, self._linear_velocity, self._angular_velocity = self._packeter.unpacketC2F()
+        elif code == ord('x'):
+            if self._waiting_ack is not None:
+                _, self._last_ack = self._packeter.unpacketC1B()
+            else:
+                self._packeter.unpacketC1B()
+                self._last_ack = 0x00
+        elif code == ord('z'):
+            _, self._x, self._y, self._theta = self._packeter.unpacketC3F()
+        elif code == 0x7E:
+            _, *self._fw_version = self._packeter.unpacketC3B()
+        else:
+            return -1
+        return 0
+
+
+class _ParseMessage:
+    """
+    Current decoder: ArduinoAlvik._parse_message of an ArduinoAlvik not connected to a robot
+    """
+
+    def __init__(self):
+        self._alvik = ArduinoAlvik(transport=_NullTransport())
+        self._packeter = self._alvik._packeter
+
+    def parse(self) -> int:
+        return self._alvik._parse_message()
+
+
+class _NullTransport:
+    """
+    Transport discarding the commands, the robot is never on
+    """
+
+    def any(self) -> int:
+        return 0
+
+    def readinto(self, buf, n_bytes: int = None) -> int | None:
+        return None
+
+    def write(self, buf) -> int:
+        return len(buf)
+
+    def is_on(self) -> bool:
+        return False
+
+
+def frame_capture(stream: bytes) -> list:
+    """
+    Frames every packet of a capture
+    :param stream:
+    :return: list of payloads
+    """
+    packeter = ucPack(200)
+    payloads = []
+    index = 0
+    while index < len(stream) or packeter.buffer.getSize():
+        n = min(64, packeter.buffer_size - packeter.buffer.getSize(), len(stream) - index)
+        packeter.buffer.extend(stream[index:index + n])
+        index += n
+        framed = False
+        while packeter.checkPayload():
+            payloads.append(bytes(packeter.payload[0:packeter._payload_size]))
+            framed = True
+        if not framed and index >= len(stream):
+            break
+    return payloads
+
+
+ROUNDS = 7
+
+
+def run(decoder_class, payloads: list) -> dict:
+    """
+    Dispatches every payload ROUNDS times, timing each message code. The fastest round is kept
+    :param decoder_class:
+    :param payloads:
+    :return: total and per code time (s)
+    """
+    decoder = decoder_class()
+    view = memoryview(decoder._packeter.payload)
+    best = None
+    for _ in range(0, ROUNDS):
+        per_code = dict()
+        total = 0.0
+        for payload in payloads:
+            view[0:len(payload)] = payload
+            start = time.perf_counter()
+            assert decoder.parse() == 0
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            per_code[payload[0]] = per_code.get(payload[0], 0.0) + elapsed
+        if best is None or total < best['total']:
+            best = {'total': total, 'per_code': per_code}
+    return best
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print(__doc__)
+        sys.exit(1)
+
+    stream, _ = telemetry_stream(int(sys.argv[1]) if len(sys.argv) == 2 else 10)
+    payloads = frame_capture(stream)
+    counts = dict()
+    for payload in payloads:
+        counts[payload[0]] = counts.get(payload[0], 0) + 1
+
+    chain = run(_ChainDecoder, payloads)
+    table = run(_ParseMessage, payloads)
+    print(f'{len(payloads)} messages')
+    print(f"{'code':6} {'messages':>8} {'if/elif (us)':>13} {'_parse_message (us)':>20}")
+    for code in sorted(counts, key=lambda c: list(CODECS).index(chr(c))):
+        n = counts[code]
+        print(f"'{chr(code)}'    {n:8} {chain['per_code'][code] / n * 1e6:13.2f} "
+              f"{table['per_code'][code] / n * 1e6:20.2f}")
+    print(f"all    {len(payloads):8} {chain['total'] / len(payloads) * 1e6:13.2f} "
+          f"{table['total'] / len(payloads) * 1e6:20.2f}")
+    print(f"speedup: {chain['total'] / table['total']:.2f}x")
@@ -0,0 +1,138 @@
+"""
+Packets per second of the UART ingest of ArduinoAlvik._read_message
+
+Feeds a telemetry stream (the message mix of the simulated STM32 firmware) through a fake UART, and frames it
+with ucPack in two ways: the previous ingest, reading one byte per call and pushing it into the packeter buffer,
+and the current one, draining everything available with readinto into a preallocated memoryview and framing
+all the complete packets in a single pass. Both use the current ucPack parser, so the difference is the ingest.
+It runs on the computer (CPython), not on the robot.
+
+Usage:
+    python benchmark_ingest.py [seconds_of_telemetry]
+"""
+
+import os
+import sys
+import time
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib')
+sys.path.insert(0, LIB_PATH)
+
+from ucPack import ucPack, PACKET_C1B, PACKET_C1F, PACKET_C2F, PACKET_C3F, PACKET_C6F, PACKET_C7I
+
+# messages of the telemetry stream and their rates (Hz), as sent by the simulated STM32 firmware
+TELEMETRY = {
+    'j': (PACKET_C2F, 25), 'w': (PACKET_C2F, 25), 'z': (PACKET_C3F, 25), 'v': (PACKET_C2F, 25),
+    'i': (PACKET_C6F, 50), 'q': (PACKET_C3F, 50), 'f': (PACKET_C7I, 10), 'x': (PACKET_C1B, 10),
+    'p': (PACKET_C1F, 1),
+}
+
+
+class _FakeUART:
+    """
+    UART holding the whole stream in its receive buffer, with the read and readinto of machine.UART
+    """
+
+    def __init__(self, stream: bytes):
+        self._stream = stream
+        self._index = 0
+
+    def any(self) -> int:
+        return len(self._stream) - self._index
+
+    def read(self, n: int) -> bytes:
+        data = self._stream[self._index:self._index + n]
+        self._index += len(data)
+        return data
+
+    def readinto(self, buf) -> int:
+        n = min(len(buf), len(self._stream) - self._index)
+        buf[0:n] = self._stream[self._index:self._index + n]
+        self._index += n
+        return n
+
+
+def telemetry_stream(seconds: int) -> (bytes, int):
+    """
+    Encodes the telemetry sent by the robot in the given time
+    :param seconds:
+    :return: the stream and the number of packets in it
+    """
+    encoder = ucPack(200)
+    stream = bytearray()
+    packets = 0
+    for tick in range(0, seconds * 50):                 # 20 ms steps
+        for code, (packet_format, rate) in TELEMETRY.items():
+            if tick % (50 // rate) == 0:
+                values = [tick & 0x7F] * (len(packet_format[0]) - 2)    # '<B' is the code
+                size = encoder.packetInto(encoder.msg, 0, packet_format, ord(code), *values)
+                stream.extend(encoder.msg[0:size])
+                packets += 1
+    return bytes(stream), packets
+
+
+def _packeter() -> ucPack:
+    packeter = ucPack(200)
+    for code, (packet_format, _) in TELEMETRY.items():
+        packeter.registerCodec(ord(code), packet_format)
+    return packeter
+
+
+def ingest_per_byte(uart: _FakeUART) -> int:
+    """
+    Previous ingest: one read(1) and one push per byte
+    :param uart:
+    :return: number of packets framed
+    """
+    packeter = _packeter()
+    packets = 0
+    while uart.any():
+        b = uart.read(1)[0]
+        packeter.buffer.push(b)
+        while packeter.checkPayload():
+            packeter.unpacket()
+            packets += 1
+    return packets
+
+
+def ingest_bulk(uart: _FakeUART) -> int:
+    """
+    Current ingest: readinto a preallocated memoryview, then frame all the complete packets
+    :param uart:
+    :return: number of packets framed
+    """
+    packeter = _packeter()
+    buffer = packeter.buffer
+    rx_view = memoryview(bytearray(packeter.buffer_size))
+    packets = 0
+    while True:
+        available = uart.any()
+        free = packeter.buffer_size - buffer.getSize()
+        if available and free:
+            n_bytes = uart.readinto(rx_view[0:min(available, free)])
+            buffer.extend(rx_view[0:n_bytes])
+        framed = False
+        while packeter.checkPayload():
+            packeter.unpacket()
+            packets += 1
+            framed = True
+        if not available and not framed:
+            return packets
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print(__doc__)
+        sys.exit(1)
+
+    stream, expected = telemetry_stream(int(sys.argv[1]) if len(sys.argv) == 2 else 10)
+    print(f'{len(stream)} bytes, {expected} packets')
+    rates = []
+    for name, ingest in (('per byte (previous)', ingest_per_byte), ('bulk readinto (current)', ingest_bulk)):
+        start = time.perf_counter()
+        packets = ingest(_FakeUART(stream))
+        elapsed = time.perf_counter() - start
+        assert packets == expected, f'{name}: {packets} packets framed, {expected} expected'
+        rates.append(packets / elapsed)
+        print(f'{name:24} {packets / elapsed:10.0f} packets/s  {len(stream) / elapsed / 1000:8.1f} kB/s')
+    print(f'speedup: {rates[1] / rates[0]:.1f}x')
@@ -0,0 +1,52 @@
+"""
+Round-trip time of the Alvik motion commands
+
+Runs blocking move, rotate and set_wheels_position commands and measures how long each call takes.
+Against the simulated STM32 firmware the duration of the motion is known, so the overhead of the command
+(transmission, acknowledgment and wake up of the caller) is reported as well.
+It runs on the robot:
+    mpremote run tools/benchmark_motion.py
+Set SIMULATED to False to drive the real motors (the robot moves!)
+"""
+
+from time import ticks_ms, ticks_diff
+
+from arduino_alvik import ArduinoAlvik
+from arduino_alvik.simulator import SimulatedSTM32
+
+SIMULATED = True
+REPETITIONS = 10
+
+simulator = SimulatedSTM32() if SIMULATED else None
+alvik = ArduinoAlvik(transport=simulator)
+alvik.begin()
+
+PRIMITIVES = [
+    ('move 1 cm', lambda: alvik.move(1)),
+    ('move -1 cm', lambda: alvik.move(-1)),
+    ('rotate 10 deg', lambda: alvik.rotate(10)),
+    ('rotate -10 deg', lambda: alvik.rotate(-10)),
+    ('wheels position', lambda: alvik.set_wheels_position(0, 0)),
+]
+
+
+def _stats(samples: list) -> str:
+    return f'min {min(samples):6.1f}  avg {sum(samples) / len(samples):6.1f}  max {max(samples):6.1f}'
+
+
+try:
+    for name, primitive in PRIMITIVES:
+        totals = []
+        overheads = []
+        for _ in range(0, REPETITIONS):
+            start = ticks_ms()
+            primitive()
+            elapsed = ticks_diff(ticks_ms(), start)
+            totals.append(elapsed)
+            if simulator is not None:
+                overheads.append(elapsed - simulator.get_state()['last_motion_ms'])
+        print(f'{name:16} round trip (ms): {_stats(totals)}')
+        if overheads:
+            print(f'{"":16} overhead   (ms): {_stats(overheads)}')
+finally:
+    alvik.stop()
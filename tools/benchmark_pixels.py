@@ -0,0 +1,99 @@
+"""
+Frames per second of the Modulino Pixels over I2C
+
+Times the encoding of the LEDs (the previous set_color, allocating a color and mapping the brightness with floats,
+against the preencoded words of set_rgb), then the frames per second sent to the Modulino Pixels: frames changing
+at every show, frames unchanged (skipped by show) and the sweep of the BLE app written as before (8 clear and
+16 show per sweep, every frame sent) and as now.
+It runs on the robot, with a Modulino Pixels connected:
+    mpremote run tools/benchmark_pixels.py
+"""
+
+from time import ticks_us, ticks_diff
+
+from modulino import ModulinoPixels, ModulinoColor
+
+ITERATIONS = 200
+BAR_LENGTH = 4
+COLOR = (255, 0, 0)
+
+pixels = ModulinoPixels()
+if not pixels:
+    raise RuntimeError('Modulino Pixels not found')
+
+
+def legacy_set_rgb(idx, r, g, b, brightness=100):
+    rgb = ModulinoColor(r, g, b)
+    mapped_brightness = int((brightness - 0) * (0x1f - 0) / (100 - 0) + 0)
+    color_data_bytes = int(rgb) | mapped_brightness | 0xE0
+    pixels.data[idx * 4: idx * 4 + 4] = color_data_bytes.to_bytes(4, 'little')
+
+
+def run(name: str, function, unit: str) -> None:
+    start = ticks_us()
+    for i in range(0, ITERATIONS):
+        function(i)
+    elapsed = ticks_diff(ticks_us(), start)
+    if unit == 'us':
+        print(f'{name:36} {elapsed / ITERATIONS:8.2f} us/call')
+    else:
+        print(f'{name:36} {ITERATIONS * 1000000 / elapsed:8.1f} {unit}')
+
+
+def encode_legacy(i):
+    legacy_set_rgb(i & 7, 255, i & 0xFF, 0, 50)
+
+
+def encode(i):
+    pixels.set_rgb(i & 7, 255, i & 0xFF, 0, 50)
+
+
+def changing_frame(i):
+    pixels.set_rgb(i & 7, i & 0xFF, 0, 0)
+    pixels.show()
+
+
+def same_frame(i):
+    pixels.set_rgb(0, 255, 0, 0)
+    pixels.show()
+
+
+def legacy_sweep(i):
+    for position in range(8):
+        for k in range(BAR_LENGTH):
+            if position + k < 8:
+                legacy_set_rgb(position + k, *COLOR)
+        pixels.show(force=True)
+        for j in range(8):
+            legacy_set_rgb(j, 0, 0, 0, 0)
+    for position in range(7, -1, -1):
+        for k in range(BAR_LENGTH):
+            if position - k >= 0:
+                legacy_set_rgb(position - k, *COLOR)
+        pixels.show(force=True)
+        for j in range(8):
+            legacy_set_rgb(j, 0, 0, 0, 0)
+
+
+def sweep(i):
+    for position in range(8):
+        pixels.clear_all()
+        pixels.set_range_rgb(position, min(position + BAR_LENGTH, 8) - 1, *COLOR)
+        pixels.show()
+    for position in range(7, -1, -1):
+        pixels.clear_all()
+        pixels.set_range_rgb(max(position - BAR_LENGTH + 1, 0), position, *COLOR)
+        pixels.show()
+
+
+try:
+    run('encode LED, previous implementation', encode_legacy, 'us')
+    run('encode LED, set_rgb', encode, 'us')
+    run('show, frame changing', changing_frame, 'frames/s')
+    run('show, same frame', same_frame, 'frames/s')
+    ITERATIONS = 20
+    run('sweep, previous implementation', legacy_sweep, 'sweeps/s')
+    run('sweep, clear_all and set_range_rgb', sweep, 'sweeps/s')
+finally:
+    pixels.clear_all()
+    pixels.show(force=True)
@@ -0,0 +1,72 @@
+"""
+Wraparound fuzzing of the CircularBuffer slice API
+
+Runs random extend, discard, peek_into, find and views operations on buffers of several capacities,
+and checks each result against a reference buffer driven one byte at a time with push and pop.
+It runs on the robot and on the computer:
+    mpremote run tools/fuzz_circular_buffer.py
+    python tools/fuzz_circular_buffer.py
+"""
+
+import random
+
+try:
+    from ucPack.CircularBuffer import CircularBuffer
+except ImportError:                                 # on the computer
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib'))
+    from ucPack.CircularBuffer import CircularBuffer
+
+CAPACITIES = (1, 2, 3, 7, 16, 200)
+OPERATIONS = 2000
+
+
+def fuzz(capacity: int) -> None:
+    """
+    Runs OPERATIONS random operations on a buffer of the given capacity, asserting on the first mismatch
+    :param capacity:
+    :return:
+    """
+    fast = CircularBuffer(capacity)
+    reference = CircularBuffer(capacity)
+    for _ in range(0, OPERATIONS):
+        op = random.randrange(0, 5)
+        if op == 0:
+            data = bytes(random.randrange(0, 256) for _ in range(0, random.randrange(0, 2 * capacity + 2)))
+            fast.extend(data)
+            for b in data:
+                reference.push(b)
+        elif op == 1:
+            n = random.randrange(0, capacity + 2)
+            assert fast.discard(n) == min(n, reference.getSize())
+            for _ in range(0, n):
+                reference.pop()
+        elif op == 2:
+            offset = random.randrange(0, capacity + 1)
+            n = random.randrange(0, capacity + 1)
+            dst = bytearray(n)
+            copied = fast.peek_into(dst, offset, n)
+            expected = bytes(reference[i] for i in range(offset, min(offset + n, reference.getSize())))
+            assert bytes(dst[0:copied]) == expected
+        elif op == 3:
+            value = random.randrange(0, 256)
+            offset = random.randrange(0, capacity + 1)
+            expected = -1
+            for i in range(offset, reference.getSize()):
+                if reference[i] == value:
+                    expected = i
+                    break
+            assert fast.find(value, offset) == expected
+        else:
+            first, second = fast.views()
+            assert bytes(first) + bytes(second) == bytes(reference[i] for i in range(0, reference.getSize()))
+        assert fast.getSize() == reference.getSize()
+        assert fast.top() == reference.top()
+
+
+if __name__ == '__main__':
+    for buffer_capacity in CAPACITIES:
+        fuzz(buffer_capacity)
+        print(f'capacity {buffer_capacity}: {OPERATIONS} operations OK')
+    print('wraparound fuzzing OK')
@@ -0,0 +1,135 @@
+"""
+CRC8 throughput and streaming parser fuzzing of ucPack
+
+Checks the table-driven CRC8-MAXIM against the bitwise one and measures both for each packet size, then feeds
+a telemetry stream with noise injected between the frames through the streaming parser: every frame must be
+received once, in order, whatever the noise.
+It runs on the robot and on the computer:
+    mpremote run tools/fuzz_ucpack.py
+    python tools/fuzz_ucpack.py
+"""
+
+import random
+
+try:
+    from time import ticks_us, ticks_diff
+    from ucPack import ucPack
+except ImportError:                                 # on the computer
+    import os
+    import sys
+    from time import perf_counter_ns
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib'))
+    from ucPack import ucPack
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+# payload sizes (code included) of the ucPack packet formats
+SIZES = [('C1B', 2), ('C2B', 3), ('C3B', 4), ('C1I', 3), ('C2I', 5), ('C3I', 7), ('C7I', 15),
+         ('C1F', 5), ('C2F', 9), ('C3F', 13), ('C4F', 17), ('C6F', 25), ('C8F', 33)]
+ROUNDS = 2000
+FRAMES = 500
+
+
+def crc8_bitwise(data: [int]) -> int:
+    crc = 0x00
+    for extract in data:
+        for _ in range(0, 8):
+            sum = (crc ^ extract) & 0x01
+            crc = crc >> 1
+            if sum:
+                crc = crc ^ 0x8C
+            extract = extract >> 1
+    return crc
+
+
+def crc8_throughput() -> None:
+    """
+    Checks ucPack.crc8 and crc8_update against the bitwise CRC and prints the throughput of both
+    :return:
+    """
+    for name, size in SIZES:
+        payload = bytearray((i * 37 + 11) & 0xFF for i in range(0, size))
+        assert ucPack.crc8(payload) == crc8_bitwise(payload)
+        incremental = 0x00
+        for b in payload:
+            incremental = ucPack.crc8_update(incremental, b)
+        assert incremental == ucPack.crc8(payload)
+
+        results = []
+        for crc_function in (crc8_bitwise, ucPack.crc8):
+            start = ticks_us()
+            for _ in range(0, ROUNDS):
+                crc_function(payload)
+            elapsed = max(ticks_diff(ticks_us(), start), 1)
+            results.append(size * ROUNDS * 1000000 // elapsed)
+        print(f'{name}: {size} bytes  bitwise {results[0]} B/s  table {results[1]} B/s')
+
+
+def telemetry_frames() -> list:
+    """
+    Encodes FRAMES telemetry packets of several formats
+    :return: list of frames
+    """
+    encoder = ucPack(200)
+    frames = []
+    for i in range(0, FRAMES):
+        kind = i % 5
+        if kind == 0:
+            encoder.packetC2F(ord('j'), i * 0.5, -i * 0.5)
+        elif kind == 1:
+            encoder.packetC6F(ord('i'), 0.1, 0.2, 9.8, i, -i, 0.0)
+        elif kind == 2:
+            encoder.packetC7I(ord('f'), i, i + 1, i + 2, i + 3, i + 4, i + 5, i + 6)
+        elif kind == 3:
+            encoder.packetC3F(ord('q'), 1.0, 2.0, i * 1.0)
+        else:
+            encoder.packetC3F(ord('z'), i * 1.0, i * 2.0, 45.0)
+        frames.append(bytes(encoder.msg[0:encoder.msg_size]))
+    return frames
+
+
+def parser_fuzzing(frames: list) -> None:
+    """
+    Parses the frames with clean, start-index-free and random noise between them
+    :param frames:
+    :return:
+    """
+    expected = [frame[2:-2] for frame in frames]
+
+    for noise_name, alphabet in (('clean', b''), ('no start index', bytes(b for b in range(0, 256) if b != ord('A'))),
+                                 ('random', bytes(range(0, 256)))):
+        stream = bytearray()
+        for frame in frames:
+            if alphabet:
+                stream.extend(bytes(random.choice(alphabet) for _ in range(0, random.randrange(0, 12))))
+            stream.extend(frame)
+        # trailing padding, so that a candidate frame started in the noise cannot hold the last frames
+        stream.extend(bytes(200))
+
+        decoder = ucPack(200)
+        received = []
+        start = ticks_us()
+        index = 0
+        while index < len(stream):
+            # feed at most 64 bytes at a time, never more than the free space in the buffer
+            n = min(64, decoder.buffer_size - decoder.buffer.getSize())
+            decoder.buffer.extend(stream[index:index + n])
+            index += n
+            while decoder.checkPayload():
+                received.append(bytes(decoder.payload[0:decoder._payload_size]))
+        elapsed = max(ticks_diff(ticks_us(), start), 1)
+
+        assert all(payload in expected for payload in received)
+        assert received == expected
+        print(f'{noise_name}: {len(received)}/{len(frames)} frames  {decoder.resyncs} resyncs  '
+              f'{decoder.crc_errors} crc errors  {decoder.skipped_bytes} skipped bytes  '
+              f'{len(stream) * 1000000 // elapsed} B/s')
+
+
+if __name__ == '__main__':
+    crc8_throughput()
+    parser_fuzzing(telemetry_frames())
@@ -0,0 +1,130 @@
+"""
+Reader of the Alvik telemetry logs
+
+Loads a binary log written by ArduinoAlvik.start_recording into one NumPy structured array per message type.
+It runs on the computer (CPython with NumPy), not on the robot.
+
+Usage:
+    python read_telemetry_log.py telemetry.bin
+"""
+
+import struct
+import sys
+
+import numpy as np
+
+LOG_MAGIC = b'ALVK'
+LOG_VERSION = 1
+RECORD_HEADER_FORMAT = '<IB'
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+TICKS_PERIOD = 1 << 30      # ticks_ms of MicroPython wraps around at 2**30
+
+# numpy types of the struct format characters used by ucPack
+_NUMPY_TYPES = {'B': '<u1', 'b': '<i1', 'H': '<u2', 'h': '<i2', 'I': '<u4', 'i': '<i4', 'f': '<f4'}
+
+# field names of the messages sent by the robot firmware (message code excluded)
+FIELD_NAMES = {
+    'j': ('left_speed', 'right_speed'),
+    'l': ('left_line', 'center_line', 'right_line'),
+    'c': ('red', 'green', 'blue'),
+    'i': ('ax', 'ay', 'az', 'gx', 'gy', 'gz'),
+    'p': ('battery',),
+    'd': ('left_tof', 'center_tof', 'right_tof'),
+    't': ('touch',),
+    'm': ('move',),
+    'b': ('behaviour',),
+    'f': ('left_tof', 'center_left_tof', 'center_tof', 'center_right_tof', 'right_tof', 'top_tof', 'bottom_tof'),
+    'q': ('roll', 'pitch', 'yaw'),
+    'w': ('left_position', 'right_position'),
+    'v': ('linear_velocity', 'angular_velocity'),
+    'x': ('ack',),
+    'z': ('x', 'y', 'theta'),
+    '~': ('major', 'minor', 'patch'),
+}
+
+
+def _struct_types(packet_format: str) -> list:
+    """
+    Expands a struct format (e.g. '<B3f') to the list of its numpy types
+    :param packet_format:
+    :return:
+    """
+    types = []
+    count = ''
+    for char in packet_format.lstrip('<>=!@'):
+        if char.isdigit():
+            count += char
+            continue
+        types.extend([_NUMPY_TYPES[char]] * int(count or 1))
+        count = ''
+    return types
+
+
+def _dtype(code: str, packet_format: str) -> np.dtype:
+    """
+    Returns the numpy dtype of the records of a message code
+    :param code:
+    :param packet_format: struct format of the payload, message code included
+    :return:
+    """
+    types = _struct_types(packet_format)[1:]
+    names = FIELD_NAMES.get(code)
+    if names is None or len(names) != len(types):
+        names = tuple(f'v{i + 1}' for i in range(len(types)))
+    return np.dtype([('ticks', '<u8')] + list(zip(names, types)))
+
+
+def load_log(file_path: str) -> dict:
+    """
+    Loads a telemetry log
+    :param file_path: path of the log written by ArduinoAlvik.start_recording
+    :return: dictionary of message code (as char) and numpy structured array with a 'ticks' field (ms, unwrapped
+    when ticks_ms wrapped around during the recording) and one field per value of the message
+    """
+    with open(file_path, 'rb') as file:
+        data = file.read()
+
+    if data[0:4] != LOG_MAGIC:
+        raise ValueError(f'{file_path} is not an Alvik telemetry log')
+    if data[4] != LOG_VERSION:
+        raise ValueError(f'Unsupported telemetry log version {data[4]}')
+
+    formats = dict()
+    offset = 6
+    for _ in range(0, data[5]):
+        code, length = data[offset], data[offset + 1]
+        formats[code] = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length
+
+    rows = dict()
+    last_ticks = None
+    ticks = 0
+    while offset + RECORD_HEADER_SIZE <= len(data):
+        raw_ticks, payload_size = struct.unpack_from(RECORD_HEADER_FORMAT, data, offset)
+        if last_ticks is None:
+            ticks = raw_ticks
+        else:
+            ticks += ((raw_ticks - last_ticks + TICKS_PERIOD // 2) % TICKS_PERIOD) - TICKS_PERIOD // 2
+        last_ticks = raw_ticks
+        offset += RECORD_HEADER_SIZE
+        if offset + payload_size > len(data):
+            break  # truncated record
+        payload = data[offset:offset + payload_size]
+        offset += payload_size
+        packet_format = formats.get(payload[0])
+        if packet_format is None:
+            continue
+        rows.setdefault(payload[0], []).append((ticks,) + struct.unpack_from(packet_format, payload, 0)[1:])
+
+    return {chr(code): np.array(values, dtype=_dtype(chr(code), formats[code])) for code, values in rows.items()}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    for message_code, records in sorted(load_log(sys.argv[1]).items()):
+        duration_s = (int(records['ticks'][-1]) - int(records['ticks'][0])) / 1000
+        rate = f'{(len(records) - 1) / duration_s:.1f} Hz' if duration_s > 0 else '-'
+        print(f"'{message_code}': {len(records)} messages, {rate}, fields: {', '.join(records.dtype.names[1:])}")
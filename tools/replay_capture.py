@@ -0,0 +1,105 @@
+"""
+Replays an Alvik UART capture through the ucPack parser
+
+Plays back a capture written by arduino_alvik.transport.CaptureTransport with the same ReplayTransport used
+on the robot, frames every message and prints the message counts and the parser throughput.
+It runs on the computer (CPython), not on the robot.
+
+Usage:
+    python replay_capture.py capture.bin [speed]
+
+speed is the playback speed: 1 is real time, 2 twice as fast, 0 (default) as fast as possible
+"""
+
+import os
+import sys
+import time
+import importlib.util
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib')
+sys.path.insert(0, LIB_PATH)
+
+from ucPack import ucPack, PACKET_C1B, PACKET_C3B, PACKET_C3I, PACKET_C7I, PACKET_C1F, PACKET_C2F, PACKET_C3F, \
+    PACKET_C6F
+
+
+def _load_transport():
+    """
+    Loads arduino_alvik/transport.py without importing the arduino_alvik package, which needs the robot hardware
+    :return:
+    """
+    spec = importlib.util.spec_from_file_location('transport', os.path.join(LIB_PATH, 'arduino_alvik', 'transport.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# messages sent by the robot firmware, as registered by ArduinoAlvik
+CODECS = {
+    'j': PACKET_C2F, 'l': PACKET_C3I, 'c': PACKET_C3I, 'i': PACKET_C6F, 'p': PACKET_C1F, 'd': PACKET_C3F,
+    't': PACKET_C1B, 'm': PACKET_C1B, 'b': PACKET_C1B, 'f': PACKET_C7I, 'q': PACKET_C3F, 'w': PACKET_C2F,
+    'v': PACKET_C2F, 'x': PACKET_C1B, 'z': PACKET_C3F, '~': PACKET_C3B,
+}
+
+
+def replay(file_path: str, speed: float = 0) -> dict:
+    """
+    Replays a capture through the parser
+    :param file_path: path of the capture file
+    :param speed: playback speed
+    :return: dictionary with the message counts and the parser statistics
+    """
+    transport = _load_transport().ReplayTransport(file_path, speed)
+    packeter = ucPack(200)
+    for code, packet_format in CODECS.items():
+        packeter.registerCodec(ord(code), packet_format)
+
+    rx_buffer = bytearray(packeter.buffer_size)
+    rx_view = memoryview(rx_buffer)
+    counts = dict()
+    start = time.perf_counter()
+    parse_time = 0.0
+    while not transport.done() or packeter.buffer.getSize():
+        free = packeter.buffer_size - packeter.buffer.getSize()
+        available = transport.any()
+        if not available and not packeter.buffer.getSize():
+            time.sleep(0.001)
+            continue
+        parse_start = time.perf_counter()
+        if available and free:
+            n_bytes = transport.readinto(rx_view[0:min(available, free)])
+            if n_bytes:
+                packeter.buffer.extend(rx_view[0:n_bytes])
+        framed = False
+        while packeter.checkPayload():
+            framed = True
+            code = chr(packeter.payloadTop())
+            packeter.unpacket()
+            counts[code] = counts.get(code, 0) + 1
+        parse_time += time.perf_counter() - parse_start
+        if not framed and transport.done() and not transport.any():
+            break                                   # incomplete frame at the end of the capture
+
+    return {
+        'counts': counts,
+        'frames': packeter.frames,
+        'crc_errors': packeter.crc_errors,
+        'resyncs': packeter.resyncs,
+        'skipped_bytes': packeter.skipped_bytes,
+        'elapsed_s': time.perf_counter() - start,
+        'parse_s': parse_time,
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(__doc__)
+        sys.exit(1)
+
+    result = replay(sys.argv[1], float(sys.argv[2]) if len(sys.argv) == 3 else 0)
+    for message_code, count in sorted(result['counts'].items()):
+        print(f"'{message_code}': {count} messages")
+    print(f"frames: {result['frames']}, crc errors: {result['crc_errors']}, resyncs: {result['resyncs']}, "
+          f"skipped bytes: {result['skipped_bytes']}")
+    rate = result['frames'] / result['parse_s'] if result['parse_s'] > 0 else 0
+    print(f"replayed in {result['elapsed_s']:.3f} s, parsing {result['parse_s']:.3f} s ({rate:.0f} frames/s)")
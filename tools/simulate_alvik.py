@@ -0,0 +1,131 @@
+"""
+Load test of the Alvik protocol against the simulated STM32 firmware
+
+Runs arduino_alvik.simulator.SimulatedSTM32 on the computer, streams wheel speed commands at a control rate,
+parses the telemetry with ucPack and profiles the link: message rates, inter-arrival jitter,
+move/rotate acknowledgment latency and parser throughput.
+It runs on the computer (CPython), not on the robot.
+
+Usage:
+    python simulate_alvik.py [duration_s] [control_rate_hz]
+"""
+
+import os
+import sys
+import time
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alvik', 'lib')
+sys.path.insert(0, LIB_PATH)
+sys.path.insert(0, os.path.join(LIB_PATH, 'arduino_alvik'))     # arduino_alvik/__init__.py needs the robot hardware
+
+from ucPack import ucPack, PACKET_C1B, PACKET_C3B, PACKET_C7I, PACKET_C1F, PACKET_C2F, PACKET_C3F, PACKET_C6F
+from simulator import SimulatedSTM32
+
+CODECS = {
+    'j': PACKET_C2F, 'w': PACKET_C2F, 'z': PACKET_C3F, 'v': PACKET_C2F, 'i': PACKET_C6F, 'q': PACKET_C3F,
+    'f': PACKET_C7I, 'x': PACKET_C1B, 'p': PACKET_C1F, '~': PACKET_C3B,
+}
+
+
+class _Client:
+    """
+    Minimal host side of the link: sends commands and frames the telemetry
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.packeter = ucPack(200)
+        self.tx = ucPack(200)
+        for code, packet_format in CODECS.items():
+            self.packeter.registerCodec(ord(code), packet_format)
+        self.rx_buffer = bytearray(self.packeter.buffer_size)
+        self.rx_view = memoryview(self.rx_buffer)
+        self.arrivals = dict()
+        self.last = dict()
+        self.parse_time = 0.0
+
+    def send(self, size: int) -> None:
+        self.transport.write(self.tx.msg[0:size])
+
+    def poll(self) -> None:
+        start = time.perf_counter()
+        buffer = self.packeter.buffer
+        while True:
+            free = self.packeter.buffer_size - buffer.getSize()
+            available = self.transport.any()
+            if available and free:
+                n_bytes = self.transport.readinto(self.rx_view[0:min(available, free)])
+                if n_bytes:
+                    buffer.extend(self.rx_view[0:n_bytes])
+            framed = False
+            while self.packeter.checkPayload():
+                framed = True
+                message = self.packeter.unpacket()
+                code = chr(message[0])
+                self.arrivals.setdefault(code, []).append(time.perf_counter())
+                self.last[code] = message
+            if not framed:
+                break
+        self.parse_time += time.perf_counter() - start
+
+    def wait_ack(self, ack: str, timeout_s: float = 30) -> float:
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout_s:
+            self.poll()
+            if self.last.get('x', (0, 0))[1] == ord(ack):
+                latency = time.perf_counter() - start
+                self.send(self.tx.packetC1B(ord('X'), ord('K')))
+                return latency
+            time.sleep(0.001)
+        return float('nan')
+
+
+def run(duration_s: float = 5.0, control_rate_hz: float = 50.0) -> None:
+    simulator = SimulatedSTM32()
+    client = _Client(simulator)
+
+    # command streaming: a slow sine on the wheels speed
+    period = 1 / control_rate_hz
+    start = time.perf_counter()
+    next_command = start
+    commands = 0
+    while time.perf_counter() - start < duration_s:
+        now = time.perf_counter()
+        if now >= next_command:
+            phase = (now - start) / duration_s
+            client.send(client.tx.packetC2F(ord('J'), 40 * phase, -40 * phase))
+            commands += 1
+            next_command += period
+        client.poll()
+        time.sleep(0.0005)
+
+    elapsed = time.perf_counter() - start
+    print(f'{commands} speed commands in {elapsed:.2f} s')
+    for code, arrivals in sorted(client.arrivals.items()):
+        intervals = [b - a for a, b in zip(arrivals, arrivals[1:])]
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+            jitter = max(intervals) - min(intervals)
+            print(f"'{code}': {len(arrivals)} messages, {1 / mean:.1f} Hz, jitter {jitter * 1000:.1f} ms")
+        else:
+            print(f"'{code}': {len(arrivals)} messages")
+
+    client.send(client.tx.packetC2F(ord('J'), 0, 0))
+    client.send(client.tx.packetC1F(ord('G'), 100))
+    print(f'move 100 mm acknowledged in {client.wait_ack("M") * 1000:.0f} ms')
+    client.send(client.tx.packetC1F(ord('R'), 90))
+    print(f'rotate 90 deg acknowledged in {client.wait_ack("R") * 1000:.0f} ms')
+
+    state = simulator.get_state()
+    frames = client.packeter.frames
+    print(f"pose: x {state['pose'][0]:.1f} mm, y {state['pose'][1]:.1f} mm, theta {state['pose'][2]:.1f} deg")
+    print(f"{state['bytes_sent']} bytes sent, {state['overflows']} overflows, {client.packeter.crc_errors} crc errors")
+    rate = frames / client.parse_time if client.parse_time > 0 else 0
+    print(f'{frames} frames parsed in {client.parse_time:.3f} s ({rate:.0f} frames/s, simulation included)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3:
+        print(__doc__)
+        sys.exit(1)
+    run(*(float(arg) for arg in sys.argv[1:]))
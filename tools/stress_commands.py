@@ -0,0 +1,75 @@
+"""
+Concurrency stress test of the Alvik command path
+
+Several threads send wheels, LED, servo and wheel reset commands at the same time, some of them in batches,
+to the simulated STM32 firmware, which checks the crc of every frame it receives.
+It runs on the robot, the motor controller is not used:
+    mpremote run tools/stress_commands.py
+"""
+
+import _thread
+from time import sleep_ms, ticks_ms, ticks_diff
+
+from arduino_alvik import ArduinoAlvik
+from arduino_alvik.simulator import SimulatedSTM32
+
+THREADS = 3
+COMMANDS_PER_THREAD = 600
+BATCH_EVERY = 25
+
+simulator = SimulatedSTM32(rates={'j': 0, 'w': 0, 'z': 0, 'v': 0, 'i': 0, 'q': 0, 'f': 0, 'x': 0, 'p': 0})
+alvik = ArduinoAlvik(transport=simulator)
+alvik.set_builtin_led(False)                # initializes the LEDs state
+
+expected = {'J': 0, 'L': 0, 'S': 0, 'W': 0}
+expected_lock = _thread.allocate_lock()
+finished = []
+
+
+def _count(code: str, n: int = 1):
+    with expected_lock:
+        expected[code] += n
+
+
+def worker(thread_id: int):
+    for k in range(0, COMMANDS_PER_THREAD):
+        if k % BATCH_EVERY == 0:
+            with alvik.batch():
+                alvik.left_led.set_color(1, 0, thread_id % 2)
+                alvik.set_wheels_speed(thread_id, k)
+            _count('L')
+            _count('J')
+        elif k % 3 == 0:
+            alvik.set_wheels_speed(thread_id, -k)
+            _count('J')
+        elif k % 3 == 1:
+            alvik.set_servo_positions(thread_id * 10, k % 180)
+            _count('S')
+        else:
+            alvik.left_wheel.reset(k)
+            _count('W')
+    with expected_lock:
+        finished.append(thread_id)
+
+
+baseline = simulator.get_state()['commands']
+start = ticks_ms()
+for i in range(1, THREADS):
+    _thread.start_new_thread(worker, (i,))
+worker(0)
+while len(finished) < THREADS:
+    sleep_ms(10)
+elapsed = ticks_diff(ticks_ms(), start)
+
+state = simulator.get_state()
+commands = state['commands']
+total = sum(expected.values())
+print(f'{total} commands from {THREADS} threads in {elapsed} ms')
+print(f"frames: {state['rx_frames']}, crc errors: {state['rx_crc_errors']}, skipped bytes: {state['rx_skipped_bytes']}")
+errors = state['rx_crc_errors'] + state['rx_skipped_bytes']
+for code, count in expected.items():
+    received = commands.get(code, 0) - baseline.get(code, 0)
+    print(f"'{code}': sent {count}, received {received}")
+    errors += abs(received - count)
+print(alvik.get_command_stats())
+print('PASS' if errors == 0 else 'FAIL')